@@ -1,5 +1,6 @@
 import os
 from flask import Flask, redirect, url_for, request, abort
+from cli import register_commands
 from config import Config
 from extensions import db, login_manager, migrate
 from models import User, Role
@@ -7,6 +8,7 @@ from blueprints.auth.routes import bp as auth_bp
 from blueprints.main.routes import bp as main_bp
 from blueprints.admin.routes import bp as admin_bp
 from blueprints.lecturer import bp as lecturer_bp
+from services import sql_profiler
 
 def create_app():
     app = Flask(__name__)
@@ -15,12 +17,14 @@ def create_app():
     db.init_app(app)
     login_manager.init_app(app)
     migrate.init_app(app, db)
+    sql_profiler.init_app(app)
     login_manager.login_view = "auth.login"
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
     app.register_blueprint(admin_bp)
     app.register_blueprint(lecturer_bp)
+    register_commands(app)
 
     @app.route("/init")
     def init():
@@ -0,0 +1,150 @@
+"""Benchmark loading one conversation's history with and without the history index.
+
+Usage::
+
+    python benchmarks/conversation_history.py [--messages 500] [--submissions 2000] [--repeat 50]
+
+Builds a throwaway SQLite database with ``--submissions`` conversations whose
+turns are interleaved (as they are in production), one of which has
+``--messages`` turns. It then times the turn-load path twice: without
+``ix_submission_messages_history`` using the old query plus Python sort, and
+with the index using the ordered ``StudentSubmission.messages`` relationship.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+INDEX_NAME = "ix_submission_messages_history"
+
+
+def _best_of(repeat, fn):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _seed(db, models, submissions: int, messages: int) -> int:
+    student = models.User(first_name="Bench", last_name="Student", username="bench", email="bench@example.com")
+    student.password_hash = "x"
+    assignment = models.Assignment(title="Benchmark")
+    db.session.add_all([student, assignment])
+    db.session.flush()
+    rows = [
+        models.StudentSubmission(
+            assignment_id=assignment.id, student_id=student.id, filename="case.pdf", file_size=0
+        )
+        for _ in range(submissions)
+    ]
+    db.session.add_all(rows)
+    db.session.flush()
+
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    target = rows[len(rows) // 2].id
+    table = models.StudentSubmissionMessage.__table__
+    batch = []
+    for turn in range(messages):
+        for submission in rows:
+            if submission.id != target and turn >= messages // 10:
+                continue
+            batch.append(
+                {
+                    "submission_id": submission.id,
+                    "role": ("lecturer", "student", "assistant")[turn % 3],
+                    "content": f"Turn {turn} " + "lorem ipsum " * 20,
+                    "created_at": start + timedelta(seconds=turn),
+                }
+            )
+    db.session.execute(table.insert(), batch)
+    db.session.commit()
+    return target
+
+
+def _load_sorted_in_python(db, models, submission_id):
+    rows = (
+        db.session.query(models.StudentSubmissionMessage)
+        .filter_by(submission_id=submission_id)
+        .order_by(models.StudentSubmissionMessage.created_at.asc())
+        .all()
+    )
+    return sorted(rows, key=lambda m: (m.created_at, m.id))
+
+
+def _load_relationship(db, models, submission_id):
+    return list(db.session.get(models.StudentSubmission, submission_id).messages)
+
+
+def _timed(db, fn, repeat):
+    def run():
+        db.session.expunge_all()
+        return fn()
+
+    return _best_of(repeat, run)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--submissions", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="dialoque-bench-")
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{Path(workdir) / 'bench.db'}"
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+
+    from app import create_app
+    from extensions import db
+    import models
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        target = _seed(db, models, args.submissions, args.messages)
+        total = db.session.query(models.StudentSubmissionMessage).count()
+        print(f"{total} messages across {args.submissions} conversations; target has {args.messages}.")
+
+        db.session.execute(db.text(f"DROP INDEX {INDEX_NAME}"))
+        db.session.commit()
+        before, old_rows = _timed(db, lambda: _load_sorted_in_python(db, models, target), args.repeat)
+        old_ids = [m.id for m in old_rows]
+
+        db.session.execute(
+            db.text(f"CREATE INDEX {INDEX_NAME} ON student_submission_messages (submission_id, created_at, id)")
+        )
+        db.session.execute(db.text("ANALYZE"))
+        db.session.commit()
+        after, new_rows = _timed(db, lambda: _load_relationship(db, models, target), args.repeat)
+
+        assert old_ids == [m.id for m in new_rows], "history order differs"
+        plan = db.session.execute(
+            db.text(
+                "EXPLAIN QUERY PLAN SELECT id FROM student_submission_messages "
+                "WHERE submission_id = :sid ORDER BY created_at, id"
+            ),
+            {"sid": target},
+        ).all()
+
+    print(f"{'strategy':<40} {'best ms':>10}")
+    print("-" * 51)
+    print(f"{'no index, query + Python sort':<40} {before * 1000:>10.2f}")
+    print(f"{'history index, ordered relationship':<40} {after * 1000:>10.2f}")
+    print("plan: " + "; ".join(row[-1] for row in plan))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
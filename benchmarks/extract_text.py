@@ -0,0 +1,76 @@
+"""Benchmark PDF text extraction strategies against the sample PDFs in ``assets/``.
+
+Usage::
+
+    python benchmarks/extract_text.py [--repeat 3] [--workers 4] [--budget 6000] [PDF ...]
+
+Reports, per file, the best wall time of a sequential full extraction, a
+process-pool full extraction and a budgeted extraction (what the summariser
+uses), plus how many pages each strategy had to parse.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from services import pdf_text  # noqa: E402
+
+
+def _best_of(repeat, fn):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdfs", nargs="*", type=Path)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=pdf_text.DEFAULT_WORKERS)
+    parser.add_argument("--budget", type=int, default=6000, help="Character budget (SUMMARY_TRUNCATE_LIMIT).")
+    args = parser.parse_args(argv)
+
+    paths = args.pdfs or sorted((PROJECT_ROOT / "assets").glob("*.pdf"))
+    if not paths:
+        print("No PDFs found.")
+        return 1
+
+    # Start the pool outside the timed region; real workers keep it warm.
+    pdf_text._get_pool(max(args.workers, 1))
+
+    header = f"{'file':<48} {'pages':>5} {'seq s':>8} {'pool s':>8} {'budget s':>9} {'budget pages':>12}"
+    print(header)
+    print("-" * len(header))
+    try:
+        for path in paths:
+            data = path.read_bytes()
+            seq_time, full = _best_of(args.repeat, lambda: pdf_text.extract_text(data, workers=1))
+            pool_time, pooled = _best_of(
+                args.repeat,
+                lambda: pdf_text.extract_text(data, workers=args.workers, parallel_min_pages=1),
+            )
+            budget_time, budgeted = _best_of(
+                args.repeat, lambda: pdf_text.extract_text(data, max_chars=args.budget)
+            )
+            assert pooled.text == full.text, f"pool output differs for {path.name}"
+            print(
+                f"{path.name[:48]:<48} {full.page_count:>5} {seq_time:>8.3f} {pool_time:>8.3f}"
+                f" {budget_time:>9.3f} {budgeted.page_count:>12}"
+            )
+    finally:
+        pdf_text.shutdown_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash
 from flask_wtf import FlaskForm
 from wtforms import (
     StringField,
@@ -12,23 +12,23 @@ from wtforms import (
 from wtforms.validators import DataRequired, Email, Optional, Length
 from flask_login import login_required
 from extensions import db
-from models import User, Role, ConnectionSetting, ConnectionProfile, UserProject
+from models import User, Role, ConnectionSetting, ConnectionProfile, StudentSubmission, UserProject
 from role_required import role_required
-import sqlalchemy as sa
+from services import connection_health, conversation_export, engine_registry, identity_cache, sql_profiler, summary_cache, user_directory
 
 bp = Blueprint("admin", __name__, url_prefix="/beheer")
 
 def get_project_choices():
-    names = (
-        db.session.query(ConnectionProfile.project)
-        .distinct()
-        .order_by(ConnectionProfile.project)
-        .all()
+    return user_directory.project_choices()
+
+def render_users(form, **context):
+    """Render the user page with the listing selected by ``q``/``after``/``before``."""
+    page = user_directory.load_page(
+        search=request.args.get("q", ""),
+        after=request.args.get("after", type=int),
+        before=request.args.get("before", type=int),
     )
-    choices = [(name[0], name[0]) for name in names if name[0]]
-    if not choices:
-        choices = [("Algemeen", "Algemeen")]
-    return choices
+    return render_template("admin_users.html", form=form, users=page.users, page=page, **context)
 
 # ----- Forms -----
 class UserForm(FlaskForm):
@@ -71,7 +71,30 @@ class ConnProfileForm(FlaskForm):
 @login_required
 @role_required("Beheerder")
 def dashboard():
-    return render_template("admin_dashboard.html")
+    return render_template("admin_dashboard.html", summary_cache_stats=summary_cache.stats())
+
+@bp.route("/sql")
+@login_required
+@role_required("Beheerder")
+def sql_profile():
+    order = request.args.get("sort", "db_seconds")
+    if order not in ("db_seconds", "avg_db_ms", "avg_statements", "max_statements", "requests"):
+        order = "db_seconds"
+    return render_template(
+        "admin_sql_profile.html",
+        enabled=current_app.config.get("SQL_PROFILER_ENABLED", False),
+        slow_query_ms=current_app.config.get("SQL_SLOW_QUERY_MS"),
+        endpoints=sql_profiler.top_endpoints(limit=50, order_by=order),
+        sort=order,
+    )
+
+@bp.route("/sql/reset", methods=["POST"])
+@login_required
+@role_required("Beheerder")
+def sql_profile_reset():
+    sql_profiler.reset()
+    flash("SQL-statistieken gewist", "success")
+    return redirect(url_for("admin.sql_profile"))
 
 @bp.route("/users", methods=["GET", "POST"])
 @login_required
@@ -79,16 +102,15 @@ def dashboard():
 def users():
     form = UserForm()
     form.projects.choices = get_project_choices()
-    users = db.session.query(User).all()
     if request.method == "POST" and form.validate_on_submit():
         # Unieke username check
         if db.session.query(User.id).filter_by(username=form.username.data).first():
             flash("Gebruikersnaam bestaat al", "warning")
-            return render_template("admin_users.html", form=form, users=users)
+            return render_users(form)
         # Unieke email (indien ingevuld)
         if form.email.data and db.session.query(User.id).filter_by(email=form.email.data).first():
             flash("E-mailadres is al in gebruik", "warning")
-            return render_template("admin_users.html", form=form, users=users)
+            return render_users(form)
         u = User(
             first_name=form.first_name.data,
             last_name=form.last_name.data,
@@ -110,17 +132,17 @@ def users():
         # wachtwoord
         if not form.password.data:
             flash("Wachtwoord is verplicht bij aanmaken (min. 8 tekens)", "danger")
-            return render_template("admin_users.html", form=form, users=users)
+            return render_users(form)
         try:
             u.set_password(form.password.data)
         except ValueError as exc:
             flash(str(exc), "danger")
-            return render_template("admin_users.html", form=form, users=users)
+            return render_users(form)
         db.session.add(u)
         db.session.commit()
         flash("Gebruiker aangemaakt", "success")
         return redirect(url_for("admin.users"))
-    return render_template("admin_users.html", form=form, users=users)
+    return render_users(form)
 
 @bp.route("/users/<int:user_id>/toggle", methods=["POST"])
 @login_required
@@ -132,6 +154,7 @@ def toggle_user(user_id):
         return redirect(url_for("admin.users"))
     u.is_active = not u.is_active
     db.session.commit()
+    identity_cache.invalidate(u.id)
     flash("Status gewijzigd", "success")
     return redirect(url_for("admin.users"))
 
@@ -161,8 +184,7 @@ def edit_user(user_id):
         )
         if exists_username:
             flash("Gebruikersnaam bestaat al", "warning")
-            users = db.session.query(User).all()
-            return render_template("admin_users.html", form=form, users=users, edit_id=u.id)
+            return render_users(form, edit_id=u.id)
         # Unieke email behalve voor jezelf (indien ingevuld)
         if form.email.data:
             exists_email = (
@@ -172,8 +194,7 @@ def edit_user(user_id):
             )
             if exists_email:
                 flash("E-mailadres is al in gebruik", "warning")
-                users = db.session.query(User).all()
-                return render_template("admin_users.html", form=form, users=users, edit_id=u.id)
+                return render_users(form, edit_id=u.id)
         # Velden bijwerken
         u.first_name = form.first_name.data
         u.last_name = form.last_name.data
@@ -199,16 +220,13 @@ def edit_user(user_id):
                 u.set_password(form.password.data)
             except ValueError as exc:
                 flash(str(exc), "danger")
-                users = db.session.query(User).all()
-                return render_template(
-                    "admin_users.html", form=form, users=users, edit_id=u.id
-                )
+                return render_users(form, edit_id=u.id)
         db.session.commit()
+        identity_cache.invalidate(u.id)
         flash("Gebruiker bijgewerkt", "success")
         return redirect(url_for("admin.users"))
 
-    users = db.session.query(User).all()
-    return render_template("admin_users.html", form=form, users=users, edit_id=u.id)
+    return render_users(form, edit_id=u.id)
 
 
 @bp.route("/users/<int:user_id>/delete", methods=["POST"])
@@ -219,8 +237,12 @@ def delete_user(user_id):
     if not u:
         flash("Niet gevonden", "warning")
         return redirect(url_for("admin.users"))
+    user_id = u.id
+    submission_ids = [row[0] for row in db.session.query(StudentSubmission.id).filter_by(student_id=user_id)]
     db.session.delete(u)
     db.session.commit()
+    conversation_export.remove(submission_ids)
+    identity_cache.invalidate(user_id)
     flash("Gebruiker verwijderd", "success")
     return redirect(url_for("admin.users"))
 
@@ -242,6 +264,7 @@ def connection():
         cp = ConnectionProfile(name="Default", project="Algemeen")
         db.session.add(cp)
         db.session.commit()
+        user_directory.invalidate_project_choices()
         return redirect(url_for("admin.connection", project=cp.project, id=cp.id))
 
     # Handle actions
@@ -252,6 +275,7 @@ def connection():
         cp = ConnectionProfile(name="Nieuw profiel", project=sel_project or "Algemeen")
         db.session.add(cp)
         db.session.commit()
+        user_directory.invalidate_project_choices()
         return redirect(url_for("admin.connection", project=cp.project, id=cp.id))
 
     # Delete profile
@@ -260,6 +284,8 @@ def connection():
         if cp:
             db.session.delete(cp)
             db.session.commit()
+            engine_registry.dispose(sel_id)
+            user_directory.invalidate_project_choices()
             remaining = db.session.query(ConnectionProfile).filter_by(project=cp.project).order_by(ConnectionProfile.name).all()
             if remaining:
                 return redirect(url_for("admin.connection", project=remaining[0].project, id=remaining[0].id))
@@ -267,6 +293,7 @@ def connection():
                 cp2 = ConnectionProfile(name="Default", project="Algemeen")
                 db.session.add(cp2)
                 db.session.commit()
+                user_directory.invalidate_project_choices()
                 return redirect(url_for("admin.connection", project=cp2.project, id=cp2.id))
         flash("Profiel niet gevonden", "warning")
         return redirect(url_for("admin.connection"))
@@ -293,6 +320,8 @@ def connection():
             cp.odbc_driver = form.odbc_driver.data
             cp.trust_server_cert = bool(form.trust_server_cert.data)
             db.session.commit()
+            engine_registry.dispose(cp.id)
+            user_directory.invalidate_project_choices()
             flash("Profiel opgeslagen", "success")
             return redirect(url_for("admin.connection", project=cp.project, id=cp.id))
 
@@ -305,6 +334,7 @@ def connection():
     # Build dropdown data
     project_choices = [(p, p) for p in projects] if projects else [("Algemeen", "Algemeen")]
     profile_choices = [(str(p.id), f"{p.name}") for p in filtered] if filtered else ([(str(cp.id), cp.name)] if cp else [])
+    health = connection_health.latest()
 
     return render_template(
         "admin_connection.html",
@@ -314,6 +344,7 @@ def connection():
         sel_project=sel_project or (cp.project if cp else None),
         sel_id=(cp.id if cp else None),
         multi_profiles=True,
+        status_rows=[(p, health.get(p.id)) for p in profiles],
     )
 
 @bp.route("/connection/test", methods=["POST"])
@@ -328,12 +359,25 @@ def connection_test():
     if not cp:
         flash("Profiel niet gevonden", "warning")
         return redirect(url_for("admin.connection"))
-    uri = cp.build_uri()
-    try:
-        engine = sa.create_engine(uri)
-        with engine.connect() as con:
-            version = con.execute(sa.text("SELECT @@VERSION")).scalar()
-        flash(f"OK – {version}", "success")
-    except Exception as e:
-        flash(f"FOUT – {e}", "danger")
+    result = connection_health.sweep([cp])[0]
+    connection_health.record([result])
+    db.session.commit()
+    if result.ok:
+        flash(f"OK – {result.server_version} ({result.latency_ms:.0f} ms)", "success")
+    else:
+        flash(f"FOUT – {result.error}", "danger")
     return redirect(url_for("admin.connection", project=cp.project, id=cp.id))
+
+@bp.route("/connection/health", methods=["POST"])
+@login_required
+@role_required("Beheerder")
+def connection_health_sweep():
+    results = connection_health.sweep()
+    connection_health.record(results)
+    db.session.commit()
+    reachable = sum(1 for result in results if result.ok)
+    flash(
+        f"{reachable} van {len(results)} profielen bereikbaar",
+        "success" if reachable == len(results) else "warning",
+    )
+    return redirect(url_for("admin.connection", project=request.form.get("project") or None, id=request.form.get("id") or None))
@@ -5,6 +5,7 @@ from wtforms.validators import DataRequired, Length
 from flask_login import login_user, logout_user, login_required
 from extensions import db, login_manager
 from models import User
+from services import identity_cache
 
 bp = Blueprint("auth", __name__, url_prefix="/auth")
 
@@ -17,7 +18,7 @@ class LoginForm(FlaskForm):
 
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(User, int(user_id))
+    return identity_cache.load(int(user_id))
 
 @bp.route("/login", methods=["GET", "POST"])
 def login():
@@ -2,31 +2,40 @@ from __future__ import annotations
 
 import os
 from datetime import datetime, timezone
-from io import BytesIO
 
 from flask import (
     Blueprint,
+    Response,
     render_template,
     redirect,
     url_for,
     flash,
     abort,
-    send_file,
+    request,
+    stream_with_context,
 )
-from flask_login import login_required
+from flask_login import current_user, login_required
 from flask_wtf import FlaskForm
-from flask_wtf.file import FileAllowed, FileRequired, FileField
+from flask_wtf.file import FileAllowed, FileField
 from wtforms import HiddenField, IntegerField, SelectField, StringField, TextAreaField
 from wtforms.validators import DataRequired, Length, NumberRange, Optional
+from sqlalchemy.orm import load_only
 
 from extensions import db
-from models import Assignment, AssignmentDocument, AssignmentPrompt
+from models import Assignment, AssignmentDocument, AssignmentPrompt, StudentSubmission
 from role_required import role_required
-from services.openai_summarizer import (
-    SUMMARY_MODELS,
-    SummarizationError,
-    summarise_assignment_document,
+from services import (
+    bulk_export,
+    conversation_export,
+    file_serving,
+    jobs,
+    pdf_inspect,
+    prompt_progress,
+    summary_cache,
+    uploads,
 )
+from services.loaders import DOCUMENT_METADATA_COLUMNS, document_counts
+from services.openai_summarizer import SUMMARY_MODELS, SummarizationError
 
 bp = Blueprint("lecturer", __name__, url_prefix="/lecturer")
 
@@ -48,23 +57,27 @@ class AssignmentForm(FlaskForm):
     doc1_label = StringField("Document 1 label", validators=[Optional(), Length(max=120)])
     doc1_file = FileField(
         "Document 1 (PDF)",
-        validators=[FileRequired(), FileAllowed(["pdf"], "Upload a PDF document")],
+        validators=[uploads.FileOrUploadRequired("doc1_upload_id"), FileAllowed(["pdf"], "Upload a PDF document")],
     )
+    doc1_upload_id = HiddenField()
     doc2_label = StringField("Document 2 label", validators=[Optional(), Length(max=120)])
     doc2_file = FileField(
         "Document 2 (PDF)",
-        validators=[FileRequired(), FileAllowed(["pdf"], "Upload a PDF document")],
+        validators=[uploads.FileOrUploadRequired("doc2_upload_id"), FileAllowed(["pdf"], "Upload a PDF document")],
     )
+    doc2_upload_id = HiddenField()
     doc3_label = StringField("Document 3 label", validators=[Optional(), Length(max=120)])
     doc3_file = FileField(
         "Document 3 (PDF)",
-        validators=[FileRequired(), FileAllowed(["pdf"], "Upload a PDF document")],
+        validators=[uploads.FileOrUploadRequired("doc3_upload_id"), FileAllowed(["pdf"], "Upload a PDF document")],
     )
+    doc3_upload_id = HiddenField()
     doc4_label = StringField("Document 4 label", validators=[Optional(), Length(max=120)])
     doc4_file = FileField(
         "Document 4 (PDF)",
-        validators=[FileRequired(), FileAllowed(["pdf"], "Upload a PDF document")],
+        validators=[uploads.FileOrUploadRequired("doc4_upload_id"), FileAllowed(["pdf"], "Upload a PDF document")],
     )
+    doc4_upload_id = HiddenField()
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -84,12 +97,16 @@ class AssignmentUpdateForm(FlaskForm):
     )
     doc1_label = StringField("Document 1 label", validators=[Optional(), Length(max=120)])
     doc1_file = FileField("Replace Document 1", validators=[FileAllowed(["pdf"], "Upload a PDF document")])
+    doc1_upload_id = HiddenField()
     doc2_label = StringField("Document 2 label", validators=[Optional(), Length(max=120)])
     doc2_file = FileField("Replace Document 2", validators=[FileAllowed(["pdf"], "Upload a PDF document")])
+    doc2_upload_id = HiddenField()
     doc3_label = StringField("Document 3 label", validators=[Optional(), Length(max=120)])
     doc3_file = FileField("Replace Document 3", validators=[FileAllowed(["pdf"], "Upload a PDF document")])
+    doc3_upload_id = HiddenField()
     doc4_label = StringField("Document 4 label", validators=[Optional(), Length(max=120)])
     doc4_file = FileField("Replace Document 4", validators=[FileAllowed(["pdf"], "Upload a PDF document")])
+    doc4_upload_id = HiddenField()
 
 
 class DeleteAssignmentForm(FlaskForm):
@@ -139,6 +156,14 @@ def _normalise_filename(filename: str, slot: int) -> str:
     return os.path.basename(filename)
 
 
+def _record_inspection(document: AssignmentDocument, upload) -> None:
+    # Lecturer documents are kept even without a text layer; they just cannot be summarised.
+    report = pdf_inspect.inspect_upload(upload)
+    pdf_inspect.store(document.content_hash, report)
+    if not report.usable:
+        flash(f"{report.message(document.filename)} It is stored but cannot be summarised.", "warning")
+
+
 @bp.route("/assignments", methods=["GET", "POST"])
 @login_required
 @role_required("Beheerder")
@@ -159,27 +184,40 @@ def assignments():
         db.session.flush()
 
         collected = []
-        for idx in range(1, 5):
-            file_field: FileField = getattr(form, f"doc{idx}_file")
-            label_field: StringField = getattr(form, f"doc{idx}_label")
-            file_storage = file_field.data
-            if not file_storage:
-                continue
-            file_bytes = file_storage.read()
-            file_storage.stream.seek(0)
-            document = AssignmentDocument(
-                assignment=assignment,
-                slot=idx,
-                label=(label_field.data or f"Document {idx}").strip() or f"Document {idx}",
-                filename=_normalise_filename(file_storage.filename, idx),
-                mimetype=file_storage.mimetype or "application/pdf",
-                file_size=len(file_bytes),
-                content=file_bytes,
-            )
-            collected.append(document)
-            db.session.add(document)
-
-        if len(collected) != 4:
+        spooled = []
+        rejected = None
+        try:
+            for idx in range(1, 5):
+                label_field: StringField = getattr(form, f"doc{idx}_label")
+                upload = uploads.resolve(
+                    getattr(form, f"doc{idx}_file").data,
+                    getattr(form, f"doc{idx}_upload_id").data,
+                    current_user.id,
+                )
+                if upload is None:
+                    continue
+                spooled.append(upload)
+                document = AssignmentDocument(
+                    assignment=assignment,
+                    slot=idx,
+                    label=(label_field.data or f"Document {idx}").strip() or f"Document {idx}",
+                    filename=_normalise_filename(upload.filename, idx),
+                    mimetype=upload.mimetype,
+                )
+                document.store_upload(upload)
+                collected.append(document)
+                db.session.add(document)
+                _record_inspection(document, upload)
+        except uploads.UploadRejected as exc:
+            rejected = str(exc)
+        finally:
+            for upload in spooled:
+                upload.discard()
+
+        if rejected:
+            db.session.rollback()
+            flash(rejected, "danger")
+        elif len(collected) != 4:
             db.session.rollback()
             flash("Exactly four PDF documents are required per assignment.", "danger")
         else:
@@ -187,7 +225,26 @@ def assignments():
             flash("Assignment created successfully.", "success")
             return redirect(url_for("lecturer.assignments"))
 
-    return render_template("lecturer_assignments.html", form=form, assignments=assignments)
+    return render_template(
+        "lecturer_assignments.html",
+        form=form,
+        assignments=assignments,
+        document_counts=document_counts(assignment.id for assignment in assignments),
+    )
+
+
+@bp.route("/assignments/<int:assignment_id>/conversations.zip")
+@login_required
+@role_required("Beheerder")
+def download_conversations(assignment_id: int):
+    assignment = db.session.get(Assignment, assignment_id)
+    if not assignment:
+        abort(404)
+    response = Response(
+        stream_with_context(bulk_export.iter_assignment_zip(assignment.id)),
+        mimetype="application/zip",
+    )
+    return file_serving.set_download_name(response, f"conversations_{assignment.title.replace(' ', '_')}.zip")
 
 
 @bp.route("/assignments/<int:assignment_id>")
@@ -218,6 +275,7 @@ def assignment_detail(assignment_id: int):
         prompt_order_forms[prompt.id] = order_form
 
     primary_doc = next((doc for doc in assignment.documents if doc.slot == 1), None)
+    summary_job = jobs.latest_job_for(primary_doc) if primary_doc else None
     return render_template(
         "lecturer_assignment_detail.html",
         assignment=assignment,
@@ -227,6 +285,7 @@ def assignment_detail(assignment_id: int):
         prompt_delete_form=prompt_delete_form,
         prompt_order_forms=prompt_order_forms,
         primary_doc=primary_doc,
+        summary_job=summary_job,
     )
 
 
@@ -253,23 +312,42 @@ def assignment_edit(assignment_id: int):
         assignment.title = form.title.data.strip()
         assignment.description = (form.description.data or "").strip() or None
 
-        for idx in range(1, 5):
-            document = documents[idx]
-            label_field: StringField = getattr(form, f"doc{idx}_label")
-            file_field: FileField = getattr(form, f"doc{idx}_file")
-
-            new_label = (label_field.data or document.label or f"Document {idx}").strip()
-            document.label = new_label or f"Document {idx}"
-
-            file_storage = file_field.data
-            if file_storage:
-                file_bytes = file_storage.read()
-                file_storage.stream.seek(0)
-                document.filename = _normalise_filename(file_storage.filename, idx)
-                document.mimetype = file_storage.mimetype or "application/pdf"
-                document.file_size = len(file_bytes)
-                document.content = file_bytes
-                document.uploaded_at = datetime.now(timezone.utc)
+        # Validate every replacement before touching the stored documents.
+        replacements = {}
+        try:
+            for idx in range(1, 5):
+                upload = uploads.resolve(
+                    getattr(form, f"doc{idx}_file").data,
+                    getattr(form, f"doc{idx}_upload_id").data,
+                    current_user.id,
+                )
+                if upload:
+                    replacements[idx] = upload
+        except uploads.UploadRejected as exc:
+            for upload in replacements.values():
+                upload.discard()
+            db.session.rollback()
+            flash(str(exc), "danger")
+            return redirect(url_for("lecturer.assignment_edit", assignment_id=assignment.id))
+
+        try:
+            for idx in range(1, 5):
+                document = documents[idx]
+                label_field: StringField = getattr(form, f"doc{idx}_label")
+
+                new_label = (label_field.data or document.label or f"Document {idx}").strip()
+                document.label = new_label or f"Document {idx}"
+
+                upload = replacements.get(idx)
+                if upload:
+                    document.filename = _normalise_filename(upload.filename, idx)
+                    document.mimetype = upload.mimetype
+                    document.store_upload(upload)
+                    _record_inspection(document, upload)
+                    document.uploaded_at = datetime.now(timezone.utc)
+        finally:
+            for upload in replacements.values():
+                upload.discard()
 
         db.session.commit()
         flash("Assignment updated successfully.", "success")
@@ -287,6 +365,7 @@ def assignment_edit(assignment_id: int):
             "document": documents[idx],
             "label_field": getattr(form, f"doc{idx}_label"),
             "file_field": getattr(form, f"doc{idx}_file"),
+            "upload_field": getattr(form, f"doc{idx}_upload_id"),
         })
 
     return render_template(
@@ -301,15 +380,12 @@ def assignment_edit(assignment_id: int):
 @login_required
 @role_required("Beheerder")
 def download_document(document_id: int):
-    document = db.session.get(AssignmentDocument, document_id)
-    if not document:
-        abort(404)
-    return send_file(
-        BytesIO(document.content),
-        mimetype=document.mimetype or "application/pdf",
-        download_name=document.filename,
-        as_attachment=True,
+    document = db.session.get(
+        AssignmentDocument, document_id, options=[load_only(*DOCUMENT_METADATA_COLUMNS)]
     )
+    if not document or not document.has_content:
+        abort(404)
+    return file_serving.send_stored_pdf(document, inline=request.args.get("inline") == "1")
 
 
 @bp.route("/assignments/<int:assignment_id>/delete", methods=["POST"])
@@ -325,8 +401,12 @@ def assignment_delete(assignment_id: int):
     if not assignment:
         abort(404)
 
+    submission_ids = [
+        row[0] for row in db.session.query(StudentSubmission.id).filter_by(assignment_id=assignment.id)
+    ]
     db.session.delete(assignment)
     db.session.commit()
+    conversation_export.remove(submission_ids)
     flash("Assignment deleted.", "success")
     return redirect(url_for("lecturer.assignments"))
 
@@ -350,11 +430,20 @@ def assignment_summary(assignment_id: int):
     if not primary_doc:
         flash("Assignment is missing the first document.", "warning")
         return redirect(url_for("lecturer.assignment_detail", assignment_id=assignment_id))
+    report = pdf_inspect.for_target(primary_doc)
+    if report is not None and not report.usable:
+        db.session.commit()
+        flash(report.message(primary_doc.filename), "warning")
+        return redirect(url_for("lecturer.assignment_detail", assignment_id=assignment_id))
 
     try:
-        summarise_assignment_document(primary_doc, form.model.data)
-        db.session.commit()
-        flash("Summary updated successfully.", "success")
+        if summary_cache.apply_cached_summary(primary_doc, form.model.data):
+            db.session.commit()
+            flash("Summary updated from the cache.", "success")
+        else:
+            jobs.enqueue_summary(primary_doc, form.model.data)
+            db.session.commit()
+            flash("Summary queued; it will appear here once it is ready.", "success")
     except SummarizationError as exc:
         db.session.rollback()
         flash(str(exc), "danger")
@@ -392,6 +481,7 @@ def add_prompt(assignment_id: int):
         for index, prompt_obj in enumerate(existing_prompts, start=1):
             prompt_obj.display_order = index
 
+        prompt_progress.sync_assignment(assignment.id)
         db.session.commit()
         flash("Prompt added.", "success")
     else:
@@ -424,6 +514,7 @@ def update_prompt_order(prompt_id: int):
     for index, prompt_obj in enumerate(prompts, start=1):
         prompt_obj.display_order = index
 
+    prompt_progress.sync_assignment(assignment.id)
     db.session.commit()
     flash("Prompt order updated.", "success")
     return redirect(url_for("lecturer.assignment_detail", assignment_id=assignment.id))
@@ -452,6 +543,7 @@ def delete_prompt(prompt_id: int):
     for index, prompt_obj in enumerate(remaining_prompts, start=1):
         prompt_obj.display_order = index
 
+    prompt_progress.sync_assignment(assignment_id)
     db.session.commit()
     flash("Prompt removed.", "success")
     return redirect(url_for("lecturer.assignment_detail", assignment_id=assignment_id))
@@ -1,7 +1,10 @@
+import json
 from typing import Optional
 
 from flask import (
     Blueprint,
+    Response,
+    jsonify,
     render_template,
     redirect,
     url_for,
@@ -9,23 +12,38 @@ from flask import (
     session,
     request,
     send_file,
+    stream_with_context,
     abort,
 )
 from markupsafe import Markup, escape
 from flask_login import login_required, current_user
 from flask_wtf import FlaskForm
-from flask_wtf.file import FileAllowed, FileRequired, FileField
+from flask_wtf.file import FileAllowed, FileField
 from wtforms import BooleanField, HiddenField, SelectField, TextAreaField
 from wtforms.validators import DataRequired, Length, Optional
+from sqlalchemy.orm import load_only
 
 from extensions import db
-from models import Assignment, StudentSubmission, StudentSubmissionMessage
-from services import chat_llm, export_pdf
-from services.openai_summarizer import (
-    SUMMARY_MODELS,
-    SummarizationError,
-    summarise_document_content,
+from models import (
+    Assignment,
+    AssignmentPrompt,
+    BackgroundJob,
+    StudentSubmission,
+    StudentSubmissionMessage,
 )
+from services import (
+    chat_llm,
+    conversation_export,
+    dashboard,
+    file_serving,
+    jobs,
+    pdf_inspect,
+    prompt_progress,
+    summary_cache,
+    uploads,
+)
+from services.loaders import SUBMISSION_METADATA_COLUMNS, load_primary_document
+from services.openai_summarizer import SUMMARY_MODELS, SummarizationError
 
 
 DEFAULT_CHAT_MODEL = chat_llm.CHAT_MODELS[-1][0] if chat_llm.CHAT_MODELS else "gpt-3.5-turbo"
@@ -65,8 +83,9 @@ class SubmissionForm(FlaskForm):
     model = SelectField("Summary model", choices=[], validators=[DataRequired()])
     document = FileField(
         "Upload case analysis (PDF ONLY)",
-        validators=[FileRequired(), FileAllowed(["pdf"], "Upload a PDF document")],
+        validators=[uploads.FileOrUploadRequired("upload_id"), FileAllowed(["pdf"], "Upload a PDF document")],
     )
+    upload_id = HiddenField()
 
 
 class ConversationForm(FlaskForm):
@@ -80,34 +99,16 @@ class ConversationForm(FlaskForm):
     include_student_summary = BooleanField("Include my summary", default=True)
 
 
-def _ensure_prompt_progress(submission: StudentSubmission) -> None:
-    assignment = submission.assignment
-    prompts = list(assignment.prompts)
-    if not prompts:
-        return
-
-    messages = (
-        db.session.query(StudentSubmissionMessage)
-        .filter_by(submission_id=submission.id)
-        .order_by(StudentSubmissionMessage.created_at.asc(), StudentSubmissionMessage.id.asc())
-        .all()
-    )
-
-    if not messages:
-        next_prompt = prompts[0]
-    else:
-        last_message = messages[-1]
-        delivered_ids = [
-            (msg.get_context() or {}).get("prompt_id")
-            for msg in messages
-            if msg.role == "lecturer"
-        ]
-        delivered_count = len([pid for pid in delivered_ids if pid])
-        if last_message.role != "assistant":
-            return
-        if delivered_count >= len(prompts):
-            return
-        next_prompt = prompts[delivered_count]
+def _ensure_prompt_progress(submission: StudentSubmission) -> bool:
+    """Deliver the next lecturer prompt if due; returns True when it committed."""
+    # Decided from the materialised columns; no history or prompt list is loaded.
+    if not prompt_progress.should_deliver(submission):
+        return False
+    next_prompt = db.session.get(AssignmentPrompt, submission.next_prompt_id)
+    if next_prompt is None:
+        prompt_progress.recompute(submission)
+        db.session.commit()
+        return True
 
     content = next_prompt.prompt_text.strip()
     prompt_message = StudentSubmissionMessage(
@@ -121,7 +122,64 @@ def _ensure_prompt_progress(submission: StudentSubmission) -> None:
         example_response=(next_prompt.example_response or "").strip() or None,
     )
     db.session.add(prompt_message)
+    prompt_progress.record_message(submission, prompt_message)
     db.session.commit()
+    return True
+
+
+def _record_student_message(
+    submission: StudentSubmission,
+    text: str,
+    include_lecturer_summary: bool,
+    include_student_summary: bool,
+) -> StudentSubmissionMessage:
+    student_message = StudentSubmissionMessage(
+        submission=submission,
+        role="student",
+        content=text.strip(),
+        model=DEFAULT_CHAT_MODEL,
+    )
+    student_message.set_context(
+        include_lecturer_summary=include_lecturer_summary,
+        include_student_summary=include_student_summary,
+    )
+    db.session.add(student_message)
+    prompt_progress.record_message(submission, student_message)
+    return student_message
+
+
+def _record_assistant_message(
+    submission: StudentSubmission,
+    text: str,
+    model: str,
+    include_lecturer_summary: bool,
+    include_student_summary: bool,
+    result: chat_llm.ChatResult | None = None,
+    **extra,
+) -> StudentSubmissionMessage:
+    assistant_message = StudentSubmissionMessage(
+        submission=submission,
+        role="assistant",
+        content=text,
+        model=model,
+    )
+    assistant_message.set_context(
+        include_lecturer_summary=include_lecturer_summary,
+        include_student_summary=include_student_summary,
+        prompt_tokens=result.prompt_tokens if result else None,
+        completion_tokens=result.completion_tokens if result else None,
+        total_tokens=result.total_tokens if result else None,
+        context_budget=result.context_budget if result else None,
+        **extra,
+    )
+    db.session.add(assistant_message)
+    prompt_progress.record_message(submission, assistant_message)
+    return assistant_message
+
+
+def _sse(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
 
 @bp.route("/")
 @login_required
@@ -137,11 +195,7 @@ def student():
     form_upload = SubmissionForm(prefix="upload")
     chat_form = ConversationForm(prefix="chat")
 
-    assignments = (
-        db.session.query(Assignment)
-        .order_by(Assignment.created_at.desc())
-        .all()
-    )
+    assignments = dashboard.load_assignments()
     form_select.assignment_id.choices = [(assn.id, assn.title) for assn in assignments]
     form_upload.model.choices = list(SUMMARY_MODELS)
     active_assignment_id = session.get("active_assignment_id")
@@ -159,7 +213,8 @@ def student():
         flash(f"Assignment '{selected.title}' selected for this session.", "success")
         return redirect(url_for("main.student", step=2))
 
-    if "upload-document" in request.files and form_upload.validate_on_submit():
+    uploading = "upload-document" in request.files or request.form.get("upload-upload_id")
+    if uploading and form_upload.validate_on_submit():
         try:
             assignment_id = int(form_upload.assignment_id.data)
         except (TypeError, ValueError):
@@ -174,24 +229,39 @@ def student():
             flash("Assignment not found.", "danger")
             return redirect(url_for("main.student", step=1))
 
-        file_storage = form_upload.document.data
-        file_bytes = file_storage.read()
-        file_storage.stream.seek(0)
+        try:
+            upload = uploads.resolve(form_upload.document.data, form_upload.upload_id.data, current_user.id)
+        except uploads.UploadRejected as exc:
+            flash(str(exc), "danger")
+            return redirect(url_for("main.student", step=2))
+        # Refuse files that cannot yield text before any extraction or LLM work.
+        report = pdf_inspect.inspect_upload(upload)
+        if not report.usable:
+            upload.discard()
+            flash(report.message(upload.filename), "danger")
+            return redirect(url_for("main.student", step=2))
 
         submission = StudentSubmission(
             assignment=assignment,
-            student=current_user,
-            filename=file_storage.filename or "case-analysis.pdf",
-            mimetype=file_storage.mimetype or "application/pdf",
-            file_size=len(file_bytes),
-            content=file_bytes,
+            student_id=current_user.id,
+            filename=upload.filename or "case-analysis.pdf",
+            mimetype=upload.mimetype,
         )
+        try:
+            submission.store_upload(upload)
+        finally:
+            upload.discard()
         db.session.add(submission)
+        pdf_inspect.store(submission.content_hash, report)
+        prompt_progress.reset(submission)
+        db.session.flush()
 
         try:
-            result = summarise_document_content(file_bytes, form_upload.model.data)
-            submission.set_summary(result.text, result.model)
-            flash("Case analysis uploaded and summarised.", "success")
+            if summary_cache.apply_cached_summary(submission, form_upload.model.data):
+                flash("Case analysis uploaded. Your summary is ready.", "success")
+            else:
+                jobs.enqueue_summary(submission, form_upload.model.data)
+                flash("Case analysis uploaded. Your summary is being generated.", "success")
         except SummarizationError as exc:
             flash(str(exc), "warning")
 
@@ -211,18 +281,14 @@ def student():
     if active_assignment_id and not form_select.assignment_id.data and assignments:
         form_select.assignment_id.data = active_assignment_id
 
-    active_assignment = db.session.get(Assignment, active_assignment_id) if active_assignment_id else None
-    assignment_summary_doc = None
-    student_submissions: list[StudentSubmission] = []
-
-    if active_assignment:
-        assignment_summary_doc = next((doc for doc in active_assignment.documents if doc.slot == 1), None)
-        student_submissions = (
-            db.session.query(StudentSubmission)
-            .filter_by(assignment_id=active_assignment.id, student_id=current_user.id)
-            .order_by(StudentSubmission.uploaded_at.desc())
-            .all()
-        )
+    view = dashboard.load_student_dashboard(
+        current_user.id,
+        active_assignment_id,
+        assignments=assignments,
+        with_conversation=stage >= 4,
+    )
+    active_assignment = view.active_assignment
+    student_submissions = view.submissions
 
     max_stage_available = 1
     if active_assignment:
@@ -235,8 +301,7 @@ def student():
 
     form_upload.assignment_id.data = str(active_assignment.id if active_assignment else "")
 
-    active_submission = student_submissions[0] if student_submissions else None
-    assignment_prompts = active_assignment.prompts if active_assignment else []
+    active_submission = view.active_submission
     if active_submission:
         chat_form.submission_id.data = str(active_submission.id)
     else:
@@ -258,17 +323,12 @@ def student():
         include_lecturer_summary = bool(chat_form.include_lecturer_summary.data)
         include_student_summary = bool(chat_form.include_student_summary.data)
 
-        student_message = StudentSubmissionMessage(
-            submission=submission,
-            role="student",
-            content=chat_form.message.data.strip(),
-            model=DEFAULT_CHAT_MODEL,
-        )
-        student_message.set_context(
+        student_message = _record_student_message(
+            submission,
+            chat_form.message.data,
             include_lecturer_summary=include_lecturer_summary,
             include_student_summary=include_student_summary,
         )
-        db.session.add(student_message)
 
         try:
             result = chat_llm.generate_chat_response(
@@ -277,61 +337,55 @@ def student():
                 model=DEFAULT_CHAT_MODEL,
                 include_lecturer_summary=include_lecturer_summary,
                 include_student_summary=include_student_summary,
+                current_message=student_message,
             )
         except chat_llm.ConversationError as exc:
             db.session.rollback()
             flash(str(exc), "danger")
             return redirect(url_for("main.student", step=4))
 
-        assistant_message = StudentSubmissionMessage(
-            submission=submission,
-            role="assistant",
-            content=result.text,
+        _record_assistant_message(
+            submission,
+            text=result.text,
             model=result.model,
-        )
-        assistant_message.set_context(
             include_lecturer_summary=include_lecturer_summary,
             include_student_summary=include_student_summary,
-            prompt_tokens=result.prompt_tokens,
-            completion_tokens=result.completion_tokens,
-            total_tokens=result.total_tokens,
+            result=result,
         )
-        db.session.add(assistant_message)
         db.session.commit()
         session["student_stage"] = 4
         return redirect(url_for("main.student", step=4))
 
     conversation_messages: list[StudentSubmissionMessage] = []
     active_prompt_message: Optional[StudentSubmissionMessage] = None
-    prompt_progress = {"delivered": 0, "total": len(assignment_prompts)}
+    progress_counts = {"delivered": 0, "total": view.prompt_count}
 
     if stage >= 4 and active_submission:
-        _ensure_prompt_progress(active_submission)
-        conversation_messages = (
-            db.session.query(StudentSubmissionMessage)
-            .filter_by(submission_id=active_submission.id)
-            .order_by(StudentSubmissionMessage.created_at.asc())
-            .all()
-        )
-        for message in conversation_messages:
-            if message.role == "lecturer":
-                prompt_progress["delivered"] += 1
-        if conversation_messages and conversation_messages[-1].role == "lecturer":
+        if _ensure_prompt_progress(active_submission):
+            # The commit expired the loaded rows; reload rather than refresh them one by one.
+            view = dashboard.load_student_dashboard(
+                current_user.id, active_assignment.id, with_conversation=True
+            )
+            assignments = view.assignments
+            student_submissions = view.submissions
+            active_submission = view.active_submission
+        conversation_messages = view.messages
+        if active_submission.last_message_role == "lecturer" and conversation_messages:
             active_prompt_message = conversation_messages[-1]
-        prompt_progress["delivered"] = min(
-            prompt_progress["delivered"],
-            prompt_progress["total"],
+        progress_counts["delivered"] = min(
+            active_submission.prompts_delivered or 0,
+            progress_counts["total"],
         )
-        prompt_progress["remaining"] = max(
-            prompt_progress["total"] - prompt_progress["delivered"],
+        progress_counts["remaining"] = max(
+            progress_counts["total"] - progress_counts["delivered"],
             0,
         )
     elif stage >= 4 and not active_submission:
         session["student_stage"] = 3
         return redirect(url_for("main.student", step=3))
     else:
-        prompt_progress["remaining"] = max(
-            prompt_progress["total"] - prompt_progress["delivered"],
+        progress_counts["remaining"] = max(
+            progress_counts["total"] - progress_counts["delivered"],
             0,
         )
 
@@ -343,18 +397,119 @@ def student():
         assignments=assignments,
         active_assignment_title=active_assignment_title,
         active_assignment=active_assignment,
-        assignment_summary_doc=assignment_summary_doc,
+        assignment_summary_doc=view.primary_document,
         student_submissions=student_submissions,
-        assignment_prompts=assignment_prompts,
         conversation_messages=conversation_messages,
         active_submission=active_submission,
+        summary_job=view.summary_job,
         active_prompt_message=active_prompt_message,
-        prompt_progress=prompt_progress,
+        prompt_progress=progress_counts,
         stage=stage,
         format_summary=_format_summary,
     )
 
 
+@bp.route("/student/conversation/stream", methods=["POST"])
+@login_required
+def stream_conversation():
+    """Stream the assistant reply as Server-Sent Events.
+
+    The student turn is committed before the model is called, so a dropped
+    connection still leaves a consistent history; whatever text arrived before
+    the disconnect is stored as a partial assistant message.
+    """
+    chat_form = ConversationForm(prefix="chat")
+    if not chat_form.validate_on_submit():
+        first_error = next(iter(chat_form.errors.values()), ["Invalid input"])[0]
+        return jsonify(error=first_error), 400
+
+    try:
+        submission_id = int(chat_form.submission_id.data)
+    except (TypeError, ValueError):
+        submission_id = None
+    submission = db.session.get(StudentSubmission, submission_id) if submission_id else None
+    if not submission or submission.student_id != current_user.id:
+        return jsonify(error="Invalid submission."), 404
+
+    _ensure_prompt_progress(submission)
+
+    include_lecturer_summary = bool(chat_form.include_lecturer_summary.data)
+    include_student_summary = bool(chat_form.include_student_summary.data)
+    student_message = _record_student_message(
+        submission,
+        chat_form.message.data,
+        include_lecturer_summary=include_lecturer_summary,
+        include_student_summary=include_student_summary,
+    )
+    db.session.commit()
+
+    stream = chat_llm.stream_chat_response(
+        submission=submission,
+        user_message=chat_form.message.data,
+        model=DEFAULT_CHAT_MODEL,
+        include_lecturer_summary=include_lecturer_summary,
+        include_student_summary=include_student_summary,
+        current_message=student_message,
+    )
+
+    def generate():
+        chunks: list[str] = []
+        result: chat_llm.ChatResult | None = None
+        failed = False
+        completed = False
+        try:
+            for item in stream:
+                if isinstance(item, chat_llm.ChatResult):
+                    result = item
+                    continue
+                chunks.append(item)
+                yield _sse("delta", {"text": item})
+            completed = True
+        except chat_llm.ConversationError as exc:
+            failed = True
+            yield _sse("error", {"message": str(exc)})
+        finally:
+            # On a client disconnect (GeneratorExit) this stops the upstream model response too.
+            stream.close()
+            text = result.text if result else "".join(chunks).strip()
+            if text:
+                extra = {} if completed else {"partial": True}
+                assistant_message = _record_assistant_message(
+                    submission,
+                    text=text,
+                    model=result.model if result else DEFAULT_CHAT_MODEL,
+                    include_lecturer_summary=include_lecturer_summary,
+                    include_student_summary=include_student_summary,
+                    result=result,
+                    **extra,
+                )
+            elif failed:
+                # Nothing was produced; drop the student turn like the non-streaming path does.
+                db.session.delete(student_message)
+                db.session.flush()
+                prompt_progress.recompute(submission)
+                assistant_message = None
+            else:
+                assistant_message = None
+            db.session.commit()
+
+        if completed and assistant_message is not None:
+            yield _sse(
+                "done",
+                {
+                    "message_id": assistant_message.id,
+                    "model": assistant_message.model,
+                    "total_tokens": result.total_tokens if result else None,
+                },
+            )
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @bp.route("/student/conversation/restart", methods=["POST"])
 @login_required
 def restart_conversation():
@@ -368,12 +523,27 @@ def restart_conversation():
         abort(404)
 
     db.session.query(StudentSubmissionMessage).filter_by(submission_id=submission.id).delete()
+    submission.set_history_summary(None, None)
+    prompt_progress.reset(submission)
     db.session.commit()
     flash("Conversation restarted.", "success")
     session["student_stage"] = 4
     return redirect(url_for("main.student", step=4))
 
 
+@bp.route("/student/submissions/<int:submission_id>/file")
+@login_required
+def download_submission(submission_id: int):
+    submission = db.session.get(
+        StudentSubmission, submission_id, options=[load_only(*SUBMISSION_METADATA_COLUMNS)]
+    )
+    if not submission or not submission.has_content:
+        abort(404)
+    if submission.student_id != current_user.id and not current_user.has_role("Beheerder"):
+        abort(404)
+    return file_serving.send_stored_pdf(submission, inline=request.args.get("inline") == "1")
+
+
 @bp.route("/student/conversation/download")
 @login_required
 def download_conversation():
@@ -387,37 +557,123 @@ def download_conversation():
         abort(404)
 
     assignment = submission.assignment
-    lecturer_doc = next((doc for doc in assignment.documents if doc.slot == 1), None)
+    lecturer_doc = load_primary_document(assignment.id)
+    state = conversation_export.current_state(submission, lecturer_doc)
 
-    messages = (
-        db.session.query(StudentSubmissionMessage)
-        .filter_by(submission_id=submission.id)
-        .order_by(StudentSubmissionMessage.created_at.asc())
-        .all()
-    )
+    if request.if_none_match.contains(state.etag):
+        response = Response(status=304)
+    else:
+        path = conversation_export.cached_path(state)
+        if path is None and conversation_export.renders_in_background(state):
+            conversation_export.enqueue(submission)
+            db.session.commit()
+            flash("Your conversation PDF is being prepared. Try the download again in a moment.", "info")
+            return redirect(url_for("main.student", step=4))
+        if path is None:
+            path = conversation_export.render(submission, lecturer_doc, state)
+        response = send_file(
+            path,
+            mimetype="application/pdf",
+            as_attachment=True,
+            download_name=f"conversation_{assignment.title.replace(' ', '_')}.pdf",
+            conditional=True,
+            etag=False,
+            last_modified=state.last_modified,
+        )
+    response.set_etag(state.etag)
+    if state.last_modified:
+        response.last_modified = state.last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
 
-    conversation_payload = [
-        {
-            "role": msg.role,
-            "content": msg.content,
-            "timestamp": msg.created_at.strftime("%d %b %Y %H:%M") if msg.created_at else None,
-        }
-        for msg in messages
-    ]
-
-    pdf_stream = export_pdf.build_conversation_pdf(
-        assignment_title=assignment.title,
-        lecturer_summary=lecturer_doc.summary if lecturer_doc else None,
-        lecturer_model=lecturer_doc.summary_model if lecturer_doc else None,
-        student_summary=submission.summary,
-        student_model=submission.summary_model,
-        conversation=conversation_payload,
-    )
 
-    filename = f"conversation_{assignment.title.replace(' ', '_')}.pdf"
-    return send_file(
-        pdf_stream,
-        mimetype="application/pdf",
-        as_attachment=True,
-        download_name=filename,
-    )
+@bp.route("/jobs/<int:job_id>")
+@login_required
+def job_status(job_id: int):
+    job = db.session.get(BackgroundJob, job_id)
+    if not job:
+        abort(404)
+    is_lecturer = current_user.has_role("Beheerder")
+    if not is_lecturer:
+        target = jobs.load_target(job)
+        if not isinstance(target, StudentSubmission) or target.student_id != current_user.id:
+            abort(404)
+    return jsonify(jobs.job_status(job))
+
+
+@bp.route("/uploads", methods=["POST"])
+@login_required
+def upload_open():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify(error="Expected a JSON body with filename and size."), 400
+    try:
+        upload_session = uploads.open_session(
+            current_user.id, payload.get("filename"), payload.get("size"), payload.get("mimetype")
+        )
+    except uploads.UploadRejected as exc:
+        return jsonify(error=str(exc)), 422
+    db.session.commit()
+    return jsonify(uploads.describe(upload_session)), 201
+
+
+def _owned_upload(upload_id: str):
+    upload_session = uploads.get_session(upload_id, current_user.id)
+    if upload_session is None:
+        abort(404)
+    return upload_session
+
+
+@bp.route("/uploads/<upload_id>", methods=["GET"])
+@login_required
+def upload_status(upload_id: str):
+    return jsonify(uploads.describe(_owned_upload(upload_id)))
+
+
+@bp.route("/uploads/<upload_id>", methods=["PUT"])
+@login_required
+def upload_chunk(upload_id: str):
+    upload_session = _owned_upload(upload_id)
+    offset = request.args.get("offset", type=int)
+    if offset is None or request.content_length is None:
+        return jsonify(error="Send the chunk with an offset and a Content-Length."), 400
+    try:
+        uploads.append_chunk(
+            upload_session,
+            offset,
+            request.stream,
+            request.content_length,
+            request.headers.get("X-Chunk-SHA256", ""),
+        )
+    except uploads.ChunkOutOfOrder as exc:
+        db.session.rollback()
+        return jsonify(error=str(exc), offset=exc.offset), 409
+    except uploads.ChunkCorrupted as exc:
+        db.session.rollback()
+        return jsonify(error=str(exc), offset=upload_session.received), 400
+    except uploads.UploadRejected as exc:
+        db.session.rollback()
+        return jsonify(error=str(exc), offset=upload_session.received), 422
+    db.session.commit()
+    return jsonify(uploads.describe(upload_session))
+
+
+@bp.route("/uploads/<upload_id>/finalise", methods=["POST"])
+@login_required
+def upload_finalise(upload_id: str):
+    upload_session = _owned_upload(upload_id)
+    try:
+        uploads.finalise(upload_session)
+    except uploads.ChunkOutOfOrder as exc:
+        return jsonify(error="The upload is not complete yet.", offset=exc.offset), 409
+    db.session.commit()
+    return jsonify(uploads.describe(upload_session))
+
+
+@bp.route("/uploads/<upload_id>", methods=["DELETE"])
+@login_required
+def upload_cancel(upload_id: str):
+    uploads.cancel(_owned_upload(upload_id))
+    db.session.commit()
+    return "", 204
@@ -0,0 +1,84 @@
+"""Flask CLI commands for DiaLoque maintenance tasks."""
+import click
+from flask import current_app
+
+from extensions import db
+from models import Assignment, AssignmentDocument, StudentSubmission
+from services import bulk_export, connection_health, conversation_export, jobs, pdf_inspect, text_store, uploads
+from services.blob_store import get_blob_store
+
+
+def referenced_blob_hashes() -> set[str]:
+    hashes: set[str] = set()
+    for model in (AssignmentDocument, StudentSubmission):
+        rows = db.session.query(model.content_hash).filter(model.content_hash.isnot(None)).distinct()
+        hashes.update(row[0] for row in rows)
+    return hashes
+
+
+def register_commands(app):
+    @app.cli.command("blob-gc")
+    @click.option("--grace", type=int, default=None, help="Keep blobs younger than this many seconds.")
+    def blob_gc(grace):
+        """Delete stored PDFs that no document or submission references."""
+        if grace is None:
+            grace = current_app.config.get("BLOB_GC_GRACE_SECONDS", 3600)
+        referenced = referenced_blob_hashes()
+        removed = get_blob_store().collect_garbage(referenced, grace_seconds=grace)
+        pruned = text_store.prune(referenced)
+        inspections = pdf_inspect.prune(referenced)
+        exports = conversation_export.prune()
+        db.session.commit()
+        click.echo(f"Removed {len(removed)} unreferenced blob(s).")
+        click.echo(f"Removed {pruned} stale extracted text(s).")
+        click.echo(f"Removed {inspections} stale PDF inspection(s).")
+        click.echo(f"Removed {exports} orphaned conversation export(s).")
+
+    @app.cli.command("upload-gc")
+    def upload_gc():
+        """Delete resumable uploads that expired before being attached."""
+        removed = uploads.expire_sessions()
+        db.session.commit()
+        click.echo(f"Removed {removed} expired upload(s).")
+
+    @app.cli.command("connections-check")
+    @click.option("--workers", type=int, default=None, help="Profiles probed at the same time.")
+    @click.option("--timeout", type=float, default=None, help="Seconds before a probe counts as timed out.")
+    def connections_check(workers, timeout):
+        """Probe every connection profile and store the result for the admin page."""
+        results = connection_health.sweep(workers=workers, timeout=timeout)
+        connection_health.record(results)
+        db.session.commit()
+        for result in results:
+            detail = result.server_version if result.ok else result.error
+            latency = f"{result.latency_ms:.0f} ms" if result.latency_ms is not None else "-"
+            click.echo(f"{result.profile_id}\t{result.status}\t{latency}\t{detail}")
+        click.echo(f"{sum(1 for r in results if r.ok)} of {len(results)} profile(s) reachable.")
+
+    @app.cli.command("jobs-worker")
+    @click.option("--once", is_flag=True, help="Drain the queue once and exit.")
+    @click.option("--poll-interval", type=float, default=None, help="Seconds to sleep when the queue is empty.")
+    def jobs_worker(once, poll_interval):
+        """Run queued background jobs (document summaries)."""
+        click.echo("Job worker started." if not once else "Draining job queue.")
+        try:
+            jobs.work(poll_interval=poll_interval, once=once)
+        except KeyboardInterrupt:
+            click.echo("Job worker stopped.")
+
+    @app.cli.command("export-conversations")
+    @click.argument("assignment_id", type=int)
+    @click.option("--output", "-o", type=click.Path(dir_okay=False, writable=True), default=None)
+    @click.option("--workers", type=int, default=None, help="PDF render processes (0 renders in-process).")
+    def export_conversations(assignment_id, output, workers):
+        """Write every student conversation of an assignment to one ZIP of PDFs."""
+        assignment = db.session.get(Assignment, assignment_id)
+        if assignment is None:
+            raise click.ClickException(f"Assignment {assignment_id} not found.")
+        output = output or f"conversations_{assignment.id}.zip"
+        written = 0
+        with open(output, "wb") as handle:
+            for chunk in bulk_export.iter_assignment_zip(assignment.id, workers=workers):
+                handle.write(chunk)
+                written += len(chunk)
+        click.echo(f"Wrote {written} bytes to {output}.")
@@ -7,3 +7,41 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI", "sqlite:///app.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", 16 * 1024 * 1024))  # 16 MB default upload cap
+    UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", 16 * 1024 * 1024))  # per-file cap, checked while streaming
+    UPLOAD_SPOOL_PATH = os.getenv("UPLOAD_SPOOL_PATH")  # defaults to <instance>/uploads
+    UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", 4 * 1024 * 1024))  # largest resumable-upload chunk
+    UPLOAD_SESSION_TTL = int(os.getenv("UPLOAD_SESSION_TTL", 24 * 3600))  # seconds an idle resumable upload is kept
+    BLOB_STORE_BACKEND = os.getenv("BLOB_STORE_BACKEND", "local")
+    BLOB_STORE_PATH = os.getenv("BLOB_STORE_PATH")  # defaults to <instance>/blobs
+    BLOB_GC_GRACE_SECONDS = int(os.getenv("BLOB_GC_GRACE_SECONDS", 3600))
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+    JOB_RETRY_BASE_SECONDS = int(os.getenv("JOB_RETRY_BASE_SECONDS", 15))
+    JOB_RETRY_MAX_SECONDS = int(os.getenv("JOB_RETRY_MAX_SECONDS", 900))
+    JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 600))  # reclaim jobs from crashed workers
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 2.0))
+    SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", 5000))
+    SUMMARY_CHUNK_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CHUNK_CACHE_MAX_ENTRIES", 20000))
+    SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", 1500))  # map-reduce chunk size (~4 chars/token)
+    SUMMARY_TRUNCATE_LIMIT = int(os.getenv("SUMMARY_MAX_INPUT_CHARS", 200_000))  # characters summarised per document
+    SUMMARY_MAP_WORKERS = int(os.getenv("SUMMARY_MAP_WORKERS", 4))  # chunk summaries requested in parallel
+    TEXT_EXTRACT_WORKERS = int(os.getenv("TEXT_EXTRACT_WORKERS", min(4, os.cpu_count() or 1)))
+    TEXT_EXTRACT_PARALLEL_MIN_PAGES = int(os.getenv("TEXT_EXTRACT_PARALLEL_MIN_PAGES", 32))
+    TEXT_CACHE_SIZE = int(os.getenv("TEXT_CACHE_SIZE", 64))  # extracted PDFs kept in memory per process
+    SQL_PROFILER_ENABLED = os.getenv("SQL_PROFILER_ENABLED", "0") == "1"
+    SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", 200))  # log statements slower than this
+    SQL_PROFILER_TOP_STATEMENTS = int(os.getenv("SQL_PROFILER_TOP_STATEMENTS", 5))
+    IDENTITY_CACHE_TTL = float(os.getenv("IDENTITY_CACHE_TTL", 60))  # seconds a cached user/role lookup stays valid
+    IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", 1024))
+    IDENTITY_CACHE_STAMP_PATH = os.getenv("IDENTITY_CACHE_STAMP_PATH")  # defaults to <instance>/identity-cache.version
+    ADMIN_USERS_PER_PAGE = int(os.getenv("ADMIN_USERS_PER_PAGE", 50))  # rows per page in /beheer/users
+    PROJECT_CHOICES_TTL = float(os.getenv("PROJECT_CHOICES_TTL", 300))  # seconds the project list is cached per process
+    PROJECT_DB_POOL_SIZE = int(os.getenv("PROJECT_DB_POOL_SIZE", 2))  # pooled connections per connection profile
+    PROJECT_DB_MAX_OVERFLOW = int(os.getenv("PROJECT_DB_MAX_OVERFLOW", 3))
+    PROJECT_DB_POOL_TIMEOUT = float(os.getenv("PROJECT_DB_POOL_TIMEOUT", 10))  # seconds to wait for a free connection
+    PROJECT_DB_POOL_RECYCLE = int(os.getenv("PROJECT_DB_POOL_RECYCLE", 1800))
+    PROJECT_DB_CONNECT_TIMEOUT = int(os.getenv("PROJECT_DB_CONNECT_TIMEOUT", 5))  # login timeout for project databases
+    HEALTH_SWEEP_WORKERS = int(os.getenv("HEALTH_SWEEP_WORKERS", 8))  # profiles probed at the same time
+    HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", 10))  # seconds before a probe counts as timed out
+    EXPORT_CACHE_PATH = os.getenv("EXPORT_CACHE_PATH")  # defaults to <instance>/exports
+    EXPORT_BACKGROUND_MIN_MESSAGES = int(os.getenv("EXPORT_BACKGROUND_MIN_MESSAGES", 150))  # render longer chats in the job worker
+    EXPORT_ZIP_WORKERS = int(os.getenv("EXPORT_ZIP_WORKERS", min(4, os.cpu_count() or 1)))  # 0 renders in-process
@@ -0,0 +1,99 @@
+"""materialise prompt progress
+
+Revision ID: 2c91b6f4e7a3
+Revises: 7a3d5e9b2f18
+Create Date: 2025-11-08 10:05:51.730442
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c91b6f4e7a3'
+down_revision = '7a3d5e9b2f18'
+branch_labels = None
+depends_on = None
+
+
+submissions = sa.table(
+    'student_submissions',
+    sa.column('id', sa.Integer()),
+    sa.column('assignment_id', sa.Integer()),
+    sa.column('prompts_delivered', sa.Integer()),
+    sa.column('next_prompt_id', sa.Integer()),
+    sa.column('last_message_role', sa.String(length=20)),
+)
+messages = sa.table(
+    'student_submission_messages',
+    sa.column('id', sa.Integer()),
+    sa.column('submission_id', sa.Integer()),
+    sa.column('role', sa.String(length=20)),
+    sa.column('created_at', sa.DateTime(timezone=True)),
+)
+prompts = sa.table(
+    'assignment_prompts',
+    sa.column('id', sa.Integer()),
+    sa.column('assignment_id', sa.Integer()),
+    sa.column('display_order', sa.Integer()),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('student_submissions', schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column('prompts_delivered', sa.Integer(), nullable=False, server_default='0')
+        )
+        batch_op.add_column(sa.Column('next_prompt_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('last_message_role', sa.String(length=20), nullable=True))
+        batch_op.create_index('ix_student_submissions_next_prompt_id', ['next_prompt_id'], unique=False)
+        batch_op.create_foreign_key(
+            'fk_student_submissions_next_prompt_id',
+            'assignment_prompts',
+            ['next_prompt_id'],
+            ['id'],
+            ondelete='SET NULL',
+        )
+
+    bind = op.get_bind()
+    ordered_prompts = {}
+    for prompt_id, assignment_id in bind.execute(
+        sa.select(prompts.c.id, prompts.c.assignment_id).order_by(
+            prompts.c.assignment_id, prompts.c.display_order, prompts.c.id
+        )
+    ):
+        ordered_prompts.setdefault(assignment_id, []).append(prompt_id)
+
+    for submission_id, assignment_id in bind.execute(
+        sa.select(submissions.c.id, submissions.c.assignment_id)
+    ).all():
+        delivered = bind.execute(
+            sa.select(sa.func.count())
+            .select_from(messages)
+            .where(messages.c.submission_id == submission_id, messages.c.role == 'lecturer')
+        ).scalar()
+        last_role = bind.execute(
+            sa.select(messages.c.role)
+            .where(messages.c.submission_id == submission_id)
+            .order_by(messages.c.created_at.desc(), messages.c.id.desc())
+            .limit(1)
+        ).scalar()
+        assignment_prompts = ordered_prompts.get(assignment_id, [])
+        bind.execute(
+            submissions.update()
+            .where(submissions.c.id == submission_id)
+            .values(
+                prompts_delivered=delivered,
+                last_message_role=last_role,
+                next_prompt_id=assignment_prompts[delivered] if delivered < len(assignment_prompts) else None,
+            )
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('student_submissions', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_student_submissions_next_prompt_id', type_='foreignkey')
+        batch_op.drop_index('ix_student_submissions_next_prompt_id')
+        batch_op.drop_column('last_message_role')
+        batch_op.drop_column('next_prompt_id')
+        batch_op.drop_column('prompts_delivered')
@@ -0,0 +1,79 @@
+"""move pdf blobs to blob store
+
+Revision ID: 3803cb1ecc48
+Revises: 5ef1c3e82cb7
+Create Date: 2025-11-03 09:12:44.205118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from services.blob_store import get_blob_store
+
+
+# revision identifiers, used by Alembic.
+revision = '3803cb1ecc48'
+down_revision = '5ef1c3e82cb7'
+branch_labels = None
+depends_on = None
+
+
+BLOB_TABLES = ("assignment_documents", "student_submissions")
+
+
+def _blob_table(table_name):
+    return sa.table(
+        table_name,
+        sa.column('id', sa.Integer()),
+        sa.column('content', sa.LargeBinary()),
+        sa.column('content_hash', sa.String(length=64)),
+    )
+
+
+def upgrade():
+    for table_name in BLOB_TABLES:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+            batch_op.alter_column('content', existing_type=sa.LargeBinary(), nullable=True)
+            batch_op.create_index(f'ix_{table_name}_content_hash', ['content_hash'], unique=False)
+
+    bind = op.get_bind()
+    store = get_blob_store()
+    for table_name in BLOB_TABLES:
+        table = _blob_table(table_name)
+        row_ids = bind.execute(
+            sa.select(table.c.id).where(table.c.content.isnot(None))
+        ).scalars().all()
+        # Move one payload at a time so the migration never holds every PDF in memory.
+        for row_id in row_ids:
+            blob = bind.execute(
+                sa.select(table.c.content).where(table.c.id == row_id)
+            ).scalar()
+            content_hash = store.put(blob)
+            bind.execute(
+                table.update()
+                .where(table.c.id == row_id)
+                .values(content_hash=content_hash, content=None)
+            )
+
+
+def downgrade():
+    bind = op.get_bind()
+    store = get_blob_store()
+    for table_name in BLOB_TABLES:
+        table = _blob_table(table_name)
+        rows = bind.execute(
+            sa.select(table.c.id, table.c.content_hash).where(table.c.content.is_(None))
+        ).all()
+        for row_id, content_hash in rows:
+            bind.execute(
+                table.update()
+                .where(table.c.id == row_id)
+                .values(content=store.read(content_hash) if content_hash else b"")
+            )
+
+    for table_name in reversed(BLOB_TABLES):
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table_name}_content_hash')
+            batch_op.alter_column('content', existing_type=sa.LargeBinary(), nullable=False)
+            batch_op.drop_column('content_hash')
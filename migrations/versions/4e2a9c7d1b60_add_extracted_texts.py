@@ -0,0 +1,33 @@
+"""add extracted texts
+
+Revision ID: 4e2a9c7d1b60
+Revises: b7d41f0c2a95
+Create Date: 2025-11-06 15:47:12.904113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e2a9c7d1b60'
+down_revision = 'b7d41f0c2a95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'extracted_texts',
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('page_offsets', sa.Text(), nullable=False),
+        sa.Column('page_count', sa.Integer(), nullable=False),
+        sa.Column('extractor', sa.String(length=20), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('content_hash')
+    )
+
+
+def downgrade():
+    op.drop_table('extracted_texts')
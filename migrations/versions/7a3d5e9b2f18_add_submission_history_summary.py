@@ -0,0 +1,30 @@
+"""add submission history summary
+
+Revision ID: 7a3d5e9b2f18
+Revises: c5f8e21a9d34
+Create Date: 2025-11-07 13:40:05.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a3d5e9b2f18'
+down_revision = 'c5f8e21a9d34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('student_submissions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('history_summary', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('history_summary_through_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('history_summary_updated_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('student_submissions', schema=None) as batch_op:
+        batch_op.drop_column('history_summary_updated_at')
+        batch_op.drop_column('history_summary_through_id')
+        batch_op.drop_column('history_summary')
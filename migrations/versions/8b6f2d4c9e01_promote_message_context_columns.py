@@ -0,0 +1,109 @@
+"""promote message context columns
+
+Revision ID: 8b6f2d4c9e01
+Revises: 2c91b6f4e7a3
+Create Date: 2025-11-08 14:22:10.418305
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b6f2d4c9e01'
+down_revision = '2c91b6f4e7a3'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = (
+    'prompt_id',
+    'include_lecturer_summary',
+    'include_student_summary',
+    'prompt_tokens',
+    'completion_tokens',
+    'total_tokens',
+)
+
+messages = sa.table(
+    'student_submission_messages',
+    sa.column('id', sa.Integer()),
+    sa.column('context', sa.Text()),
+    sa.column('prompt_id', sa.Integer()),
+    sa.column('include_lecturer_summary', sa.Boolean()),
+    sa.column('include_student_summary', sa.Boolean()),
+    sa.column('prompt_tokens', sa.Integer()),
+    sa.column('completion_tokens', sa.Integer()),
+    sa.column('total_tokens', sa.Integer()),
+)
+prompts = sa.table('assignment_prompts', sa.column('id', sa.Integer()))
+
+
+def upgrade():
+    with op.batch_alter_table('student_submission_messages', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('prompt_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('include_lecturer_summary', sa.Boolean(), nullable=True))
+        batch_op.add_column(sa.Column('include_student_summary', sa.Boolean(), nullable=True))
+        batch_op.add_column(sa.Column('prompt_tokens', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('completion_tokens', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('total_tokens', sa.Integer(), nullable=True))
+        batch_op.create_index('ix_student_submission_messages_prompt_id', ['prompt_id'], unique=False)
+        batch_op.create_foreign_key(
+            'fk_submission_messages_prompt_id',
+            'assignment_prompts',
+            ['prompt_id'],
+            ['id'],
+            ondelete='SET NULL',
+        )
+
+    bind = op.get_bind()
+    known_prompts = set(bind.execute(sa.select(prompts.c.id)).scalars())
+    for message_id, raw in bind.execute(
+        sa.select(messages.c.id, messages.c.context).where(messages.c.context.isnot(None))
+    ).all():
+        try:
+            values = json.loads(raw)
+        except (TypeError, ValueError):
+            continue
+        if not isinstance(values, dict):
+            continue
+        promoted = {key: values.pop(key, None) for key in COLUMNS}
+        if promoted['prompt_id'] not in known_prompts:
+            promoted['prompt_id'] = None
+        bind.execute(
+            messages.update()
+            .where(messages.c.id == message_id)
+            .values(context=json.dumps(values, ensure_ascii=False) if values else None, **promoted)
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+    for row in bind.execute(
+        sa.select(messages.c.id, messages.c.context, *(messages.c[key] for key in COLUMNS))
+    ).all():
+        values = {key: row._mapping[key] for key in COLUMNS if row._mapping[key] is not None}
+        if not values:
+            continue
+        if row.context:
+            try:
+                values.update(json.loads(row.context))
+            except (TypeError, ValueError):
+                pass
+        bind.execute(
+            messages.update()
+            .where(messages.c.id == row.id)
+            .values(context=json.dumps(values, ensure_ascii=False))
+        )
+
+    with op.batch_alter_table('student_submission_messages', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_submission_messages_prompt_id', type_='foreignkey')
+        batch_op.drop_index('ix_student_submission_messages_prompt_id')
+        batch_op.drop_column('total_tokens')
+        batch_op.drop_column('completion_tokens')
+        batch_op.drop_column('prompt_tokens')
+        batch_op.drop_column('include_student_summary')
+        batch_op.drop_column('include_lecturer_summary')
+        batch_op.drop_column('prompt_id')
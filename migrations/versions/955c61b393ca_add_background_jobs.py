@@ -0,0 +1,55 @@
+"""add background jobs
+
+Revision ID: 955c61b393ca
+Revises: 3803cb1ecc48
+Create Date: 2025-11-05 14:21:09.613402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '955c61b393ca'
+down_revision = '3803cb1ecc48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'background_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=40), nullable=False),
+        sa.Column('target_type', sa.String(length=40), nullable=False),
+        sa.Column('target_id', sa.Integer(), nullable=False),
+        sa.Column('model', sa.String(length=64), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('run_after', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('locked_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_background_jobs_status_run_after',
+        'background_jobs',
+        ['status', 'run_after'],
+        unique=False,
+    )
+    op.create_index(
+        'ix_background_jobs_target',
+        'background_jobs',
+        ['target_type', 'target_id'],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index('ix_background_jobs_target', table_name='background_jobs')
+    op.drop_index('ix_background_jobs_status_run_after', table_name='background_jobs')
+    op.drop_table('background_jobs')
@@ -0,0 +1,35 @@
+"""add pdf inspections
+
+Revision ID: a91c4d7e2b58
+Revises: e6b3f0a7c412
+Create Date: 2025-11-09 15:03:27.641920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a91c4d7e2b58'
+down_revision = 'e6b3f0a7c412'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'pdf_inspections',
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('pdf_version', sa.String(length=8), nullable=True),
+        sa.Column('page_count', sa.Integer(), nullable=False),
+        sa.Column('encrypted', sa.Boolean(), nullable=False),
+        sa.Column('has_text_layer', sa.Boolean(), nullable=False),
+        sa.Column('estimated_chars', sa.Integer(), nullable=False),
+        sa.Column('problem', sa.String(length=20), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('content_hash')
+    )
+
+
+def downgrade():
+    op.drop_table('pdf_inspections')
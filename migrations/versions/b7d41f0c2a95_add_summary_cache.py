@@ -0,0 +1,49 @@
+"""add summary cache
+
+Revision ID: b7d41f0c2a95
+Revises: 955c61b393ca
+Create Date: 2025-11-06 10:02:44.381920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d41f0c2a95'
+down_revision = '955c61b393ca'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'summary_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('model', sa.String(length=64), nullable=False),
+        sa.Column('prompt_version', sa.Integer(), nullable=False),
+        sa.Column('truncate_limit', sa.Integer(), nullable=False),
+        sa.Column('summary', sa.Text(), nullable=False),
+        sa.Column('hits', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_used_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint(
+            'content_hash', 'model', 'prompt_version', 'truncate_limit', name='uq_summary_cache_key'
+        ),
+    )
+    op.create_index('ix_summary_cache_last_used_at', 'summary_cache', ['last_used_at'], unique=False)
+    op.create_table(
+        'cache_stats',
+        sa.Column('name', sa.String(length=40), nullable=False),
+        sa.Column('hits', sa.Integer(), nullable=False),
+        sa.Column('misses', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade():
+    op.drop_table('cache_stats')
+    op.drop_index('ix_summary_cache_last_used_at', table_name='summary_cache')
+    op.drop_table('summary_cache')
@@ -0,0 +1,37 @@
+"""add connection health
+
+Revision ID: c4f82a9d1e63
+Revises: a91c4d7e2b58
+Create Date: 2025-11-12 10:41:08.215364
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f82a9d1e63'
+down_revision = 'a91c4d7e2b58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'connection_health',
+        sa.Column('profile_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('latency_ms', sa.Float(), nullable=True),
+        sa.Column('server_version', sa.String(length=255), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('profile_updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('checked_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['profile_id'], ['connection_profiles.id'], name='fk_connection_health_profile_id', ondelete='CASCADE'
+        ),
+        sa.PrimaryKeyConstraint('profile_id')
+    )
+
+
+def downgrade():
+    op.drop_table('connection_health')
@@ -0,0 +1,37 @@
+"""add summary chunks
+
+Revision ID: c5f8e21a9d34
+Revises: 4e2a9c7d1b60
+Create Date: 2025-11-07 09:12:30.557180
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5f8e21a9d34'
+down_revision = '4e2a9c7d1b60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'summary_chunks',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('chunk_hash', sa.String(length=64), nullable=False),
+        sa.Column('model', sa.String(length=64), nullable=False),
+        sa.Column('prompt_version', sa.Integer(), nullable=False),
+        sa.Column('summary', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_used_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('chunk_hash', 'model', 'prompt_version', name='uq_summary_chunks_key'),
+    )
+    op.create_index('ix_summary_chunks_last_used_at', 'summary_chunks', ['last_used_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_summary_chunks_last_used_at', table_name='summary_chunks')
+    op.drop_table('summary_chunks')
@@ -0,0 +1,28 @@
+"""add submission message history index
+
+Revision ID: d2a7c5e1f9b3
+Revises: 8b6f2d4c9e01
+Create Date: 2025-11-08 16:40:03.115927
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a7c5e1f9b3'
+down_revision = '8b6f2d4c9e01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('student_submission_messages', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_submission_messages_history', ['submission_id', 'created_at', 'id'], unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('student_submission_messages', schema=None) as batch_op:
+        batch_op.drop_index('ix_submission_messages_history')
@@ -0,0 +1,45 @@
+"""add upload sessions
+
+Revision ID: e6b3f0a7c412
+Revises: d2a7c5e1f9b3
+Create Date: 2025-11-09 10:12:44.208311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b3f0a7c412'
+down_revision = 'd2a7c5e1f9b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'upload_sessions',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('mimetype', sa.String(length=120), nullable=False),
+        sa.Column('total_size', sa.Integer(), nullable=False),
+        sa.Column('received', sa.Integer(), nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['user_id'], ['users.id'], name='fk_upload_sessions_user_id', ondelete='CASCADE'
+        ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_upload_sessions_user_id', 'upload_sessions', ['user_id'], unique=False)
+    op.create_index('ix_upload_sessions_expires_at', 'upload_sessions', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_upload_sessions_expires_at', table_name='upload_sessions')
+    op.drop_index('ix_upload_sessions_user_id', table_name='upload_sessions')
+    op.drop_table('upload_sessions')
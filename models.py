@@ -1,8 +1,11 @@
 from datetime import datetime, timezone
-from typing import Optional
+from typing import BinaryIO, Optional
 from passlib.hash import pbkdf2_sha256
 from flask_login import UserMixin
+from sqlalchemy.exc import IntegrityError
 from extensions import db
+from services.blob_store import get_blob_store
+from io import BytesIO
 import base64
 import json
 
@@ -129,6 +132,62 @@ class ConnectionProfile(db.Model):
             f"&TrustServerCertificate={trust}"
         )
 
+    health = db.relationship("ConnectionHealth", uselist=False, cascade="all, delete-orphan")
+
+
+class ConnectionHealth(db.Model):
+    """Last result of probing a connection profile; written by the health sweep."""
+
+    __tablename__ = "connection_health"
+
+    profile_id = db.Column(
+        db.Integer,
+        db.ForeignKey("connection_profiles.id", name="fk_connection_health_profile_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    status = db.Column(db.String(20), nullable=False)  # ok, error, timeout
+    latency_ms = db.Column(db.Float)
+    server_version = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    profile_updated_at = db.Column(db.DateTime(timezone=True))  # profile version that was probed
+    checked_at = db.Column(db.DateTime(timezone=True), default=utcnow, nullable=False)
+
+    @property
+    def is_ok(self) -> bool:
+        return self.status == "ok"
+
+
+class StoredContentMixin:
+    """PDF payload kept in the blob store and referenced by its sha256 hash.
+
+    ``content`` is the legacy inline column; migrated rows keep it NULL. It is
+    deferred so loading a row never pulls PDF bytes unless they are asked for.
+    """
+
+    def store_content(self, data: bytes) -> None:
+        self.content_hash = get_blob_store().put(data)
+        self.file_size = len(data)
+        self.content = None
+
+    def store_upload(self, upload) -> None:
+        """Reference a ``services.uploads.SpooledUpload`` without reading it into memory."""
+        self.content_hash = get_blob_store().put_file(upload.path, upload.content_hash)
+        self.file_size = upload.size
+        self.content = None
+
+    def open_content(self) -> BinaryIO:
+        if self.content_hash:
+            return get_blob_store().open(self.content_hash)
+        return BytesIO(self.content or b"")
+
+    def read_content(self) -> bytes:
+        with self.open_content() as handle:
+            return handle.read()
+
+    @property
+    def has_content(self) -> bool:
+        return bool(self.content_hash or self.content)
+
 
 class Assignment(db.Model):
     __tablename__ = "assignments"
@@ -157,7 +216,7 @@ class Assignment(db.Model):
     )
 
 
-class AssignmentDocument(db.Model):
+class AssignmentDocument(StoredContentMixin, db.Model):
     __tablename__ = "assignment_documents"
 
     id = db.Column(db.Integer, primary_key=True)
@@ -167,7 +226,8 @@ class AssignmentDocument(db.Model):
     filename = db.Column(db.String(255), nullable=False)
     mimetype = db.Column(db.String(120), nullable=False, default="application/pdf")
     file_size = db.Column(db.Integer, nullable=False)
-    content = db.Column(db.LargeBinary, nullable=False)
+    content_hash = db.Column(db.String(64), index=True)
+    content = db.deferred(db.Column(db.LargeBinary), group="payload")
     uploaded_at = db.Column(db.DateTime(timezone=True), default=utcnow)
     notes = db.Column(db.Text)
     summary = db.Column(db.Text)
@@ -182,9 +242,9 @@ class AssignmentDocument(db.Model):
 
     @property
     def base64_content(self):
-        if not self.content:
+        if not self.has_content:
             return None
-        return base64.b64encode(self.content).decode("ascii")
+        return base64.b64encode(self.read_content()).decode("ascii")
 
     def set_summary(self, text: str, model_name: Optional[str] = None):
         self.summary = text.strip() if text else None
@@ -207,7 +267,7 @@ class AssignmentPrompt(db.Model):
     assignment = db.relationship("Assignment", back_populates="prompts")
 
 
-class StudentSubmission(db.Model):
+class StudentSubmission(StoredContentMixin, db.Model):
     __tablename__ = "student_submissions"
 
     id = db.Column(db.Integer, primary_key=True)
@@ -216,11 +276,24 @@ class StudentSubmission(db.Model):
     filename = db.Column(db.String(255), nullable=False)
     mimetype = db.Column(db.String(120), nullable=False, default="application/pdf")
     file_size = db.Column(db.Integer, nullable=False)
-    content = db.Column(db.LargeBinary, nullable=False)
+    content_hash = db.Column(db.String(64), index=True)
+    content = db.deferred(db.Column(db.LargeBinary), group="payload")
     uploaded_at = db.Column(db.DateTime(timezone=True), default=utcnow)
     summary = db.Column(db.Text)
     summary_model = db.Column(db.String(64))
     summary_updated_at = db.Column(db.DateTime(timezone=True))
+    # Rolling summary of conversation turns folded out of the chat context.
+    history_summary = db.Column(db.Text)
+    history_summary_through_id = db.Column(db.Integer)  # last StudentSubmissionMessage.id folded in
+    history_summary_updated_at = db.Column(db.DateTime(timezone=True))
+    # Lecturer-prompt progress, kept in step by services.prompt_progress.
+    prompts_delivered = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    next_prompt_id = db.Column(
+        db.Integer,
+        db.ForeignKey("assignment_prompts.id", ondelete="SET NULL", name="fk_student_submissions_next_prompt_id"),
+        index=True,
+    )
+    last_message_role = db.Column(db.String(20))
 
     assignment = db.relationship("Assignment", back_populates="submissions")
     student = db.relationship("User", back_populates="submissions")
@@ -228,6 +301,7 @@ class StudentSubmission(db.Model):
         "StudentSubmissionMessage",
         back_populates="submission",
         cascade="all, delete-orphan",
+        order_by="[StudentSubmissionMessage.created_at, StudentSubmissionMessage.id]",
     )
 
     __table_args__ = (
@@ -239,27 +313,224 @@ class StudentSubmission(db.Model):
         self.summary_model = model_name
         self.summary_updated_at = utcnow()
 
+    def set_history_summary(self, text: Optional[str], through_id: Optional[int]):
+        self.history_summary = text.strip() if text else None
+        self.history_summary_through_id = through_id
+        self.history_summary_updated_at = utcnow() if text else None
+
 
 class StudentSubmissionMessage(db.Model):
     __tablename__ = "student_submission_messages"
 
+    # Context keys stored as real columns; anything else stays in the JSON ``context``.
+    CONTEXT_COLUMNS = (
+        "prompt_id",
+        "include_lecturer_summary",
+        "include_student_summary",
+        "prompt_tokens",
+        "completion_tokens",
+        "total_tokens",
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     submission_id = db.Column(db.Integer, db.ForeignKey("student_submissions.id"), nullable=False)
     role = db.Column(db.String(20), nullable=False)  # 'student', 'assistant', or 'lecturer'
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime(timezone=True), default=utcnow)
     model = db.Column(db.String(64))
-    context = db.Column(db.Text)
+    prompt_id = db.Column(
+        db.Integer,
+        db.ForeignKey("assignment_prompts.id", ondelete="SET NULL", name="fk_submission_messages_prompt_id"),
+        index=True,
+    )
+    include_lecturer_summary = db.Column(db.Boolean)
+    include_student_summary = db.Column(db.Boolean)
+    prompt_tokens = db.Column(db.Integer)
+    completion_tokens = db.Column(db.Integer)
+    total_tokens = db.Column(db.Integer)
+    context = db.Column(db.Text)  # JSON extras (prompt title, budget decisions, ...)
 
     submission = db.relationship("StudentSubmission", back_populates="messages")
 
+    __table_args__ = (
+        # Serves every history read: WHERE submission_id = ? ORDER BY created_at, id.
+        db.Index("ix_submission_messages_history", "submission_id", "created_at", "id"),
+    )
+
     def set_context(self, **values):
-        self.context = json.dumps(values, ensure_ascii=False)
+        for key in self.CONTEXT_COLUMNS:
+            setattr(self, key, values.pop(key, None))
+        self.context = json.dumps(values, ensure_ascii=False) if values else None
 
     def get_context(self) -> Optional[dict]:
-        if not self.context:
-            return None
+        """Return columns and JSON extras as one dict (the pre-column shape)."""
+        values = {key: getattr(self, key) for key in self.CONTEXT_COLUMNS if getattr(self, key) is not None}
+        if self.context:
+            try:
+                values.update(json.loads(self.context))
+            except json.JSONDecodeError:
+                pass
+        return values or None
+
+
+class BackgroundJob(db.Model):
+    """Persistent work item picked up by ``flask jobs-worker``."""
+
+    __tablename__ = "background_jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(40), nullable=False)  # e.g. 'summarise'
+    target_type = db.Column(db.String(40), nullable=False)
+    target_id = db.Column(db.Integer, nullable=False)
+    model = db.Column(db.String(64))
+    status = db.Column(db.String(20), nullable=False, default="queued")  # queued, running, succeeded, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_after = db.Column(db.DateTime(timezone=True), nullable=False, default=utcnow)
+    locked_at = db.Column(db.DateTime(timezone=True))
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime(timezone=True), default=utcnow)
+    updated_at = db.Column(db.DateTime(timezone=True), default=utcnow, onupdate=utcnow)
+    finished_at = db.Column(db.DateTime(timezone=True))
+
+    __table_args__ = (
+        db.Index("ix_background_jobs_status_run_after", "status", "run_after"),
+        db.Index("ix_background_jobs_target", "target_type", "target_id"),
+    )
+
+    @property
+    def is_pending(self) -> bool:
+        return self.status in ("queued", "running")
+
+
+class SummaryCacheEntry(db.Model):
+    """Summary text reused for byte-identical PDFs summarised with the same settings."""
+
+    __tablename__ = "summary_cache"
+
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    model = db.Column(db.String(64), nullable=False)
+    prompt_version = db.Column(db.Integer, nullable=False)
+    truncate_limit = db.Column(db.Integer, nullable=False)
+    summary = db.Column(db.Text, nullable=False)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime(timezone=True), default=utcnow)
+    last_used_at = db.Column(db.DateTime(timezone=True), nullable=False, default=utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint(
+            "content_hash", "model", "prompt_version", "truncate_limit", name="uq_summary_cache_key"
+        ),
+        db.Index("ix_summary_cache_last_used_at", "last_used_at"),
+    )
+
+
+class CacheStat(db.Model):
+    """Hit/miss counters per named cache, shared by every worker process."""
+
+    __tablename__ = "cache_stats"
+
+    name = db.Column(db.String(40), primary_key=True)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    misses = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def record(cls, name: str, hit: bool) -> None:
+        column = cls.hits if hit else cls.misses
+        updated = (
+            db.session.query(cls)
+            .filter(cls.name == name)
+            .update({column: column + 1}, synchronize_session=False)
+        )
+        if updated:
+            return
         try:
-            return json.loads(self.context)
-        except json.JSONDecodeError:
-            return None
+            with db.session.begin_nested():
+                db.session.add(cls(name=name, hits=int(hit), misses=int(not hit)))
+        except IntegrityError:
+            # Another worker created the row between our update and insert.
+            db.session.query(cls).filter(cls.name == name).update(
+                {column: column + 1}, synchronize_session=False
+            )
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        total = (self.hits or 0) + (self.misses or 0)
+        return (self.hits or 0) / total if total else None
+
+
+class ExtractedText(db.Model):
+    """Plain text pulled out of a stored PDF, shared by every row with the same hash."""
+
+    __tablename__ = "extracted_texts"
+
+    content_hash = db.Column(db.String(64), primary_key=True)
+    text = db.Column(db.Text, nullable=False)
+    page_offsets = db.Column(db.Text, nullable=False)  # JSON list: start offset of each page in ``text``
+    page_count = db.Column(db.Integer, nullable=False)
+    extractor = db.Column(db.String(20), nullable=False)  # 'pypdf' or 'decode'
+    created_at = db.Column(db.DateTime(timezone=True), default=utcnow)
+
+
+class PdfInspection(db.Model):
+    """Pre-flight facts about a stored PDF, shared by every row with the same hash."""
+
+    __tablename__ = "pdf_inspections"
+
+    content_hash = db.Column(db.String(64), primary_key=True)
+    pdf_version = db.Column(db.String(8))
+    page_count = db.Column(db.Integer, nullable=False, default=0)
+    encrypted = db.Column(db.Boolean, nullable=False, default=False)
+    has_text_layer = db.Column(db.Boolean, nullable=False, default=False)
+    estimated_chars = db.Column(db.Integer, nullable=False, default=0)
+    problem = db.Column(db.String(20))  # unreadable, encrypted, no_pages, no_text; NULL when usable
+    created_at = db.Column(db.DateTime(timezone=True), default=utcnow)
+
+
+class SummaryChunk(db.Model):
+    """Cached summary of one chunk of a long document (map step of map-reduce summaries)."""
+
+    __tablename__ = "summary_chunks"
+
+    id = db.Column(db.Integer, primary_key=True)
+    chunk_hash = db.Column(db.String(64), nullable=False)
+    model = db.Column(db.String(64), nullable=False)
+    prompt_version = db.Column(db.Integer, nullable=False)
+    summary = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True), default=utcnow)
+    last_used_at = db.Column(db.DateTime(timezone=True), nullable=False, default=utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint("chunk_hash", "model", "prompt_version", name="uq_summary_chunks_key"),
+        db.Index("ix_summary_chunks_last_used_at", "last_used_at"),
+    )
+
+
+class UploadSession(db.Model):
+    """Resumable upload: chunks are appended to a spool file until it is finalised."""
+
+    __tablename__ = "upload_sessions"
+
+    id = db.Column(db.String(32), primary_key=True)  # random hex handed to the client
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey("users.id", name="fk_upload_sessions_user_id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    filename = db.Column(db.String(255), nullable=False)
+    mimetype = db.Column(db.String(120), nullable=False, default="application/pdf")
+    total_size = db.Column(db.Integer, nullable=False)
+    received = db.Column(db.Integer, nullable=False, default=0)
+    content_hash = db.Column(db.String(64))  # set when the upload is finalised
+    status = db.Column(db.String(20), nullable=False, default="open")  # open, complete
+    created_at = db.Column(db.DateTime(timezone=True), default=utcnow)
+    updated_at = db.Column(db.DateTime(timezone=True), default=utcnow, onupdate=utcnow)
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (db.Index("ix_upload_sessions_expires_at", "expires_at"),)
+
+    @property
+    def is_complete(self) -> bool:
+        return self.status == "complete"
@@ -0,0 +1,204 @@
+"""Content-addressed storage for uploaded PDF artefacts."""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Iterable, Iterator, List, Optional
+
+from flask import current_app
+
+
+_HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobStoreError(RuntimeError):
+    """Raised when a blob cannot be stored or retrieved."""
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobStore(ABC):
+    """Interface for stores that address blobs by their sha256 digest.
+
+    Backends only need to implement the primitive operations; deduplication
+    falls out of the addressing scheme because identical uploads hash to the
+    same key.
+    """
+
+    @abstractmethod
+    def put(self, data: bytes) -> str:
+        ...
+
+    def put_file(self, path: str, content_hash: str) -> str:
+        """Store the file at ``path``, whose sha256 the caller already computed."""
+        with open(path, "rb") as handle:
+            return self.put(handle.read())
+
+    @abstractmethod
+    def open(self, content_hash: str) -> BinaryIO:
+        ...
+
+    @abstractmethod
+    def exists(self, content_hash: str) -> bool:
+        ...
+
+    @abstractmethod
+    def delete(self, content_hash: str) -> None:
+        ...
+
+    @abstractmethod
+    def iter_hashes(self) -> Iterator[str]:
+        ...
+
+    @abstractmethod
+    def modified_at(self, content_hash: str) -> float:
+        ...
+
+    def path_for(self, content_hash: str) -> Optional[str]:
+        """Return a filesystem path for zero-copy serving, if the backend has one."""
+        return None
+
+    def read(self, content_hash: str) -> bytes:
+        with self.open(content_hash) as handle:
+            return handle.read()
+
+    def collect_garbage(self, referenced: Iterable[str], grace_seconds: int = 3600) -> List[str]:
+        """Delete blobs that no row references any more.
+
+        Blobs younger than ``grace_seconds`` are kept so an upload whose row has
+        not been committed yet cannot be collected underneath it.
+        """
+        keep = set(referenced)
+        cutoff = time.time() - grace_seconds
+        removed: List[str] = []
+        for content_hash in list(self.iter_hashes()):
+            if content_hash in keep:
+                continue
+            try:
+                if self.modified_at(content_hash) > cutoff:
+                    continue
+                self.delete(content_hash)
+            except BlobStoreError:
+                continue
+            removed.append(content_hash)
+        return removed
+
+
+class LocalBlobStore(BlobStore):
+    """Store blobs on the local filesystem as ``<root>/ab/cd/abcd…``."""
+
+    def __init__(self, root: str) -> None:
+        self.root = os.path.abspath(root)
+
+    def _path(self, content_hash: str) -> str:
+        if not content_hash or not _HASH_PATTERN.match(content_hash):
+            raise BlobStoreError(f"Invalid blob hash '{content_hash}'.")
+        return os.path.join(self.root, content_hash[:2], content_hash[2:4], content_hash)
+
+    def put(self, data: bytes) -> str:
+        content_hash = hash_bytes(data)
+        path = self._path(content_hash)
+        if os.path.exists(path):
+            # Refresh the timestamp so a concurrent GC run keeps the blob alive.
+            os.utime(path)
+            return content_hash
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise BlobStoreError(f"Could not store blob: {exc}") from exc
+        return content_hash
+
+    def put_file(self, path: str, content_hash: str) -> str:
+        target = self._path(content_hash)
+        if os.path.exists(target):
+            os.utime(target)
+            return content_hash
+
+        directory = os.path.dirname(target)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, f".upload-{os.getpid()}-{os.path.basename(path)}")
+        try:
+            try:
+                os.link(path, tmp_path)
+            except OSError:
+                # Different filesystem (or no hard links): copy in chunks instead.
+                shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, target)
+        except OSError as exc:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise BlobStoreError(f"Could not store blob: {exc}") from exc
+        return content_hash
+
+    def open(self, content_hash: str) -> BinaryIO:
+        try:
+            return open(self._path(content_hash), "rb")
+        except FileNotFoundError as exc:
+            raise BlobStoreError(f"Blob '{content_hash}' is missing from the store.") from exc
+
+    def exists(self, content_hash: str) -> bool:
+        return os.path.exists(self._path(content_hash))
+
+    def delete(self, content_hash: str) -> None:
+        try:
+            os.unlink(self._path(content_hash))
+        except FileNotFoundError:
+            pass
+
+    def iter_hashes(self) -> Iterator[str]:
+        if not os.path.isdir(self.root):
+            return
+        for _dirpath, _dirnames, filenames in os.walk(self.root):
+            for filename in filenames:
+                if _HASH_PATTERN.match(filename):
+                    yield filename
+
+    def modified_at(self, content_hash: str) -> float:
+        try:
+            return os.path.getmtime(self._path(content_hash))
+        except FileNotFoundError as exc:
+            raise BlobStoreError(f"Blob '{content_hash}' is missing from the store.") from exc
+
+    def path_for(self, content_hash: str) -> Optional[str]:
+        path = self._path(content_hash)
+        return path if os.path.exists(path) else None
+
+
+BACKENDS = {
+    "local": LocalBlobStore,
+}
+
+
+def get_blob_store() -> BlobStore:
+    """Return the blob store configured for the current app, creating it on first use."""
+    store = current_app.extensions.get("blob_store")
+    if store is not None:
+        return store
+
+    backend = current_app.config.get("BLOB_STORE_BACKEND") or "local"
+    try:
+        store_cls = BACKENDS[backend]
+    except KeyError as exc:
+        raise BlobStoreError(f"Unknown blob store backend '{backend}'.") from exc
+
+    root = current_app.config.get("BLOB_STORE_PATH") or os.path.join(current_app.instance_path, "blobs")
+    store = store_cls(root)
+    current_app.extensions["blob_store"] = store
+    return store
@@ -0,0 +1,120 @@
+"""Stream every conversation of an assignment as one ZIP of conversation PDFs.
+
+PDFs are laid out on a spawn-based process pool with a bounded number of
+renders in flight, and each one is written to the archive (and handed to the
+caller) as soon as it finishes. Memory therefore stays at roughly one window
+of PDFs no matter how many students the assignment has. Exports already in
+the per-conversation cache are copied instead of re-rendered.
+"""
+from __future__ import annotations
+
+import io
+import re
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+from flask import current_app
+
+from extensions import db
+from models import StudentSubmission, User
+from services import conversation_export, export_pdf
+from services.loaders import load_primary_document
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+class _ZipSink(io.RawIOBase):
+    """Write-only, non-seekable target: ``zipfile`` falls back to data descriptors."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._offset = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def entry_name(username: Optional[str], submission_id: int) -> str:
+    stem = _UNSAFE.sub("_", username or "student").strip("_") or "student"
+    return f"{stem}_{submission_id}.pdf"
+
+
+def _exports(assignment_id: int, workers: int) -> Iterator[Tuple[str, Union[str, bytes]]]:
+    """Yield ``(zip entry name, cached file path or rendered bytes)`` as each is ready."""
+    lecturer_doc = load_primary_document(assignment_id)
+    targets = (
+        db.session.query(StudentSubmission.id, User.username)
+        .join(User, StudentSubmission.student_id == User.id)
+        .filter(StudentSubmission.assignment_id == assignment_id)
+        .order_by(StudentSubmission.id.asc())
+        .all()
+    )
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) if workers > 0 else None
+    pending: Dict[Future, Tuple[str, conversation_export.ExportState]] = {}
+    window = max(workers, 1) * 2
+
+    def _finished(block: bool):
+        if not pending:
+            return
+        done, _ = wait(list(pending), return_when=FIRST_COMPLETED, timeout=None if block else 0)
+        for future in done:
+            name, state = pending.pop(future)
+            pdf_bytes = future.result()
+            conversation_export.store(state, pdf_bytes)
+            yield name, pdf_bytes
+
+    try:
+        for submission_id, username in targets:
+            submission = db.session.get(StudentSubmission, submission_id)
+            name = entry_name(username, submission_id)
+            state = conversation_export.current_state(submission, lecturer_doc)
+            cached = conversation_export.cached_path(state)
+            if cached is not None:
+                yield name, cached
+            else:
+                arguments = conversation_export.pdf_arguments(submission, lecturer_doc)
+                if pool is None:
+                    pdf_bytes = export_pdf.render_conversation_pdf(arguments)
+                    conversation_export.store(state, pdf_bytes)
+                    yield name, pdf_bytes
+                else:
+                    pending[pool.submit(export_pdf.render_conversation_pdf, arguments)] = (name, state)
+            db.session.expunge(submission)
+            yield from _finished(block=len(pending) >= window)
+        while pending:
+            yield from _finished(block=True)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_assignment_zip(assignment_id: int, workers: Optional[int] = None) -> Iterator[bytes]:
+    """Yield the ZIP archive for ``assignment_id`` chunk by chunk."""
+    if workers is None:
+        workers = current_app.config.get("EXPORT_ZIP_WORKERS", 2)
+    sink = _ZipSink()
+    # PDFs are already compressed; storing them keeps the archive cheap to build.
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+        for name, source in _exports(assignment_id, workers):
+            if isinstance(source, str):
+                archive.write(source, name)
+            else:
+                archive.writestr(name, source)
+            yield sink.drain()
+    yield sink.drain()
@@ -1,22 +1,13 @@
 """OpenAI-powered conversation utilities for student submissions."""
 from __future__ import annotations
 
-import os
-from dataclasses import dataclass
-from datetime import datetime, timezone
-from typing import Iterable, List, Optional, Sequence, Tuple
+from contextlib import closing
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
-try:  # newer SDK (>=1.0)
-    from openai import OpenAI  # type: ignore
-except ImportError:  # pragma: no cover
-    OpenAI = None  # type: ignore
-
-try:  # legacy SDK (<1.0)
-    import openai  # type: ignore
-except ImportError:  # pragma: no cover
-    openai = None  # type: ignore
-
-from services.openai_summarizer import SUMMARY_MODELS
+from services import llm_client
+from services.loaders import load_primary_document
+from services.openai_summarizer import CHARS_PER_TOKEN, SUMMARY_MODELS
 
 
 CHAT_MODELS: Sequence[tuple[str, str]] = SUMMARY_MODELS
@@ -33,162 +24,237 @@ class ChatResult:
     prompt_tokens: Optional[int] = None
     completion_tokens: Optional[int] = None
     total_tokens: Optional[int] = None
+    context_budget: Optional[dict] = None
+
+
+BASE_INSTRUCTIONS = (
+    "You are DiaLoque, an academic teaching assistant helping VU students analyse AI mobility "
+    "assignments. Maintain a supportive tone, encourage reflection, and reference the provided "
+    "context. Cite insights from lecturer guidance or the student's own analysis when relevant."
+)
+HISTORY_SUMMARY_PROMPT = (
+    "You keep a running summary of a tutoring conversation between a VU student and the DiaLoque "
+    "assistant. Merge the existing summary with the new turns. Keep the student's claims, open "
+    "questions, lecturer prompts already answered and advice already given. Use <= 200 words."
+)
+
+# Prompt-side token budgets per chat model; the reply has its own max_tokens.
+CONTEXT_TOKEN_BUDGETS = {
+    "gpt-3.5-turbo": 3000,
+    "gpt-4o-mini": 6000,
+    "gpt-5": 8000,
+}
+DEFAULT_CONTEXT_TOKEN_BUDGET = 3000
+MESSAGE_OVERHEAD_TOKENS = 4
+# After a fold, recent turns may fill only this share of the room left for
+# history, so the next fold (an extra model call) is several turns away.
+HISTORY_KEEP_RATIO = 0.5
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Cheap local token estimate (~4 characters per token, like the summariser)."""
+    return MESSAGE_OVERHEAD_TOKENS + -(-len(text or "") // CHARS_PER_TOKEN)
+
+
+def _message_tokens(messages: Iterable[dict]) -> int:
+    return sum(estimate_tokens(message["content"]) for message in messages)
+
+
+@dataclass
+class ContextPlan:
+    """Messages for one chat turn plus the budget decisions that produced them."""
+
+    messages: List[dict]
+    budget: int
+    estimated_tokens: int
+    history_included: int = 0
+    history_folded: int = 0
+    history_dropped: int = 0
+    used_history_summary: bool = False
+    fold_failed: bool = False
+    dropped_context: List[str] = field(default_factory=list)
+
+    def as_context(self) -> dict:
+        return {
+            "budget": self.budget,
+            "estimated_tokens": self.estimated_tokens,
+            "history_included": self.history_included,
+            "history_folded": self.history_folded,
+            "history_dropped": self.history_dropped,
+            "used_history_summary": self.used_history_summary,
+            "fold_failed": self.fold_failed,
+            "dropped_context": list(self.dropped_context),
+        }
+
+
+def _history_entry(msg) -> Optional[dict]:
+    if msg.role == "student":
+        return {"role": "user", "content": msg.content}
+    if msg.role == "assistant":
+        return {"role": "assistant", "content": msg.content}
+    if msg.role == "lecturer":
+        context = msg.get_context() or {}
+        title = context.get("prompt_title")
+        example = context.get("example_response")
+        prompt_content = msg.content.strip()
+        if title:
+            header = f"Lecturer prompt ({title}):\n{prompt_content}"
+        else:
+            header = f"Lecturer prompt:\n{prompt_content}"
+        if example:
+            header = (
+                f"{header}\n\nExample assistant reply previously shared by the lecturer:\n"
+                f"{example.strip()}"
+            )
+        return {"role": "system", "content": header}
+    return None
 
 
-def _get_api_key() -> str:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ConversationError("OPENAI_API_KEY is not configured.")
-    return api_key
+def _history_summary_message(text: str) -> dict:
+    return {"role": "system", "content": "Summary of the earlier conversation:\n" + text.strip()}
 
 
-def _normalize_timestamp(value: Optional[datetime]) -> datetime:
-    if value is None:
-        return datetime.min.replace(tzinfo=timezone.utc)
-    if value.tzinfo is None:
-        return value.replace(tzinfo=timezone.utc)
-    return value.astimezone(timezone.utc)
+def _fold_history(previous_summary: Optional[str], turns: List[dict], model: str) -> str:
+    """Merge ``turns`` into the rolling conversation summary with one model call."""
+    transcript = "\n".join(f"{turn['role']}: {turn['content'].strip()}" for turn in turns)
+    content = f"Existing summary:\n{previous_summary.strip()}\n\n" if previous_summary else ""
+    content += f"New turns:\n{transcript}"
+    messages = [
+        {"role": "system", "content": HISTORY_SUMMARY_PROMPT},
+        {"role": "user", "content": content},
+    ]
+    try:
+        response = llm_client.create_response(messages, model=model, temperature=0.2, max_tokens=300)
+    except llm_client.LLMClientError as exc:
+        raise ConversationError(str(exc)) from exc
+    return response.text
 
 
-def _build_context_messages(
+def build_context(
     submission,
     user_message: str,
+    model: str,
     include_lecturer_summary: bool,
     include_student_summary: bool,
-    max_history: Optional[int] = None,
-) -> List[dict]:
-    """Construct the chat payload with system context, prompts, and history."""
-    messages: List[dict] = []
-
-    base_instructions = (
-        "You are DiaLoque, an academic teaching assistant helping VU students analyse AI mobility "
-        "assignments. Maintain a supportive tone, encourage reflection, and reference the provided "
-        "context. Cite insights from lecturer guidance or the student's own analysis when relevant."
-    )
-    messages.append({"role": "system", "content": base_instructions})
-
-    assignment = submission.assignment
-
+    current_message=None,
+    budget: Optional[int] = None,
+) -> ContextPlan:
+    """Construct the chat payload within the model's token budget.
+
+    History that does not fit is folded into ``submission.history_summary``
+    (the caller commits). ``current_message`` is the already recorded student
+    turn for ``user_message``; it is sent once, as the final user message.
+    """
+    budget = budget or CONTEXT_TOKEN_BUDGETS.get(model, DEFAULT_CONTEXT_TOKEN_BUDGET)
+    dropped_context: List[str] = []
+
+    head: List[Tuple[str, dict]] = [("instructions", {"role": "system", "content": BASE_INSTRUCTIONS})]
     if include_lecturer_summary:
-        lecturer_doc = next((doc for doc in assignment.documents if doc.slot == 1), None)
+        lecturer_doc = load_primary_document(submission.assignment_id)
         if lecturer_doc and lecturer_doc.summary:
-            content = (
-                "Lecturer summary for this assignment:\n" + lecturer_doc.summary.strip()
-            )
-            messages.append({"role": "system", "content": content})
-
+            content = "Lecturer summary for this assignment:\n" + lecturer_doc.summary.strip()
+            head.append(("lecturer_summary", {"role": "system", "content": content}))
     if include_student_summary and submission.summary:
-        messages.append(
-            {
-                "role": "system",
-                "content": "Student's submitted summary:\n" + submission.summary.strip(),
-            }
-        )
-
-    # Conversation history
-    history_source = sorted(
-        submission.messages,
-        key=lambda m: (_normalize_timestamp(m.created_at), m.id or 0),
-    )
-    if max_history is not None and len(history_source) > max_history:
-        history_source = history_source[-max_history:]
-    history: Iterable = history_source
-    for msg in history:
-        if msg.role == "student":
-            role = "user"
-            content = msg.content
-            messages.append({"role": role, "content": content})
-        elif msg.role == "assistant":
-            messages.append({"role": "assistant", "content": msg.content})
-        elif msg.role == "lecturer":
-            context = msg.get_context() or {}
-            title = context.get("prompt_title")
-            example = context.get("example_response")
-            prompt_content = msg.content.strip()
-            if title:
-                header = f"Lecturer prompt ({title}):\n{prompt_content}"
-            else:
-                header = f"Lecturer prompt:\n{prompt_content}"
-            if example:
-                header = (
-                    f"{header}\n\nExample assistant reply previously shared by the lecturer:\n"
-                    f"{example.strip()}"
-                )
-            messages.append({"role": "system", "content": header})
+        content = "Student's submitted summary:\n" + submission.summary.strip()
+        head.append(("student_summary", {"role": "system", "content": content}))
+    tail = {"role": "user", "content": user_message.strip()}
+
+    # Summaries are dropped (student first) only if they alone blow the budget.
+    for name in ("student_summary", "lecturer_summary"):
+        if _message_tokens([m for _, m in head] + [tail]) <= budget:
+            break
+        if any(key == name for key, _ in head):
+            head = [(key, m) for key, m in head if key != name]
+            dropped_context.append(name)
+
+    folded_through = submission.history_summary_through_id or 0
+    # ``submission.messages`` is loaded in (created_at, id) order via the history index.
+    history_source = [
+        msg
+        for msg in submission.messages
+        if msg is not current_message and (msg.id is None or msg.id > folded_through)
+    ]
+    history = [(msg, entry) for msg in history_source if (entry := _history_entry(msg)) is not None]
+
+    fixed = [m for _, m in head] + [tail]
+    summary_text = submission.history_summary
+    available = budget - _message_tokens(fixed)
+    if summary_text:
+        available -= estimate_tokens(_history_summary_message(summary_text)["content"])
+
+    plan = ContextPlan(messages=[], budget=budget, estimated_tokens=0, dropped_context=dropped_context)
+    if _message_tokens(entry for _, entry in history) > available:
+        keep: List[Tuple[object, dict]] = []
+        used = 0
+        for msg, entry in reversed(history):
+            cost = estimate_tokens(entry["content"])
+            if used + cost > max(available, 0) * HISTORY_KEEP_RATIO:
+                break
+            keep.insert(0, (msg, entry))
+            used += cost
+        older = history[: len(history) - len(keep)]
+        try:
+            summary_text = _fold_history(summary_text, [entry for _, entry in older], model)
+        except ConversationError:
+            # Folding is an optimisation; without it the oldest turns are just left out.
+            plan.fold_failed = True
+            plan.history_dropped = len(older)
         else:
-            continue
+            folded_ids = [msg.id for msg, _ in older if msg.id]
+            submission.set_history_summary(summary_text, max(folded_ids, default=folded_through))
+            plan.history_folded = len(older)
+        history = keep
 
-    messages.append({"role": "user", "content": user_message.strip()})
-    return messages
+    messages = [m for _, m in head]
+    if summary_text:
+        messages.append(_history_summary_message(summary_text))
+        plan.used_history_summary = True
+    messages.extend(entry for _, entry in history)
+    messages.append(tail)
 
+    plan.messages = messages
+    plan.history_included = len(history)
+    plan.estimated_tokens = _message_tokens(messages)
+    return plan
 
-def _call_openai(messages: List[dict], model: str) -> ChatResult:
-    api_key = _get_api_key()
-
-    if OpenAI is not None:  # new SDK path
-        client = OpenAI(api_key=api_key)
-        response = client.responses.create(
-            model=model,
-            input=messages,
-        )
-        text = getattr(response, "output_text", None)
-        if not text:
-            output = getattr(response, "output", None)
-            if output:
-                for item in output:
-                    for content in getattr(item, "content", []):
-                        if getattr(content, "type", None) == "text":
-                            value = getattr(getattr(content, "text", None), "value", None)
-                            if value:
-                                text = value
-                                break
-                    if text:
-                        break
-        if not text:
-            raise ConversationError("OpenAI response did not contain text output.")
-
-        usage = getattr(response, "usage", None)
-        prompt_tokens = getattr(usage, "input_tokens", None) if usage else None
-        completion_tokens = getattr(usage, "output_tokens", None) if usage else None
-        total_tokens = getattr(usage, "total_tokens", None) if usage else None
-
-        return ChatResult(
-            text=text.strip(),
-            model=model,
-            prompt_tokens=prompt_tokens,
-            completion_tokens=completion_tokens,
-            total_tokens=total_tokens,
-        )
-
-    if openai is not None:  # legacy SDK path
-        openai.api_key = api_key  # type: ignore[attr-defined]
-        try:
-            response = openai.ChatCompletion.create(  # type: ignore[attr-defined]
-                model=model,
-                messages=messages,
-                temperature=0.4,
-                max_tokens=600,
-            )
-        except AttributeError as exc:  # pragma: no cover
-            raise ConversationError(
-                "Installed 'openai' package is outdated. Upgrade to >=0.28 or install the new SDK."
-            ) from exc
 
-        try:
-            text = response["choices"][0]["message"]["content"]
-        except (KeyError, IndexError, TypeError) as exc:
-            raise ConversationError("OpenAI response did not contain text output.") from exc
+def _call_openai(messages: List[dict], model: str) -> ChatResult:
+    try:
+        response = llm_client.create_response(messages, model=model, temperature=0.4, max_tokens=600)
+    except llm_client.LLMClientError as exc:
+        raise ConversationError(str(exc)) from exc
+    return ChatResult(
+        text=response.text,
+        model=model,
+        prompt_tokens=response.prompt_tokens,
+        completion_tokens=response.completion_tokens,
+        total_tokens=response.total_tokens,
+    )
 
-        usage = response.get("usage", {})
-        return ChatResult(
-            text=(text or "").strip(),
-            model=model,
-            prompt_tokens=usage.get("prompt_tokens"),
-            completion_tokens=usage.get("completion_tokens"),
-            total_tokens=usage.get("total_tokens"),
-        )
 
-    raise ConversationError("The 'openai' package is not installed. Run 'pip install openai'.")
+def _stream_openai(messages: List[dict], model: str) -> Iterator[Union[str, ChatResult]]:
+    try:
+        with closing(llm_client.stream_response(messages, model=model, temperature=0.4, max_tokens=600)) as stream:
+            for item in stream:
+                if isinstance(item, llm_client.LLMResponse):
+                    yield ChatResult(
+                        text=item.text,
+                        model=model,
+                        prompt_tokens=item.prompt_tokens,
+                        completion_tokens=item.completion_tokens,
+                        total_tokens=item.total_tokens,
+                    )
+                else:
+                    yield item
+    except llm_client.LLMClientError as exc:
+        raise ConversationError(str(exc)) from exc
+
+
+def _validate_request(user_message: str, model: str) -> None:
+    if model not in {choice for choice, _ in CHAT_MODELS}:
+        raise ConversationError(f"Unsupported model '{model}'.")
+    if not user_message or not user_message.strip():
+        raise ConversationError("Message cannot be empty.")
 
 
 def generate_chat_response(
@@ -197,16 +263,42 @@ def generate_chat_response(
     model: str,
     include_lecturer_summary: bool = True,
     include_student_summary: bool = True,
+    current_message=None,
 ) -> ChatResult:
-    if model not in {choice for choice, _ in CHAT_MODELS}:
-        raise ConversationError(f"Unsupported model '{model}'.")
-    if not user_message or not user_message.strip():
-        raise ConversationError("Message cannot be empty.")
+    _validate_request(user_message, model)
+    plan = build_context(
+        submission=submission,
+        user_message=user_message,
+        model=model,
+        include_lecturer_summary=include_lecturer_summary,
+        include_student_summary=include_student_summary,
+        current_message=current_message,
+    )
+    result = _call_openai(plan.messages, model=model)
+    result.context_budget = plan.as_context()
+    return result
+
 
-    messages = _build_context_messages(
+def stream_chat_response(
+    submission,
+    user_message: str,
+    model: str,
+    include_lecturer_summary: bool = True,
+    include_student_summary: bool = True,
+    current_message=None,
+) -> Iterator[Union[str, ChatResult]]:
+    """Yield text deltas as the model produces them, then a final ChatResult with usage."""
+    _validate_request(user_message, model)
+    plan = build_context(
         submission=submission,
         user_message=user_message,
+        model=model,
         include_lecturer_summary=include_lecturer_summary,
         include_student_summary=include_student_summary,
+        current_message=current_message,
     )
-    return _call_openai(messages, model=model)
+    with closing(_stream_openai(plan.messages, model=model)) as stream:
+        for item in stream:
+            if isinstance(item, ChatResult):
+                item.context_budget = plan.as_context()
+            yield item
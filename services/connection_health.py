@@ -0,0 +1,158 @@
+"""Concurrent reachability checks for the project databases in ``ConnectionProfile``.
+
+:func:`sweep` probes every profile on a bounded thread pool using the pooled
+engines from :mod:`services.engine_registry`. Each probe gets a hard deadline
+counted from the moment it starts, so one unreachable server cannot hold up
+the rest; a probe past its deadline is reported as ``timeout`` and left to
+finish on its own (the driver's connect timeout ends it). :func:`record`
+stores the outcome in ``connection_health`` and the admin page shows those
+rows instead of probing on every view.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from flask import current_app
+
+from extensions import db
+from models import ConnectionHealth, ConnectionProfile, utcnow
+from services import engine_registry
+
+logger = logging.getLogger(__name__)
+
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+STATUS_TIMEOUT = "timeout"
+
+ERROR_LIMIT = 500
+
+
+@dataclass(frozen=True)
+class ProbeResult:
+    profile_id: int
+    status: str
+    latency_ms: Optional[float] = None
+    server_version: Optional[str] = None
+    error: Optional[str] = None
+    profile_updated_at: Optional[object] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == STATUS_OK
+
+
+def _error_text(exc: BaseException) -> str:
+    lines = str(exc).strip().splitlines()
+    text = lines[0] if lines else exc.__class__.__name__
+    return text[:ERROR_LIMIT]
+
+
+def _probe(engine) -> tuple:
+    started = time.perf_counter()
+    try:
+        with engine.connect() as connection:
+            version = engine_registry.server_version(connection)
+    except Exception as exc:  # noqa: BLE001 - any driver failure means "unreachable"
+        return STATUS_ERROR, (time.perf_counter() - started) * 1000, None, _error_text(exc)
+    return STATUS_OK, (time.perf_counter() - started) * 1000, version[:255], None
+
+
+def sweep(
+    profiles: Optional[Iterable[ConnectionProfile]] = None,
+    workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> List[ProbeResult]:
+    """Probe ``profiles`` (default: all) concurrently and return one result per profile."""
+    config = current_app.config
+    workers = workers or config.get("HEALTH_SWEEP_WORKERS", 8)
+    timeout = timeout or config.get("HEALTH_PROBE_TIMEOUT", 10)
+    if profiles is None:
+        profiles = db.session.query(ConnectionProfile).order_by(ConnectionProfile.project, ConnectionProfile.name)
+    profiles = list(profiles)
+
+    results: Dict[int, ProbeResult] = {}
+    engines = {}
+    for profile in profiles:
+        # Engines are built here: the registry reads pool settings from the app config.
+        try:
+            engines[profile.id] = engine_registry.engine_for(profile)
+        except Exception as exc:  # noqa: BLE001 - e.g. the ODBC driver is not installed
+            results[profile.id] = ProbeResult(
+                profile.id, STATUS_ERROR, error=_error_text(exc), profile_updated_at=profile.updated_at
+            )
+    if not engines:
+        return [results[profile.id] for profile in profiles]
+
+    stamps = {profile.id: profile.updated_at for profile in profiles}
+    started: Dict[int, float] = {}
+
+    def run(profile_id, engine):
+        started[profile_id] = time.monotonic()
+        return _probe(engine)
+
+    pool_size = min(workers, len(engines))
+    # Safety net for probes that never get a worker because others hang past their deadline.
+    overall_deadline = time.monotonic() + timeout * (math.ceil(len(engines) / pool_size) + 1)
+    executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="connection-health")
+    try:
+        pending = {executor.submit(run, profile_id, engine): profile_id for profile_id, engine in engines.items()}
+        while pending:
+            now = time.monotonic()
+            for future, profile_id in list(pending.items()):
+                begun = started.get(profile_id)
+                if future.done() or (begun is None and now < overall_deadline):
+                    continue
+                if now >= overall_deadline or now - begun >= timeout:
+                    del pending[future]
+                    future.cancel()
+                    results[profile_id] = ProbeResult(
+                        profile_id,
+                        STATUS_TIMEOUT,
+                        latency_ms=(now - begun) * 1000 if begun is not None else None,
+                        error=f"Geen antwoord binnen {timeout:g} s",
+                        profile_updated_at=stamps[profile_id],
+                    )
+            if not pending:
+                break
+            expiries = [started[pid] + timeout for pid in pending.values() if pid in started]
+            wake = min(expiries + [overall_deadline])
+            done, _ = wait(list(pending), timeout=max(0.0, wake - time.monotonic()), return_when=FIRST_COMPLETED)
+            for future in done:
+                profile_id = pending.pop(future)
+                status, latency, version, error = future.result()
+                results[profile_id] = ProbeResult(
+                    profile_id, status, latency, version, error, profile_updated_at=stamps[profile_id]
+                )
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for result in results.values():
+        if not result.ok:
+            logger.info("Connection profile %s: %s (%s)", result.profile_id, result.status, result.error)
+    return [results[profile.id] for profile in profiles]
+
+
+def record(results: Iterable[ProbeResult]) -> None:
+    """Store ``results`` as the last-known status of their profiles; the caller commits."""
+    checked_at = utcnow()
+    for result in results:
+        row = db.session.get(ConnectionHealth, result.profile_id)
+        if row is None:
+            row = ConnectionHealth(profile_id=result.profile_id)
+            db.session.add(row)
+        row.status = result.status
+        row.latency_ms = result.latency_ms
+        row.server_version = result.server_version
+        row.error = result.error
+        row.profile_updated_at = result.profile_updated_at
+        row.checked_at = checked_at
+
+
+def latest() -> Dict[int, ConnectionHealth]:
+    """Last-known status per profile id, without probing anything."""
+    return {row.profile_id: row for row in db.session.query(ConnectionHealth)}
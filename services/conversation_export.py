@@ -0,0 +1,186 @@
+"""Conversation PDF exports, rendered once per conversation state and cached on disk.
+
+An export is identified by an ETag derived from the submission id, the last
+message (id, timestamp, count), both summary timestamps and the assignment
+title, so any change to what the PDF shows yields a new file. Long
+conversations are rendered by the job worker instead of in the request.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from flask import current_app
+from sqlalchemy import func
+
+from extensions import db
+from models import AssignmentDocument, BackgroundJob, StudentSubmission, StudentSubmissionMessage
+from services import export_pdf, jobs
+from services.loaders import load_primary_document
+
+EXPORT_FORMAT_VERSION = 1
+
+
+@dataclass(frozen=True)
+class ExportState:
+    submission_id: int
+    etag: str
+    last_modified: Optional[datetime]
+    message_count: int
+
+
+def _aware(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def current_state(submission: StudentSubmission, lecturer_doc: Optional[AssignmentDocument]) -> ExportState:
+    """Describe what an export of ``submission`` would contain, with one aggregate query."""
+    last_id, last_at, count = (
+        db.session.query(
+            func.max(StudentSubmissionMessage.id),
+            func.max(StudentSubmissionMessage.created_at),
+            func.count(StudentSubmissionMessage.id),
+        )
+        .filter(StudentSubmissionMessage.submission_id == submission.id)
+        .one()
+    )
+    lecturer_updated = lecturer_doc.summary_updated_at if lecturer_doc else None
+    parts = (
+        EXPORT_FORMAT_VERSION,
+        submission.id,
+        last_id or 0,
+        _aware(last_at).isoformat() if last_at else "",
+        count,
+        _aware(submission.summary_updated_at).isoformat() if submission.summary_updated_at else "",
+        _aware(lecturer_updated).isoformat() if lecturer_updated else "",
+        submission.assignment.title,
+    )
+    etag = hashlib.sha256("|".join(map(str, parts)).encode("utf-8")).hexdigest()[:32]
+    stamps = [_aware(value) for value in (last_at, submission.summary_updated_at, lecturer_updated) if value]
+    return ExportState(
+        submission_id=submission.id,
+        etag=etag,
+        last_modified=max(stamps) if stamps else None,
+        message_count=count,
+    )
+
+
+def _export_root() -> str:
+    return current_app.config.get("EXPORT_CACHE_PATH") or os.path.join(current_app.instance_path, "exports")
+
+
+def _export_dir(submission_id: int) -> str:
+    return os.path.join(_export_root(), str(submission_id))
+
+
+def remove(submission_ids: Iterable[int]) -> None:
+    """Delete the cached exports of ``submission_ids`` (after their rows are deleted)."""
+    for submission_id in submission_ids:
+        shutil.rmtree(_export_dir(submission_id), ignore_errors=True)
+
+
+def prune() -> int:
+    """Delete export directories whose submission no longer exists."""
+    root = _export_root()
+    if not os.path.isdir(root):
+        return 0
+    names = [name for name in os.listdir(root) if name.isdigit()]
+    live = {
+        row[0]
+        for row in db.session.query(StudentSubmission.id).filter(StudentSubmission.id.in_([int(n) for n in names]))
+    } if names else set()
+    stale = [int(name) for name in names if int(name) not in live]
+    remove(stale)
+    return len(stale)
+
+
+def cached_path(state: ExportState) -> Optional[str]:
+    path = os.path.join(_export_dir(state.submission_id), f"{state.etag}.pdf")
+    return path if os.path.exists(path) else None
+
+
+def renders_in_background(state: ExportState) -> bool:
+    return state.message_count >= current_app.config.get("EXPORT_BACKGROUND_MIN_MESSAGES", 150)
+
+
+def pdf_arguments(submission: StudentSubmission, lecturer_doc: Optional[AssignmentDocument]) -> dict:
+    """Plain, picklable keyword arguments for :func:`export_pdf.build_conversation_pdf`."""
+    rows = (
+        db.session.query(
+            StudentSubmissionMessage.role,
+            StudentSubmissionMessage.content,
+            StudentSubmissionMessage.created_at,
+        )
+        .filter(StudentSubmissionMessage.submission_id == submission.id)
+        .order_by(StudentSubmissionMessage.created_at.asc(), StudentSubmissionMessage.id.asc())
+    )
+    return {
+        "assignment_title": submission.assignment.title,
+        "lecturer_summary": lecturer_doc.summary if lecturer_doc else None,
+        "lecturer_model": lecturer_doc.summary_model if lecturer_doc else None,
+        "student_summary": submission.summary,
+        "student_model": submission.summary_model,
+        "conversation": [
+            {
+                "role": role,
+                "content": content,
+                "timestamp": created_at.strftime("%d %b %Y %H:%M") if created_at else None,
+            }
+            for role, content, created_at in rows
+        ],
+    }
+
+
+def store(state: ExportState, pdf_bytes) -> str:
+    """Write a rendered export under its ETag and drop older renders of the conversation."""
+    directory = _export_dir(state.submission_id)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{state.etag}.pdf")
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "wb") as handle:
+        handle.write(pdf_bytes)
+    os.replace(tmp, path)
+    for name in os.listdir(directory):
+        if name.endswith(".pdf") and name != os.path.basename(path):
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+    return path
+
+
+def render(
+    submission: StudentSubmission,
+    lecturer_doc: Optional[AssignmentDocument] = None,
+    state: Optional[ExportState] = None,
+) -> str:
+    """Build the PDF for ``submission``, store it under its ETag and return the path."""
+    if lecturer_doc is None:
+        lecturer_doc = load_primary_document(submission.assignment_id)
+    if state is None:
+        state = current_state(submission, lecturer_doc)
+
+    pdf_stream = export_pdf.build_conversation_pdf(**pdf_arguments(submission, lecturer_doc))
+    return store(state, pdf_stream.getbuffer())
+
+
+def enqueue(submission: StudentSubmission) -> BackgroundJob:
+    return jobs.enqueue("export_conversation", submission)
+
+
+@jobs.register_handler("export_conversation")
+def _run_export(job: BackgroundJob) -> None:
+    submission = jobs.load_target(job)
+    if submission is None:
+        raise jobs.JobError("The conversation for this job no longer exists.")
+    lecturer_doc = load_primary_document(submission.assignment_id)
+    state = current_state(submission, lecturer_doc)
+    if cached_path(state) is None:
+        render(submission, lecturer_doc, state)
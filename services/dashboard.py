@@ -0,0 +1,106 @@
+"""Single-pass view-model loader for the student dashboard.
+
+Everything ``student_dashboard.html`` renders is fetched here with a fixed
+number of queries (see :data:`DASHBOARD_QUERIES`), independent of how many
+submissions, prompts or messages exist, so the route never lazy-loads.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import load_only
+from sqlalchemy.orm.attributes import set_committed_value
+
+from extensions import db
+from models import (
+    Assignment,
+    AssignmentDocument,
+    AssignmentPrompt,
+    BackgroundJob,
+    StudentSubmission,
+    StudentSubmissionMessage,
+)
+from services import jobs
+from services.loaders import SUBMISSION_METADATA_COLUMNS, load_primary_document
+
+# assignments, prompt count, primary document, submissions, latest job, messages.
+DASHBOARD_QUERIES = 6
+
+
+@dataclass
+class StudentDashboard:
+    assignments: List[Assignment]
+    active_assignment: Optional[Assignment] = None
+    primary_document: Optional[AssignmentDocument] = None
+    submissions: List[StudentSubmission] = field(default_factory=list)
+    prompt_count: int = 0
+    summary_job: Optional[BackgroundJob] = None
+    messages: List[StudentSubmissionMessage] = field(default_factory=list)
+
+    @property
+    def active_submission(self) -> Optional[StudentSubmission]:
+        return self.submissions[0] if self.submissions else None
+
+
+def load_assignments() -> List[Assignment]:
+    return (
+        db.session.query(Assignment)
+        .options(load_only(Assignment.id, Assignment.title, Assignment.created_at))
+        .order_by(Assignment.created_at.desc())
+        .all()
+    )
+
+
+def load_student_dashboard(
+    student_id: int,
+    assignment_id: Optional[int],
+    assignments: Optional[List[Assignment]] = None,
+    with_conversation: bool = False,
+) -> StudentDashboard:
+    """Load the dashboard for ``student_id``; pass ``assignments`` if already fetched."""
+    if assignments is None:
+        assignments = load_assignments()
+    view = StudentDashboard(assignments=assignments)
+    view.active_assignment = next((assn for assn in assignments if assn.id == assignment_id), None)
+    if view.active_assignment is None:
+        return view
+
+    assignment_id = view.active_assignment.id
+    view.prompt_count = (
+        db.session.query(func.count(AssignmentPrompt.id))
+        .filter(AssignmentPrompt.assignment_id == assignment_id)
+        .scalar()
+    )
+    view.primary_document = load_primary_document(assignment_id)
+    view.submissions = (
+        db.session.query(StudentSubmission)
+        .options(
+            load_only(
+                *SUBMISSION_METADATA_COLUMNS,
+                StudentSubmission.summary,
+                # The chat POST hands the active submission to chat_llm.build_context.
+                StudentSubmission.history_summary,
+                StudentSubmission.history_summary_through_id,
+            )
+        )
+        .filter_by(assignment_id=assignment_id, student_id=student_id)
+        .order_by(StudentSubmission.uploaded_at.desc())
+        .all()
+    )
+
+    active = view.active_submission
+    if active is None:
+        return view
+    view.summary_job = jobs.latest_job_for(active)
+    if with_conversation:
+        view.messages = (
+            db.session.query(StudentSubmissionMessage)
+            .filter_by(submission_id=active.id)
+            .order_by(StudentSubmissionMessage.created_at.asc(), StudentSubmissionMessage.id.asc())
+            .all()
+        )
+        # Later readers of ``active.messages`` (prompt delivery, chat) reuse this list.
+        set_committed_value(active, "messages", list(view.messages))
+    return view
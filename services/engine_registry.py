@@ -0,0 +1,102 @@
+"""Process-wide SQLAlchemy engines for the project databases in ``ConnectionProfile``.
+
+``sa.create_engine`` per request built a new connection pool every time and
+never disposed it. Here each profile gets one lazily built engine with a
+bounded pool, ``pool_pre_ping`` and a connect timeout, cached under the
+profile's ``(id, updated_at)``: editing a profile (in any worker) changes the
+key, so the next caller builds a fresh engine and the stale one is disposed.
+The routes that save or delete a profile also call :func:`dispose` directly.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy.engine import Engine, make_url
+
+_lock = threading.Lock()
+_engines: Dict[int, Tuple[object, Engine]] = {}  # profile id -> (updated_at, engine)
+
+
+def _forget_engines() -> None:
+    # A forked child must not share pooled sockets with its parent; dropping the
+    # references (without closing) leaves the parent's connections alone.
+    _engines.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_engines)
+
+
+def _engine_options(uri: str) -> dict:
+    config = current_app.config
+    options = {
+        "pool_pre_ping": True,
+        "pool_recycle": config.get("PROJECT_DB_POOL_RECYCLE", 1800),
+        "pool_size": config.get("PROJECT_DB_POOL_SIZE", 2),
+        # pyodbc: login timeout; sqlite3: how long to wait for a lock.
+        "connect_args": {"timeout": config.get("PROJECT_DB_CONNECT_TIMEOUT", 5)},
+    }
+    url = make_url(uri)
+    # In-memory SQLite uses a per-thread pool that has no overflow or checkout timeout.
+    if not (url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")):
+        options["max_overflow"] = config.get("PROJECT_DB_MAX_OVERFLOW", 3)
+        options["pool_timeout"] = config.get("PROJECT_DB_POOL_TIMEOUT", 10)
+    return options
+
+
+def engine_for(profile) -> Engine:
+    """Return the shared engine for ``profile``, rebuilding it if the profile changed."""
+    stamp = profile.updated_at
+    entry = _engines.get(profile.id)
+    if entry is not None and entry[0] == stamp:
+        return entry[1]
+
+    uri = profile.build_uri()
+    with _lock:
+        entry = _engines.get(profile.id)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        engine = sa.create_engine(uri, **_engine_options(uri))
+        _engines[profile.id] = (stamp, engine)
+    if entry is not None:
+        entry[1].dispose()
+    return engine
+
+
+def dispose(profile_id: int) -> None:
+    """Close the pooled connections of ``profile_id`` (after it is saved or deleted)."""
+    with _lock:
+        entry = _engines.pop(profile_id, None)
+    if entry is not None:
+        entry[1].dispose()
+
+
+def dispose_all() -> None:
+    with _lock:
+        entries = list(_engines.values())
+        _engines.clear()
+    for _, engine in entries:
+        engine.dispose()
+
+
+def cached_engine(profile_id: int) -> Optional[Engine]:
+    entry = _engines.get(profile_id)
+    return entry[1] if entry is not None else None
+
+
+def server_version(connection) -> str:
+    """A one-line server version string for the dialect behind ``connection``."""
+    dialect = connection.dialect.name
+    if dialect == "mssql":
+        version = connection.execute(sa.text("SELECT @@VERSION")).scalar()
+    elif dialect == "sqlite":
+        version = "SQLite " + connection.execute(sa.text("SELECT sqlite_version()")).scalar()
+    else:
+        info = connection.dialect.server_version_info or ()
+        version = f"{dialect} {'.'.join(str(part) for part in info)}"
+    lines = (version or "").strip().splitlines()
+    return lines[0].strip() if lines else ""
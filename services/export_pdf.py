@@ -101,3 +101,8 @@ def build_conversation_pdf(
     pdf.add_conversation(conversation)
 
     return pdf.output()
+
+
+def render_conversation_pdf(arguments: dict) -> bytes:
+    """Process-pool entry point: ``build_conversation_pdf(**arguments)`` as raw bytes."""
+    return build_conversation_pdf(**arguments).getvalue()
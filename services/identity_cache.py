@@ -0,0 +1,150 @@
+"""In-process identity cache behind ``load_user`` and ``role_required``.
+
+Each worker keeps a bounded LRU of user id -> (active flag, role names,
+project names) for ``IDENTITY_CACHE_TTL`` seconds, so authenticated requests
+authorise without touching the database. Admin changes call
+:func:`invalidate`, which also replaces a version-stamp file; every worker
+compares that file's identity on lookup and drops its cache when it moved.
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import FrozenSet, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy.orm import selectinload
+
+from extensions import db
+from models import User
+
+
+@dataclass(frozen=True)
+class CachedIdentity:
+    """What authorisation needs from a user, detached from any session.
+
+    Implements the Flask-Login user interface, so it is what ``current_user``
+    resolves to; routes that need the ORM row load it by ``id``.
+    """
+
+    id: int
+    is_active: bool
+    role_names: FrozenSet[str]
+    project_names: Tuple[str, ...]
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def get_id(self) -> str:
+        return str(self.id)
+
+    def has_role(self, *names: str) -> bool:
+        return any(name in self.role_names for name in names)
+
+
+class _IdentityLRU:
+    def __init__(self):
+        self._items: "OrderedDict[int, Tuple[float, CachedIdentity]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stamp = None
+
+    def get(self, user_id: int, stamp, ttl: float) -> Optional[CachedIdentity]:
+        with self._lock:
+            if stamp != self._stamp:
+                self._items.clear()
+                self._stamp = stamp
+                return None
+            item = self._items.get(user_id)
+            if item is None:
+                return None
+            if time.monotonic() - item[0] > ttl:
+                del self._items[user_id]
+                return None
+            self._items.move_to_end(user_id)
+            return item[1]
+
+    def put(self, identity: CachedIdentity, stamp, capacity: int) -> None:
+        with self._lock:
+            if stamp != self._stamp:
+                self._items.clear()
+                self._stamp = stamp
+            self._items[identity.id] = (time.monotonic(), identity)
+            self._items.move_to_end(identity.id)
+            while len(self._items) > max(capacity, 0):
+                self._items.popitem(last=False)
+
+    def discard(self, user_id: Optional[int]) -> None:
+        with self._lock:
+            if user_id is None:
+                self._items.clear()
+            else:
+                self._items.pop(user_id, None)
+
+
+_cache = _IdentityLRU()
+
+
+def _stamp_path() -> str:
+    return current_app.config.get("IDENTITY_CACHE_STAMP_PATH") or os.path.join(
+        current_app.instance_path, "identity-cache.version"
+    )
+
+
+def _read_stamp():
+    # A stat, not a read: _bump_stamp() swaps in a new file, so inode and mtime change.
+    try:
+        info = os.stat(_stamp_path())
+    except FileNotFoundError:
+        return None
+    return info.st_ino, info.st_mtime_ns
+
+
+def _bump_stamp() -> None:
+    path = _stamp_path()
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".identity-")
+    with os.fdopen(fd, "w") as handle:
+        handle.write(str(time.time_ns()))
+    os.replace(tmp, path)
+
+
+def _load_from_db(user_id: int) -> Optional[CachedIdentity]:
+    user = db.session.get(
+        User,
+        user_id,
+        options=[selectinload(User.roles), selectinload(User.project_links)],
+    )
+    if user is None:
+        return None
+    return CachedIdentity(
+        id=user.id,
+        is_active=bool(user.is_active),
+        role_names=frozenset(role.name for role in user.roles),
+        project_names=tuple(user.project_names),
+    )
+
+
+def load(user_id: int) -> Optional[CachedIdentity]:
+    config = current_app.config
+    stamp = _read_stamp()
+    identity = _cache.get(user_id, stamp, config.get("IDENTITY_CACHE_TTL", 60))
+    if identity is None:
+        identity = _load_from_db(user_id)
+        if identity is not None:
+            _cache.put(identity, stamp, config.get("IDENTITY_CACHE_SIZE", 1024))
+    return identity
+
+
+def invalidate(user_id: Optional[int] = None) -> None:
+    """Forget ``user_id`` (or everyone) here and tell other workers to do the same."""
+    _cache.discard(user_id)
+    _bump_stamp()
+
+
+def clear() -> None:
+    _cache.discard(None)
@@ -0,0 +1,268 @@
+"""Database-backed background job queue (summaries and other slow work)."""
+from __future__ import annotations
+
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+
+from flask import current_app
+from sqlalchemy import and_, or_
+
+from extensions import db
+from models import AssignmentDocument, BackgroundJob, StudentSubmission, utcnow
+from services import pdf_inspect, sql_profiler, summary_cache, text_store
+from services.openai_summarizer import SUMMARY_MODELS, PartialSummaryError, SummarizationError, summarise_text
+
+
+logger = logging.getLogger(__name__)
+
+TARGET_MODELS = {
+    "assignment_document": AssignmentDocument,
+    "student_submission": StudentSubmission,
+}
+
+JobHandler = Callable[[BackgroundJob], None]
+HANDLERS: Dict[str, JobHandler] = {}
+
+
+class JobError(RuntimeError):
+    """Raised when a job cannot be queued or executed."""
+
+
+class PermanentJobError(JobError):
+    """Raised when retrying a job cannot help; the job fails without further attempts."""
+
+
+def register_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    def deco(fn: JobHandler) -> JobHandler:
+        HANDLERS[kind] = fn
+        return fn
+    return deco
+
+
+def _target_type(target) -> str:
+    for name, model in TARGET_MODELS.items():
+        if isinstance(target, model):
+            return name
+    raise JobError(f"Unsupported job target {type(target).__name__}.")
+
+
+def load_target(job: BackgroundJob):
+    model = TARGET_MODELS.get(job.target_type)
+    if model is None:
+        raise JobError(f"Unknown job target type '{job.target_type}'.")
+    return db.session.get(model, job.target_id)
+
+
+def pending_job_for(target, kind: str = "summarise") -> Optional[BackgroundJob]:
+    return (
+        db.session.query(BackgroundJob)
+        .filter(
+            BackgroundJob.kind == kind,
+            BackgroundJob.target_type == _target_type(target),
+            BackgroundJob.target_id == target.id,
+            BackgroundJob.status.in_(("queued", "running")),
+        )
+        .order_by(BackgroundJob.id.desc())
+        .first()
+    )
+
+
+def latest_job_for(target, kind: str = "summarise") -> Optional[BackgroundJob]:
+    return (
+        db.session.query(BackgroundJob)
+        .filter_by(kind=kind, target_type=_target_type(target), target_id=target.id)
+        .order_by(BackgroundJob.id.desc())
+        .first()
+    )
+
+
+def enqueue(kind: str, target, model: Optional[str] = None) -> BackgroundJob:
+    """Queue ``kind`` for ``target``; the caller commits the session.
+
+    A job that is still waiting for the same target is reused so repeated
+    clicks do not pile up duplicate work.
+    """
+    if kind not in HANDLERS:
+        raise JobError(f"No handler registered for job kind '{kind}'.")
+    if target.id is None:
+        db.session.flush()
+
+    existing = pending_job_for(target, kind=kind)
+    if existing is not None and existing.status == "queued":
+        existing.model = model
+        return existing
+
+    job = BackgroundJob(
+        kind=kind,
+        target_type=_target_type(target),
+        target_id=target.id,
+        model=model,
+        max_attempts=current_app.config.get("JOB_MAX_ATTEMPTS", 3),
+        run_after=utcnow(),
+    )
+    db.session.add(job)
+    return job
+
+
+def enqueue_summary(target, model: str) -> BackgroundJob:
+    if model not in {choice for choice, _ in SUMMARY_MODELS}:
+        raise SummarizationError(f"Unsupported model '{model}'.")
+    return enqueue("summarise", target, model=model)
+
+
+def backoff_delay(attempts: int) -> float:
+    base = current_app.config.get("JOB_RETRY_BASE_SECONDS", 15)
+    ceiling = current_app.config.get("JOB_RETRY_MAX_SECONDS", 900)
+    return min(base * (2 ** max(attempts - 1, 0)), ceiling)
+
+
+def claim_next(now: Optional[datetime] = None) -> Optional[BackgroundJob]:
+    """Atomically move the next runnable job to ``running`` and return it.
+
+    The claim is a conditional UPDATE, so several workers can poll the same
+    table without running a job twice. Jobs whose lease expired (worker
+    crashed mid-run) become claimable again.
+    """
+    now = now or utcnow()
+    lease_cutoff = now - timedelta(seconds=current_app.config.get("JOB_LEASE_SECONDS", 600))
+    runnable = or_(
+        and_(BackgroundJob.status == "queued", BackgroundJob.run_after <= now),
+        and_(BackgroundJob.status == "running", BackgroundJob.locked_at < lease_cutoff),
+    )
+
+    while True:
+        candidate = (
+            db.session.query(BackgroundJob.id, BackgroundJob.status, BackgroundJob.locked_at)
+            .filter(runnable)
+            .order_by(BackgroundJob.run_after.asc(), BackgroundJob.id.asc())
+            .first()
+        )
+        if candidate is None:
+            db.session.rollback()
+            return None
+
+        job_id, status, locked_at = candidate
+        claimed = (
+            db.session.query(BackgroundJob)
+            .filter(
+                BackgroundJob.id == job_id,
+                BackgroundJob.status == status,
+                BackgroundJob.locked_at.is_(None) if locked_at is None else BackgroundJob.locked_at == locked_at,
+            )
+            .update(
+                {
+                    BackgroundJob.status: "running",
+                    BackgroundJob.locked_at: now,
+                    BackgroundJob.attempts: BackgroundJob.attempts + 1,
+                },
+                synchronize_session=False,
+            )
+        )
+        db.session.commit()
+        if claimed:
+            return db.session.get(BackgroundJob, job_id, populate_existing=True)
+
+
+def run_job(job: BackgroundJob) -> BackgroundJob:
+    handler = HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise JobError(f"No handler registered for job kind '{job.kind}'.")
+        with sql_profiler.labelled(f"job {job.kind} #{job.id}"):
+            handler(job)
+    except Exception as exc:  # noqa: BLE001 - every failure is recorded on the job
+        db.session.rollback()
+        job = db.session.get(BackgroundJob, job.id)
+        job.last_error = str(exc) or exc.__class__.__name__
+        job.locked_at = None
+        if job.attempts >= job.max_attempts or isinstance(exc, PermanentJobError):
+            job.status = "failed"
+            job.finished_at = utcnow()
+            logger.warning("Job %s failed permanently: %s", job.id, job.last_error)
+        else:
+            job.status = "queued"
+            job.run_after = utcnow() + timedelta(seconds=backoff_delay(job.attempts))
+            logger.info("Job %s failed (attempt %s), retrying: %s", job.id, job.attempts, job.last_error)
+    else:
+        job.status = "succeeded"
+        job.last_error = None
+        job.locked_at = None
+        job.finished_at = utcnow()
+    db.session.commit()
+    return job
+
+
+def run_pending(limit: Optional[int] = None) -> int:
+    """Run runnable jobs until the queue is drained (or ``limit`` is reached)."""
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next()
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+    return processed
+
+
+def work(poll_interval: Optional[float] = None, once: bool = False) -> None:
+    interval = poll_interval if poll_interval is not None else current_app.config.get("JOB_POLL_INTERVAL", 2.0)
+    while True:
+        processed = run_pending()
+        if once:
+            return
+        if not processed:
+            time.sleep(interval)
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.isoformat()
+
+
+def job_status(job: BackgroundJob) -> dict:
+    payload = {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "model": job.model,
+        "error": job.last_error,
+        "run_after": _iso(job.run_after),
+        "finished_at": _iso(job.finished_at),
+    }
+    if job.status == "succeeded" and job.kind == "summarise":
+        target = load_target(job)
+        if target is not None:
+            payload["summary"] = target.summary
+            payload["summary_model"] = target.summary_model
+    return payload
+
+
+@register_handler("summarise")
+def _run_summary(job: BackgroundJob) -> None:
+    target = load_target(job)
+    if target is None:
+        raise JobError("The document for this job no longer exists.")
+    if not target.has_content:
+        raise SummarizationError("Document payload is missing.")
+    cached = summary_cache.lookup(target.content_hash, job.model, record=False)
+    if cached is not None:
+        target.set_summary(cached, job.model)
+        return
+    report = pdf_inspect.for_target(target)
+    if report is not None and not report.usable:
+        raise PermanentJobError(report.message(target.filename))
+    try:
+        result = summarise_text(text_store.get_text(target).text, job.model)
+    except PartialSummaryError:
+        # run_job rolls back; commit first so the retry reuses the chunks already paid for.
+        db.session.commit()
+        raise
+    summary_cache.store(target.content_hash, result.model, result.text)
+    target.set_summary(result.text, result.model)
@@ -0,0 +1,288 @@
+"""Process-wide OpenAI client shared by the chat and summary services.
+
+Creating ``OpenAI(...)`` per call throws away the HTTP connection pool, so every
+request paid for a fresh TCP/TLS handshake. This module owns one lazily built
+client per process with tuned pooling, timeouts and retries, and hides the
+legacy (<1.0) SDK fallback behind the same two calls.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Union
+
+try:  # OpenAI SDK >= 1.0
+    from openai import OpenAI  # type: ignore
+except ImportError:  # pragma: no cover - handled gracefully at runtime
+    OpenAI = None  # type: ignore
+
+try:  # OpenAI SDK < 1.0
+    import openai  # type: ignore
+except ImportError:  # pragma: no cover
+    openai = None  # type: ignore
+
+try:
+    import httpx  # type: ignore
+except ImportError:  # pragma: no cover - httpx ships with the new SDK
+    httpx = None  # type: ignore
+
+
+class LLMClientError(RuntimeError):
+    """Raised when the OpenAI API cannot be reached or returns no text."""
+
+
+# Transport/API failures surface as LLMClientError so callers handle one type.
+_SDK_ERRORS: tuple = ()
+if openai is not None and hasattr(openai, "OpenAIError"):
+    _SDK_ERRORS = (openai.OpenAIError,)
+
+
+@dataclass(frozen=True)
+class ClientSettings:
+    api_key: str
+    connect_timeout: float = 5.0
+    read_timeout: float = 60.0
+    max_retries: int = 2
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "ClientSettings":
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise LLMClientError("OPENAI_API_KEY is not configured.")
+        return cls(
+            api_key=api_key,
+            connect_timeout=float(os.getenv("OPENAI_CONNECT_TIMEOUT", 5)),
+            read_timeout=float(os.getenv("OPENAI_READ_TIMEOUT", 60)),
+            max_retries=int(os.getenv("OPENAI_MAX_RETRIES", 2)),
+            max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", 20)),
+            max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", 10)),
+            keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", 30)),
+        )
+
+
+@dataclass
+class LLMResponse:
+    text: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    total_tokens: Optional[int] = None
+
+
+_lock = threading.Lock()
+_client = None
+_client_pid: Optional[int] = None
+_client_settings: Optional[ClientSettings] = None
+
+
+def _forget_client() -> None:
+    # After fork the child must not reuse sockets owned by the parent; dropping
+    # the reference (without closing) leaves the parent's pool untouched.
+    global _client, _client_pid, _client_settings
+    _client = None
+    _client_pid = None
+    _client_settings = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_client)
+
+
+def _build_client(settings: ClientSettings):
+    kwargs = {"api_key": settings.api_key, "max_retries": settings.max_retries}
+    if httpx is not None:
+        timeout = httpx.Timeout(settings.read_timeout, connect=settings.connect_timeout)
+        limits = httpx.Limits(
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_keepalive_connections,
+            keepalive_expiry=settings.keepalive_expiry,
+        )
+        try:
+            from openai import DefaultHttpxClient  # type: ignore
+        except ImportError:  # pragma: no cover - older 1.x SDKs
+            DefaultHttpxClient = httpx.Client  # type: ignore
+        kwargs["timeout"] = timeout
+        kwargs["http_client"] = DefaultHttpxClient(timeout=timeout, limits=limits)
+    return OpenAI(**kwargs)
+
+
+def get_client():
+    """Return this process's shared client, building it on first use.
+
+    The client is rebuilt when the process id changes (gunicorn ``--preload``
+    forks after import) or when the settings in the environment change.
+    """
+    global _client, _client_pid, _client_settings
+    if OpenAI is None:
+        raise LLMClientError("The 'openai' package is not installed. Run 'pip install openai'.")
+    settings = ClientSettings.from_env()
+    pid = os.getpid()
+    client = _client
+    if client is not None and _client_pid == pid and _client_settings == settings:
+        return client
+
+    with _lock:
+        if _client is None or _client_pid != pid or _client_settings != settings:
+            previous, previous_pid = _client, _client_pid
+            _client = _build_client(settings)
+            _client_pid = pid
+            _client_settings = settings
+            if previous is not None and previous_pid == pid:
+                previous.close()
+        return _client
+
+
+def reset_client() -> None:
+    """Close and drop the shared client (tests, key rotation)."""
+    global _client
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _forget_client()
+
+
+def _response_text(response) -> Optional[str]:
+    text = getattr(response, "output_text", None)
+    if text:
+        return text
+    for item in getattr(response, "output", None) or []:
+        for content in getattr(item, "content", []):
+            if getattr(content, "type", None) == "text":
+                value = getattr(getattr(content, "text", None), "value", None)
+                if value:
+                    return value
+    return None
+
+
+def _usage(usage) -> dict:
+    if not usage:
+        return {}
+    return {
+        "prompt_tokens": getattr(usage, "input_tokens", None),
+        "completion_tokens": getattr(usage, "output_tokens", None),
+        "total_tokens": getattr(usage, "total_tokens", None),
+    }
+
+
+def _legacy_api_key() -> str:
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise LLMClientError("OPENAI_API_KEY is not configured.")
+    return api_key
+
+
+def create_response(
+    messages: List[dict],
+    model: str,
+    temperature: float,
+    max_tokens: int,
+) -> LLMResponse:
+    """Run a single request. ``temperature``/``max_tokens`` only apply to the legacy SDK."""
+    if OpenAI is not None:
+        try:
+            response = get_client().responses.create(model=model, input=messages)
+        except _SDK_ERRORS as exc:
+            raise LLMClientError(f"OpenAI request failed: {exc}") from exc
+        text = _response_text(response)
+        if not text:
+            raise LLMClientError("OpenAI response did not contain text output.")
+        return LLMResponse(text=text.strip(), **_usage(getattr(response, "usage", None)))
+
+    if openai is not None:
+        openai.api_key = _legacy_api_key()  # type: ignore[attr-defined]
+        try:
+            response = openai.ChatCompletion.create(  # type: ignore[attr-defined]
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                request_timeout=float(os.getenv("OPENAI_READ_TIMEOUT", 60)),
+            )
+        except AttributeError as exc:  # pragma: no cover - defensive
+            raise LLMClientError(
+                "Installed 'openai' package is too old. Upgrade to >=0.28 or use the new SDK."
+            ) from exc
+        try:
+            text = response["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError) as exc:
+            raise LLMClientError("OpenAI response did not contain text output.") from exc
+        usage = response.get("usage", {})
+        return LLMResponse(
+            text=(text or "").strip(),
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+            total_tokens=usage.get("total_tokens"),
+        )
+
+    raise LLMClientError("The 'openai' package is not installed. Run 'pip install openai'.")
+
+
+def stream_response(
+    messages: List[dict],
+    model: str,
+    temperature: float,
+    max_tokens: int,
+) -> Iterator[Union[str, LLMResponse]]:
+    """Yield text deltas, then a final LLMResponse (usage is unavailable on the legacy SDK)."""
+    chunks: List[str] = []
+
+    if OpenAI is not None:
+        usage = None
+        try:
+            # closing() also runs when the caller closes this generator (client disconnect),
+            # so the HTTP response is released instead of being read to the end.
+            with closing(get_client().responses.create(model=model, input=messages, stream=True)) as stream:
+                for event in stream:
+                    event_type = getattr(event, "type", None)
+                    if event_type == "response.output_text.delta":
+                        delta = getattr(event, "delta", None)
+                        if delta:
+                            chunks.append(delta)
+                            yield delta
+                    elif event_type == "response.completed":
+                        usage = getattr(getattr(event, "response", None), "usage", None)
+                    elif event_type in ("response.failed", "error"):
+                        raise LLMClientError("OpenAI stream ended with an error.")
+        except _SDK_ERRORS as exc:
+            raise LLMClientError(f"OpenAI request failed: {exc}") from exc
+        text = "".join(chunks).strip()
+        if not text:
+            raise LLMClientError("OpenAI response did not contain text output.")
+        yield LLMResponse(text=text, **_usage(usage))
+        return
+
+    if openai is not None:
+        openai.api_key = _legacy_api_key()  # type: ignore[attr-defined]
+        try:
+            stream = openai.ChatCompletion.create(  # type: ignore[attr-defined]
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                request_timeout=float(os.getenv("OPENAI_READ_TIMEOUT", 60)),
+            )
+        except AttributeError as exc:  # pragma: no cover
+            raise LLMClientError(
+                "Installed 'openai' package is too old. Upgrade to >=0.28 or use the new SDK."
+            ) from exc
+        with closing(stream):
+            for chunk in stream:
+                try:
+                    delta = chunk["choices"][0]["delta"].get("content")
+                except (KeyError, IndexError, TypeError):
+                    continue
+                if delta:
+                    chunks.append(delta)
+                    yield delta
+        text = "".join(chunks).strip()
+        if not text:
+            raise LLMClientError("OpenAI response did not contain text output.")
+        yield LLMResponse(text=text)
+        return
+
+    raise LLMClientError("The 'openai' package is not installed. Run 'pip install openai'.")
@@ -0,0 +1,93 @@
+"""Query helpers that load artefact metadata without touching PDF payloads."""
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import load_only
+
+from extensions import db
+from models import AssignmentDocument, StudentSubmission
+
+
+DOCUMENT_METADATA_COLUMNS = (
+    AssignmentDocument.id,
+    AssignmentDocument.assignment_id,
+    AssignmentDocument.slot,
+    AssignmentDocument.label,
+    AssignmentDocument.filename,
+    AssignmentDocument.mimetype,
+    AssignmentDocument.file_size,
+    AssignmentDocument.content_hash,
+    AssignmentDocument.uploaded_at,
+    AssignmentDocument.summary_model,
+    AssignmentDocument.summary_updated_at,
+)
+
+SUBMISSION_METADATA_COLUMNS = (
+    StudentSubmission.id,
+    StudentSubmission.assignment_id,
+    StudentSubmission.student_id,
+    StudentSubmission.filename,
+    StudentSubmission.mimetype,
+    StudentSubmission.file_size,
+    StudentSubmission.content_hash,
+    StudentSubmission.uploaded_at,
+    StudentSubmission.summary_model,
+    StudentSubmission.summary_updated_at,
+    StudentSubmission.prompts_delivered,
+    StudentSubmission.next_prompt_id,
+    StudentSubmission.last_message_role,
+)
+
+
+def load_documents(assignment_id: int, with_summary: bool = False) -> List[AssignmentDocument]:
+    columns = DOCUMENT_METADATA_COLUMNS + ((AssignmentDocument.summary,) if with_summary else ())
+    return (
+        db.session.query(AssignmentDocument)
+        .options(load_only(*columns))
+        .filter(AssignmentDocument.assignment_id == assignment_id)
+        .order_by(AssignmentDocument.slot.asc())
+        .all()
+    )
+
+
+def load_primary_document(assignment_id: int) -> Optional[AssignmentDocument]:
+    """Return the slot-1 document with its summary, which is all chat and export need."""
+    return (
+        db.session.query(AssignmentDocument)
+        .options(load_only(*DOCUMENT_METADATA_COLUMNS, AssignmentDocument.summary))
+        .filter(
+            AssignmentDocument.assignment_id == assignment_id,
+            AssignmentDocument.slot == 1,
+        )
+        .one_or_none()
+    )
+
+
+def document_counts(assignment_ids: Iterable[int]) -> Dict[int, int]:
+    ids = list(assignment_ids)
+    if not ids:
+        return {}
+    rows = (
+        db.session.query(AssignmentDocument.assignment_id, func.count(AssignmentDocument.id))
+        .filter(AssignmentDocument.assignment_id.in_(ids))
+        .group_by(AssignmentDocument.assignment_id)
+        .all()
+    )
+    return {assignment_id: count for assignment_id, count in rows}
+
+
+def load_submissions(
+    assignment_id: int,
+    student_id: int,
+    with_summary: bool = True,
+) -> List[StudentSubmission]:
+    columns = SUBMISSION_METADATA_COLUMNS + ((StudentSubmission.summary,) if with_summary else ())
+    return (
+        db.session.query(StudentSubmission)
+        .options(load_only(*columns))
+        .filter_by(assignment_id=assignment_id, student_id=student_id)
+        .order_by(StudentSubmission.uploaded_at.desc())
+        .all()
+    )
@@ -1,23 +1,15 @@
 """Utilities for creating and updating document summaries via OpenAI."""
 from __future__ import annotations
 
-import base64
-import os
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
-from io import BytesIO
-from typing import Iterable, Optional, Sequence
+from typing import Dict, Iterator, List, Optional, Sequence
 
-from flask import current_app
+from flask import current_app, has_app_context
 
-try:  # OpenAI SDK >= 1.0
-    from openai import OpenAI  # type: ignore
-except ImportError:  # pragma: no cover - handled gracefully at runtime
-    OpenAI = None  # type: ignore
-
-try:  # OpenAI SDK < 1.0
-    import openai  # type: ignore
-except ImportError:  # pragma: no cover
-    openai = None  # type: ignore
+from services import llm_client, pdf_inspect, summary_chunks, text_store
+from services.text_store import PdfSource
 
 SUMMARY_MODELS: Sequence[tuple[str, str]] = (
     ("gpt-3.5-turbo", "GPT-3.5 Turbo"),
@@ -26,128 +18,231 @@ SUMMARY_MODELS: Sequence[tuple[str, str]] = (
 )
 
 
+# Bump SUMMARY_PROMPT_VERSION whenever a prompt or the chunking changes
+# meaning; it is part of both the summary and the chunk cache keys.
+SUMMARY_PROMPT_VERSION = 2
+SUMMARY_SYSTEM_PROMPT = (
+    "You summarise PDF course materials for Vrije Universiteit Amsterdam. "
+    "Return a clear, plain-language paragraph (<= 200 words) suitable for lecturers."
+)
+CHUNK_SYSTEM_PROMPT = (
+    "You summarise one section of a longer PDF course document for Vrije Universiteit Amsterdam. "
+    "Return the key facts, arguments and requirements of this section in <= 120 words."
+)
+REDUCE_INSTRUCTION = (
+    "The following are summaries of consecutive sections of one document. "
+    "Combine them into a single summary of the whole document.\n\n"
+)
+
+# Token budgets are estimated from characters; ~4 characters per token holds
+# well enough for English and Dutch prose without a tokenizer dependency.
+CHARS_PER_TOKEN = 4
+# Defaults for SUMMARY_CHUNK_TOKENS, SUMMARY_TRUNCATE_LIMIT and SUMMARY_MAP_WORKERS
+# when no app context is active (scripts, benchmarks); see ``config.Config``.
+DEFAULT_CHUNK_TOKENS = 1500
+DEFAULT_TRUNCATE_LIMIT = 200_000
+DEFAULT_MAP_WORKERS = 4
+# A line whose hash is divisible by this closes a chunk once it is half full.
+CHUNK_ANCHOR_EVERY = 8
+MAX_REDUCE_DEPTH = 3
+
+
 class SummarizationError(RuntimeError):
     """Raised when we cannot produce a summary."""
 
 
-@dataclass
-class SummaryResult:
-    text: str
-    model: str
+class PartialSummaryError(SummarizationError):
+    """Some chunk summaries failed; the finished ones are flushed and worth committing."""
 
 
-def _get_api_key() -> str:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise SummarizationError("OPENAI_API_KEY is not configured.")
-    return api_key
+def _setting(name: str, default: int) -> int:
+    if not has_app_context():
+        return default
+    return int(current_app.config.get(name, default))
 
 
-def _extract_text_from_pdf(blob: bytes) -> str:
-    if not blob:
-        return ""
-    # Primary path: parse via pypdf
-    try:
-        from pypdf import PdfReader  # type: ignore
+def chunk_chars() -> int:
+    return _setting("SUMMARY_CHUNK_TOKENS", DEFAULT_CHUNK_TOKENS) * CHARS_PER_TOKEN
 
-        reader = PdfReader(BytesIO(blob))
-        pages: Iterable[str] = (page.extract_text() or "" for page in reader.pages)
-        text = "\n".join(pages)
-        if text.strip():
-            return text
-    except Exception:
-        pass
 
-    # Fallback 1: assume UTF-8 text masquerading as PDF (e.g., test fixtures)
-    try:
-        return blob.decode("utf-8")
-    except UnicodeDecodeError:
-        # Fallback 2: best-effort decoding
-        return blob.decode("latin-1", errors="ignore")
+def truncate_limit() -> int:
+    """Hard cap on the text fed into map-reduce (part of the summary cache key)."""
+    return _setting("SUMMARY_TRUNCATE_LIMIT", DEFAULT_TRUNCATE_LIMIT)
 
 
-def _truncate_text(text: str, limit: int = 6000) -> str:
+def map_workers() -> int:
+    return _setting("SUMMARY_MAP_WORKERS", DEFAULT_MAP_WORKERS)
+
+
+@dataclass
+class SummaryResult:
+    text: str
+    model: str
+
+
+def _extract_text_from_pdf(source: PdfSource, limit: Optional[int] = None) -> str:
+    if limit is None:
+        limit = truncate_limit()
+    # Nothing past ``limit`` characters is summarised, so stop parsing there.
+    return text_store.extract_text(source, max_chars=limit).text
+
+
+def _truncate_text(text: str, limit: Optional[int] = None) -> str:
+    if limit is None:
+        limit = chunk_chars()
     if len(text) <= limit:
         return text
     return text[:limit]
 
 
+def _complete(
+    system_prompt: str, text: str, model: str, max_tokens: int = 400, limit: Optional[int] = None
+) -> str:
+    """Run one summary request; ``limit`` must be passed when called off the app-context thread."""
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": _truncate_text(text, limit)},
+    ]
+    try:
+        response = llm_client.create_response(messages, model=model, temperature=0.2, max_tokens=max_tokens)
+    except llm_client.LLMClientError as exc:
+        raise SummarizationError(str(exc)) from exc
+    return response.text
+
+
 def _call_openai(text: str, model: str) -> str:
-    system_prompt = (
-        "You summarise PDF course materials for Vrije Universiteit Amsterdam. "
-        "Return a clear, plain-language paragraph (<= 200 words) suitable for lecturers."
-    )
-    normalized_text = text.strip() or "(Empty document)"
-
-    api_key = _get_api_key()
-
-    if OpenAI is not None:  # SDK >= 1.0
-        client = OpenAI(api_key=api_key)
-        response = client.responses.create(
-            model=model,
-            input=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": _truncate_text(normalized_text)},
-            ],
-        )
-
-        summary = getattr(response, "output_text", None)
-        if summary:
-            return summary.strip()
-
-        output = getattr(response, "output", None)
-        if output:
-            for item in output:
-                contents = getattr(item, "content", [])
-                for content in contents:
-                    if getattr(content, "type", None) == "text":
-                        value = getattr(getattr(content, "text", None), "value", None)
-                        if value:
-                            return value.strip()
-        raise SummarizationError("OpenAI response did not contain text output.")
-
-    if openai is not None:  # SDK < 1.0
-        openai.api_key = api_key  # type: ignore[attr-defined]
-        try:
-            response = openai.ChatCompletion.create(  # type: ignore[attr-defined]
-                model=model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": _truncate_text(normalized_text)},
-                ],
-                temperature=0.2,
-                max_tokens=400,
-            )
-        except AttributeError as exc:  # pragma: no cover - defensive
-            raise SummarizationError(
-                "Installed 'openai' package is too old. Upgrade to >=0.28 or use the new SDK."
-            ) from exc
-
-        try:
-            summary = response["choices"][0]["message"]["content"]
-        except (KeyError, IndexError, TypeError) as exc:  # pragma: no cover - defensive
-            raise SummarizationError("OpenAI response did not contain text output.") from exc
-        return (summary or "").strip()
-
-    raise SummarizationError("The 'openai' package is not installed. Run 'pip install openai'.")
-
-
-def summarise_document_content(content: bytes, model: str) -> SummaryResult:
+    return _complete(SUMMARY_SYSTEM_PROMPT, text.strip() or "(Empty document)", model)
+
+
+def _summarise_chunk(text: str, model: str, limit: int) -> str:
+    return _complete(CHUNK_SYSTEM_PROMPT, text, model, max_tokens=250, limit=limit)
+
+
+def _lines(text: str, max_chars: int) -> Iterator[str]:
+    for line in text.splitlines():
+        while len(line) > max_chars:
+            yield line[:max_chars]
+            line = line[max_chars:]
+        yield line
+
+
+def _is_anchor(line: str) -> bool:
+    stripped = line.strip()
+    if not stripped:
+        return False
+    return hashlib.sha256(stripped.encode("utf-8")).digest()[0] % CHUNK_ANCHOR_EVERY == 0
+
+
+def _split_chunks(text: str, max_chars: Optional[int] = None) -> List[str]:
+    """Pack lines into chunks of at most ``max_chars``.
+
+    Besides the size limit, a chunk ends after an anchor line (chosen by
+    content hash) once it is half full. An edit therefore only moves chunk
+    boundaries up to the next anchor; later chunks keep their cache keys.
+    """
+    if max_chars is None:
+        max_chars = chunk_chars()
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in _lines(text, max_chars):
+        extra = len(line) + (1 if current else 0)
+        if current and size + extra > max_chars:
+            chunks.append("\n".join(current))
+            current, size, extra = [], 0, len(line)
+        current.append(line)
+        size += extra
+        if size >= max_chars // 2 and _is_anchor(line):
+            chunks.append("\n".join(current))
+            current, size = [], 0
+    if current:
+        chunks.append("\n".join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def _map_chunks(chunks: List[str], model: str) -> List[str]:
+    """Summarise ``chunks`` concurrently, reusing cached chunk summaries.
+
+    If any chunk fails, the finished ones are still stored (flushed) before
+    :class:`PartialSummaryError` is raised, so a caller that commits keeps them
+    and a retry only pays for the chunks that failed.
+    """
+    keys = [summary_chunks.chunk_key(chunk) for chunk in chunks]
+    summaries: Dict[str, str] = summary_chunks.lookup_many(keys, model, SUMMARY_PROMPT_VERSION)
+    missing = {key: chunk for key, chunk in zip(keys, chunks) if key not in summaries}
+    if missing:
+        # Worker threads only talk to OpenAI; cache reads and writes stay on
+        # this thread because the database session is bound to it. Workers
+        # have no app context either, so the chunk limit is resolved here.
+        errors: List[Exception] = []
+        limit = chunk_chars()
+        with ThreadPoolExecutor(max_workers=max(1, min(map_workers(), len(missing)))) as pool:
+            futures = {pool.submit(_summarise_chunk, chunk, model, limit): key for key, chunk in missing.items()}
+            for future in as_completed(futures):
+                try:
+                    summaries[futures[future]] = future.result()
+                except Exception as exc:  # noqa: BLE001 - store finished chunks, raise afterwards
+                    errors.append(exc)
+                    continue
+                summary_chunks.store(futures[future], model, SUMMARY_PROMPT_VERSION, summaries[futures[future]])
+        summary_chunks.evict()
+        if errors:
+            failed = len(errors)
+            raise PartialSummaryError(
+                f"{failed} of {len(missing)} section(s) could not be summarised: {errors[0]}"
+            ) from errors[0]
+    return [summaries[key] for key in keys]
+
+
+def _reduce(partials: List[str], model: str, depth: int = 0) -> str:
+    joined = "\n\n".join(partials)
+    if len(REDUCE_INSTRUCTION) + len(joined) > chunk_chars() and depth < MAX_REDUCE_DEPTH:
+        return _reduce(_map_chunks(_split_chunks(joined), model), model, depth + 1)
+    return _complete(SUMMARY_SYSTEM_PROMPT, REDUCE_INSTRUCTION + joined, model)
+
+
+def summarise_document_content(content: PdfSource, model: str) -> SummaryResult:
     if model not in {choice for choice, _ in SUMMARY_MODELS}:
         raise SummarizationError(f"Unsupported model '{model}'.")
 
-    text = _extract_text_from_pdf(content)
+    return summarise_text(_extract_text_from_pdf(content), model=model)
+
+
+def summarise_text(text: str, model: str) -> SummaryResult:
+    """Summarise already extracted text (see ``services.text_store``).
+
+    Text that fits one chunk is summarised in a single call. Longer text is
+    split into token-budgeted chunks, summarised in parallel (map) and then
+    combined (reduce).
+    """
+    if model not in {choice for choice, _ in SUMMARY_MODELS}:
+        raise SummarizationError(f"Unsupported model '{model}'.")
     if not text.strip():
         raise SummarizationError("Could not extract text from the document.")
 
-    summary_text = _call_openai(text, model=model)
+    text = text.strip()[:truncate_limit()]
+    chunks = _split_chunks(text)
+    if len(chunks) <= 1:
+        summary_text = _call_openai(text, model=model)
+    else:
+        summary_text = _reduce(_map_chunks(chunks, model), model)
     return SummaryResult(text=summary_text, model=model)
 
 
 def summarise_assignment_document(document, model: str) -> SummaryResult:
-    if not document or not document.content:
-        raise SummarizationError("Document payload is missing.")
+    from services import summary_cache  # imports this module for the key constants
 
-    result = summarise_document_content(document.content, model=model)
+    if not document or not document.has_content:
+        raise SummarizationError("Document payload is missing.")
+    report = pdf_inspect.for_target(document)
+    if report is not None and not report.usable:
+        raise SummarizationError(report.message(document.filename))
+
+    cached = summary_cache.lookup(document.content_hash, model)
+    if cached is not None:
+        result = SummaryResult(text=cached, model=model)
+    else:
+        result = summarise_text(text_store.get_text(document).text, model=model)
+        summary_cache.store(document.content_hash, model, result.text)
     document.set_summary(result.text, model)
     return result
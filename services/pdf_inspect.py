@@ -0,0 +1,180 @@
+"""Cheap pre-flight inspection of uploaded PDFs, run before any text reaches the LLM.
+
+The inspector reads the header, lets pypdf load the trailer and cross-reference
+table, and walks page dictionaries for fonts; content streams are only decoded
+for a couple of sample pages to estimate how much text the document holds.
+Reports are stored per content hash in ``pdf_inspections`` so later stages
+(the summary job, dashboards) learn the verdict without reopening the file.
+"""
+from __future__ import annotations
+
+import logging
+import re
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Optional
+
+from extensions import db
+from models import PdfInspection
+
+logger = logging.getLogger(__name__)
+
+HEADER_WINDOW = 1024
+FONT_SCAN_PAGES = 20  # scanned documents rarely start with pages of real text
+SAMPLE_PAGES = 2
+
+_VERSION = re.compile(rb"%PDF-(\d\.\d)")
+
+MESSAGES = {
+    "unreadable": "is not a readable PDF document.",
+    "encrypted": "is password protected; upload an unprotected copy.",
+    "no_pages": "has no pages.",
+    "no_text": "has no text layer (is it a scan?); upload a PDF with selectable text.",
+}
+
+
+@dataclass(frozen=True)
+class PdfReport:
+    page_count: int = 0
+    encrypted: bool = False
+    has_text_layer: bool = False
+    estimated_chars: int = 0
+    pdf_version: Optional[str] = None
+    problem: Optional[str] = None
+
+    @property
+    def usable(self) -> bool:
+        return self.problem is None
+
+    def message(self, filename: Optional[str] = None) -> str:
+        return f"{filename or 'This document'} {MESSAGES.get(self.problem, 'cannot be summarised.')}"
+
+
+def _has_fonts(resources, depth: int = 0) -> bool:
+    if resources is None:
+        return False
+    resources = resources.get_object()
+    if resources.get("/Font"):
+        return True
+    if depth >= 1:
+        return False
+    xobjects = resources.get("/XObject")
+    if not xobjects:
+        return False
+    for ref in xobjects.get_object().values():
+        xobject = ref.get_object()
+        if xobject.get("/Subtype") == "/Form" and _has_fonts(xobject.get("/Resources"), depth + 1):
+            return True
+    return False
+
+
+def inspect(stream: BinaryIO) -> PdfReport:
+    """Inspect the PDF in ``stream`` (any seekable binary file)."""
+    stream.seek(0)
+    match = _VERSION.search(stream.read(HEADER_WINDOW))
+    if match is None:
+        return PdfReport(problem="unreadable")
+    version = match.group(1).decode("ascii")
+
+    try:
+        from pypdf import PdfReader  # type: ignore
+
+        stream.seek(0)
+        reader = PdfReader(stream)
+        encrypted = reader.is_encrypted
+        # Owner-password-only files open with an empty user password.
+        if encrypted and not reader.decrypt(""):
+            return PdfReport(encrypted=True, pdf_version=version, problem="encrypted")
+        page_count = len(reader.pages)
+        if page_count == 0:
+            return PdfReport(encrypted=encrypted, pdf_version=version, problem="no_pages")
+
+        sampled_pages = 0
+        sampled_chars = 0
+        for index in range(min(page_count, FONT_SCAN_PAGES)):
+            page = reader.pages[index]
+            if not _has_fonts(page.get("/Resources")):
+                continue
+            sampled_chars += len((page.extract_text() or "").strip())
+            sampled_pages += 1
+            if sampled_pages >= SAMPLE_PAGES:
+                break
+    except Exception as exc:  # noqa: BLE001 - any parser failure means the file is unusable
+        logger.info("PDF inspection failed: %s", exc)
+        return PdfReport(pdf_version=version, problem="unreadable")
+
+    has_text = sampled_chars > 0
+    return PdfReport(
+        page_count=page_count,
+        encrypted=encrypted,
+        has_text_layer=has_text,
+        estimated_chars=sampled_chars * page_count // sampled_pages if has_text else 0,
+        pdf_version=version,
+        problem=None if has_text else "no_text",
+    )
+
+
+def _report(row: PdfInspection) -> PdfReport:
+    return PdfReport(
+        page_count=row.page_count,
+        encrypted=row.encrypted,
+        has_text_layer=row.has_text_layer,
+        estimated_chars=row.estimated_chars,
+        pdf_version=row.pdf_version,
+        problem=row.problem,
+    )
+
+
+def lookup(content_hash: Optional[str]) -> Optional[PdfReport]:
+    if not content_hash:
+        return None
+    row = db.session.get(PdfInspection, content_hash)
+    return _report(row) if row is not None else None
+
+
+def store(content_hash: str, report: PdfReport) -> None:
+    """Remember ``report`` for ``content_hash``; the caller commits."""
+    if db.session.get(PdfInspection, content_hash) is not None:
+        return
+    db.session.add(
+        PdfInspection(
+            content_hash=content_hash,
+            pdf_version=report.pdf_version,
+            page_count=report.page_count,
+            encrypted=report.encrypted,
+            has_text_layer=report.has_text_layer,
+            estimated_chars=report.estimated_chars,
+            problem=report.problem,
+        )
+    )
+
+
+def inspect_upload(upload) -> PdfReport:
+    """Report for a ``services.uploads.SpooledUpload``, reusing a stored one for known content."""
+    report = lookup(upload.content_hash)
+    if report is None:
+        with upload.open() as handle:
+            report = inspect(handle)
+    return report
+
+
+def for_target(target) -> Optional[PdfReport]:
+    """Stored report for a document or submission, inspecting legacy rows once."""
+    if not target.content_hash:
+        return None
+    report = lookup(target.content_hash)
+    if report is None:
+        with target.open_content() as handle:
+            report = inspect(handle)
+        store(target.content_hash, report)
+    return report
+
+
+def prune(referenced: Iterable[str]) -> int:
+    """Delete reports whose hash no document or submission references any more."""
+    keep = set(referenced)
+    stale = [row[0] for row in db.session.query(PdfInspection.content_hash) if row[0] not in keep]
+    if stale:
+        db.session.query(PdfInspection).filter(PdfInspection.content_hash.in_(stale)).delete(
+            synchronize_session=False
+        )
+    return len(stale)
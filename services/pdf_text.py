@@ -0,0 +1,187 @@
+"""PDF text extraction engine: page-wise, stoppable at a character budget, parallel for big files.
+
+This module deliberately imports nothing from the app so process-pool workers
+(started with ``spawn``) only load pypdf.
+"""
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from io import BytesIO
+from multiprocessing import get_context
+from typing import BinaryIO, Iterable, List, Optional, Tuple, Union
+
+
+PdfSource = Union[bytes, BinaryIO]
+PAGE_SEPARATOR = "\n"
+
+DEFAULT_PARALLEL_MIN_PAGES = 32
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+@dataclass(frozen=True)
+class PdfText:
+    text: str
+    page_offsets: Tuple[int, ...]
+    extractor: str = "pypdf"
+    truncated: bool = False  # stopped at a character budget; never persist these
+
+    @classmethod
+    def from_pages(cls, pages: Iterable[str], extractor: str = "pypdf", truncated: bool = False) -> "PdfText":
+        offsets: List[int] = []
+        parts: List[str] = []
+        position = 0
+        for page in pages:
+            if parts:
+                position += len(PAGE_SEPARATOR)
+            offsets.append(position)
+            parts.append(page)
+            position += len(page)
+        return cls(
+            text=PAGE_SEPARATOR.join(parts),
+            page_offsets=tuple(offsets),
+            extractor=extractor,
+            truncated=truncated,
+        )
+
+    @property
+    def page_count(self) -> int:
+        return len(self.page_offsets)
+
+    def page(self, index: int) -> str:
+        start = self.page_offsets[index]
+        if index + 1 < len(self.page_offsets):
+            end = self.page_offsets[index + 1] - len(PAGE_SEPARATOR)
+        else:
+            end = len(self.text)
+        return self.text[start:end]
+
+    def pages(self) -> List[str]:
+        return [self.page(index) for index in range(self.page_count)]
+
+
+def _extract_page_range(data: bytes, start: int, stop: int) -> List[str]:
+    # Runs inside pool workers; each worker parses its own copy of the file.
+    from pypdf import PdfReader  # type: ignore
+
+    reader = PdfReader(BytesIO(data))
+    return [reader.pages[index].extract_text() or "" for index in range(start, stop)]
+
+
+_pool_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+
+
+def _forget_pool() -> None:
+    global _pool, _pool_workers
+    _pool = None
+    _pool_workers = 0
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_pool)
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            # spawn, not fork: the web process runs threads and holds DB/HTTP sockets.
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool() -> None:
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+        _forget_pool()
+
+
+atexit.register(shutdown_pool)
+
+
+def _parallel_pages(data: bytes, page_count: int, workers: int) -> List[str]:
+    pool = _get_pool(workers)
+    chunk = -(-page_count // (workers * 2))  # a few chunks per worker evens out slow pages
+    futures = [
+        pool.submit(_extract_page_range, data, start, min(start + chunk, page_count))
+        for start in range(0, page_count, chunk)
+    ]
+    pages: List[str] = []
+    for future in futures:
+        pages.extend(future.result())
+    return pages
+
+
+def _decode(source: PdfSource, stream: BinaryIO) -> PdfText:
+    if isinstance(source, (bytes, bytearray)):
+        blob = bytes(source)
+    else:
+        stream.seek(0)
+        blob = stream.read()
+
+    # UTF-8 text masquerading as a PDF (e.g. test fixtures) is kept; anything
+    # else is binary the parser could not read and must not reach the LLM.
+    try:
+        text = blob.decode("utf-8")
+    except UnicodeDecodeError:
+        text = ""
+    return PdfText.from_pages([text], extractor="decode")
+
+
+def extract_text(
+    source: PdfSource,
+    max_chars: Optional[int] = None,
+    workers: int = DEFAULT_WORKERS,
+    parallel_min_pages: int = DEFAULT_PARALLEL_MIN_PAGES,
+) -> PdfText:
+    """Extract ``source`` page by page.
+
+    With ``max_chars`` extraction stops at the first page that fills the budget
+    and the result is marked ``truncated``. Without it, PDFs of at least
+    ``parallel_min_pages`` pages are split over a process pool of ``workers``.
+    Payloads pypdf cannot read are kept as a single page only if they are UTF-8 text.
+    """
+    if not source:
+        return PdfText(text="", page_offsets=(), extractor="decode")
+    stream = BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    try:
+        from pypdf import PdfReader  # type: ignore
+
+        reader = PdfReader(stream)
+        page_count = len(reader.pages)
+        if max_chars is not None:
+            pages: List[str] = []
+            collected = 0
+            for index in range(page_count):
+                text = reader.pages[index].extract_text() or ""
+                pages.append(text)
+                collected += len(text)
+                if collected >= max_chars:
+                    break
+            extracted = PdfText.from_pages(pages, truncated=len(pages) < page_count)
+        elif workers > 1 and page_count >= parallel_min_pages:
+            stream.seek(0)
+            data = bytes(source) if isinstance(source, (bytes, bytearray)) else stream.read()
+            try:
+                extracted = PdfText.from_pages(_parallel_pages(data, page_count, workers))
+            except (BrokenProcessPool, OSError):
+                _forget_pool()
+                extracted = PdfText.from_pages(page.extract_text() or "" for page in reader.pages)
+        else:
+            extracted = PdfText.from_pages(page.extract_text() or "" for page in reader.pages)
+        if extracted.text.strip():
+            return extracted
+    except Exception:
+        pass
+
+    return _decode(source, stream)
@@ -0,0 +1,89 @@
+"""Materialised lecturer-prompt progress on StudentSubmission.
+
+Every writer of ``StudentSubmissionMessage`` calls :func:`record_message` in the
+same transaction, so the dashboard and chat routes can decide the next
+lecturer prompt from three columns instead of replaying the history.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+from sqlalchemy import case
+
+from extensions import db
+from models import AssignmentPrompt, StudentSubmission, StudentSubmissionMessage
+
+
+def _ordered_prompts(assignment_id: int):
+    return (
+        db.session.query(AssignmentPrompt)
+        .filter_by(assignment_id=assignment_id)
+        .order_by(AssignmentPrompt.display_order.asc(), AssignmentPrompt.id.asc())
+    )
+
+
+def prompt_at(assignment_id: int, delivered: int) -> Optional[AssignmentPrompt]:
+    """Return the prompt a submission with ``delivered`` prompts should see next."""
+    return _ordered_prompts(assignment_id).offset(delivered).limit(1).first()
+
+
+def record_message(submission: StudentSubmission, message: StudentSubmissionMessage) -> None:
+    """Advance the progress columns for a newly added message; the caller commits."""
+    submission.last_message_role = message.role
+    if message.role == "lecturer":
+        submission.prompts_delivered = (submission.prompts_delivered or 0) + 1
+        upcoming = prompt_at(submission.assignment_id, submission.prompts_delivered)
+        submission.next_prompt_id = upcoming.id if upcoming else None
+
+
+def should_deliver(submission: StudentSubmission) -> bool:
+    """A prompt is due on an empty conversation or right after an assistant reply."""
+    return submission.next_prompt_id is not None and submission.last_message_role in (None, "assistant")
+
+
+def reset(submission: StudentSubmission) -> None:
+    """Start (or restart) a conversation at the first prompt."""
+    submission.prompts_delivered = 0
+    submission.last_message_role = None
+    first = prompt_at(submission.assignment_id or submission.assignment.id, 0)
+    submission.next_prompt_id = first.id if first else None
+
+
+def recompute(submission: StudentSubmission) -> None:
+    """Rebuild the columns from stored messages (restart, deleted turns, repairs)."""
+    last = (
+        db.session.query(StudentSubmissionMessage.role)
+        .filter_by(submission_id=submission.id)
+        .order_by(StudentSubmissionMessage.created_at.desc(), StudentSubmissionMessage.id.desc())
+        .first()
+    )
+    delivered = (
+        db.session.query(StudentSubmissionMessage)
+        .filter_by(submission_id=submission.id, role="lecturer")
+        .count()
+    )
+    submission.last_message_role = last[0] if last else None
+    submission.prompts_delivered = delivered
+    upcoming = prompt_at(submission.assignment_id, delivered)
+    submission.next_prompt_id = upcoming.id if upcoming else None
+
+
+def sync_assignment(assignment_id: int) -> None:
+    """Re-point ``next_prompt_id`` after the lecturer adds, reorders or removes prompts.
+
+    One UPDATE covers every submission of the assignment, whatever its position.
+    """
+    db.session.flush()
+    prompt_ids = [prompt.id for prompt in _ordered_prompts(assignment_id)]
+    next_prompt = None
+    if prompt_ids:
+        whens = [
+            (StudentSubmission.prompts_delivered == index, prompt_id)
+            for index, prompt_id in enumerate(prompt_ids)
+        ]
+        next_prompt = case(*whens, else_=None)
+    (
+        db.session.query(StudentSubmission)
+        .filter(StudentSubmission.assignment_id == assignment_id)
+        .update({StudentSubmission.next_prompt_id: next_prompt}, synchronize_session="fetch")
+    )
@@ -0,0 +1,207 @@
+"""Opt-in per-request SQL profiler and slow-query log.
+
+Enabled with ``SQL_PROFILER_ENABLED``. Engine events time every statement
+issued while a request is active; at teardown the request's statement count,
+total DB time and slowest statements (as normalised fingerprints) are folded
+into a per-process aggregate keyed by endpoint, which ``/beheer/sql`` lists.
+Statements slower than ``SQL_SLOW_QUERY_MS`` are logged as they finish, also
+outside requests, labelled with the running job (see :func:`labelled`) or
+CLI command.
+"""
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import click
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from extensions import db
+
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+_label: ContextVar[Optional[str]] = ContextVar("sql_profiler_label", default=None)
+
+
+def fingerprint(statement: str) -> str:
+    """Collapse literals, bind markers and ``IN`` lists so equal queries group together."""
+    text = _STRING.sub("?", statement)
+    text = _NUMBER.sub("?", text)
+    text = re.sub(r"%\(\w+\)s|:\w+|%s", "?", text)
+    text = _IN_LIST.sub("IN (...)", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+@dataclass
+class RequestProfile:
+    statements: int = 0
+    db_seconds: float = 0.0
+    slowest: List[Tuple[float, str]] = field(default_factory=list)
+
+    def add(self, statement: str, seconds: float, keep: int) -> None:
+        self.statements += 1
+        self.db_seconds += seconds
+        if len(self.slowest) < keep or seconds > self.slowest[-1][0]:
+            self.slowest.append((seconds, fingerprint(statement)))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[keep:]
+
+
+@dataclass
+class EndpointStats:
+    endpoint: str
+    requests: int = 0
+    statements: int = 0
+    max_statements: int = 0
+    db_seconds: float = 0.0
+    max_db_seconds: float = 0.0
+    slowest: Dict[str, float] = field(default_factory=dict)  # fingerprint -> worst seconds
+
+    @property
+    def avg_statements(self) -> float:
+        return self.statements / self.requests if self.requests else 0.0
+
+    @property
+    def avg_db_ms(self) -> float:
+        return self.db_seconds * 1000 / self.requests if self.requests else 0.0
+
+    def top_statements(self, limit: int = 3) -> List[Tuple[str, float]]:
+        return sorted(self.slowest.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+class _Aggregate:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, EndpointStats] = {}
+
+    def record(self, endpoint: str, profile: RequestProfile, keep: int) -> None:
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats(endpoint)
+            stats.requests += 1
+            stats.statements += profile.statements
+            stats.max_statements = max(stats.max_statements, profile.statements)
+            stats.db_seconds += profile.db_seconds
+            stats.max_db_seconds = max(stats.max_db_seconds, profile.db_seconds)
+            for seconds, text in profile.slowest:
+                if seconds > stats.slowest.get(text, -1.0):
+                    stats.slowest[text] = seconds
+            if len(stats.slowest) > keep:
+                stats.slowest = dict(stats.top_statements(keep))
+
+    def snapshot(self) -> List[EndpointStats]:
+        with self._lock:
+            return [
+                EndpointStats(**{**vars(stats), "slowest": dict(stats.slowest)})
+                for stats in self._endpoints.values()
+            ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+
+_aggregate = _Aggregate()
+
+
+def top_endpoints(limit: int = 20, order_by: str = "db_seconds") -> List[EndpointStats]:
+    """Endpoints seen by this process, worst first by ``order_by``."""
+    return sorted(_aggregate.snapshot(), key=lambda stats: getattr(stats, order_by), reverse=True)[:limit]
+
+
+def reset() -> None:
+    _aggregate.clear()
+
+
+def current_profile() -> Optional[RequestProfile]:
+    return g.get("_sql_profile") if has_request_context() else None
+
+
+@contextmanager
+def labelled(label: str) -> Iterator[None]:
+    """Name the work outside a request (e.g. ``job summary``) in slow-query log lines."""
+    token = _label.set(label)
+    try:
+        yield
+    finally:
+        _label.reset(token)
+
+
+def current_label() -> str:
+    if has_request_context():
+        return f"{request.method} {request.endpoint}"
+    label = _label.get()
+    if label:
+        return label
+    context = click.get_current_context(silent=True)
+    if context is not None:
+        return f"cli {context.command_path}"
+    return "background"
+
+
+def init_app(app) -> None:
+    if not app.config.get("SQL_PROFILER_ENABLED"):
+        return
+    slow_seconds = app.config.get("SQL_SLOW_QUERY_MS", 200) / 1000
+    keep = app.config.get("SQL_PROFILER_TOP_STATEMENTS", 5)
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_sql_profiler_started", []).append(time.perf_counter())
+
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["_sql_profiler_started"].pop()
+        elapsed = time.perf_counter() - started
+        if elapsed >= slow_seconds:
+            logger.warning(
+                "Slow query (%.1f ms) in %s: %s",
+                elapsed * 1000,
+                current_label(),
+                fingerprint(statement),
+            )
+        profile = current_profile()
+        if profile is not None:
+            profile.add(statement, elapsed, keep)
+
+    def _handle_error(context):
+        started = context.connection.info.get("_sql_profiler_started") if context.connection else None
+        if started:
+            started.pop()
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+    @app.before_request
+    def _start_profile():
+        g._sql_profile = RequestProfile()
+
+    # Teardown rather than after_request so streamed responses are fully counted.
+    @app.teardown_request
+    def _finish_profile(exc):
+        profile = g.pop("_sql_profile", None)
+        if profile is None or request.endpoint is None:
+            return
+        endpoint = f"{request.method} {request.endpoint}"
+        _aggregate.record(endpoint, profile, keep)
+        logger.debug(
+            "%s: %d statement(s), %.1f ms in the database",
+            endpoint,
+            profile.statements,
+            profile.db_seconds * 1000,
+        )
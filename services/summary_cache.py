@@ -0,0 +1,110 @@
+"""Persistent summary cache keyed by PDF hash, model, prompt version and truncation limit."""
+from __future__ import annotations
+
+from typing import Optional
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import CacheStat, SummaryCacheEntry, utcnow
+from services.openai_summarizer import SUMMARY_PROMPT_VERSION, truncate_limit
+
+
+STAT_NAME = "summary"
+
+
+def _entry(content_hash: str, model: str) -> Optional[SummaryCacheEntry]:
+    return (
+        db.session.query(SummaryCacheEntry)
+        .filter_by(
+            content_hash=content_hash,
+            model=model,
+            prompt_version=SUMMARY_PROMPT_VERSION,
+            truncate_limit=truncate_limit(),
+        )
+        .first()
+    )
+
+
+def lookup(content_hash: Optional[str], model: str, record: bool = True) -> Optional[str]:
+    """Return the cached summary text and count a hit or miss; the caller commits.
+
+    ``record=False`` is used by the job worker, whose lookup was already
+    counted when the upload route decided to enqueue the job.
+    """
+    if not content_hash:
+        return None
+    entry = _entry(content_hash, model)
+    if record:
+        CacheStat.record(STAT_NAME, hit=entry is not None)
+    if entry is None:
+        return None
+    entry.hits = (entry.hits or 0) + 1
+    entry.last_used_at = utcnow()
+    return entry.summary
+
+
+def store(content_hash: Optional[str], model: str, text: str) -> None:
+    if not content_hash or not text:
+        return
+    entry = _entry(content_hash, model)
+    if entry is None:
+        try:
+            with db.session.begin_nested():
+                db.session.add(
+                    SummaryCacheEntry(
+                        content_hash=content_hash,
+                        model=model,
+                        prompt_version=SUMMARY_PROMPT_VERSION,
+                        truncate_limit=truncate_limit(),
+                        summary=text,
+                    )
+                )
+        except IntegrityError:
+            # Another worker summarised the same PDF first; overwrite its row instead.
+            entry = _entry(content_hash, model)
+    if entry is not None:
+        entry.summary = text
+        entry.last_used_at = utcnow()
+    db.session.flush()
+    evict()
+
+
+def evict(max_entries: Optional[int] = None) -> int:
+    """Drop the least recently used entries beyond ``SUMMARY_CACHE_MAX_ENTRIES``."""
+    if max_entries is None:
+        max_entries = current_app.config.get("SUMMARY_CACHE_MAX_ENTRIES", 5000)
+    overflow = db.session.query(SummaryCacheEntry).count() - max_entries
+    if overflow <= 0:
+        return 0
+    stale_ids = [
+        row[0]
+        for row in db.session.query(SummaryCacheEntry.id)
+        .order_by(SummaryCacheEntry.last_used_at.asc(), SummaryCacheEntry.id.asc())
+        .limit(overflow)
+    ]
+    db.session.query(SummaryCacheEntry).filter(SummaryCacheEntry.id.in_(stale_ids)).delete(
+        synchronize_session=False
+    )
+    return len(stale_ids)
+
+
+def apply_cached_summary(target, model: str) -> bool:
+    """Copy a cached summary onto ``target`` so no job needs to run."""
+    cached = lookup(target.content_hash, model)
+    if cached is None:
+        return False
+    target.set_summary(cached, model)
+    return True
+
+
+def stats() -> dict:
+    counter = db.session.get(CacheStat, STAT_NAME)
+    return {
+        "entries": db.session.query(SummaryCacheEntry).count(),
+        "max_entries": current_app.config.get("SUMMARY_CACHE_MAX_ENTRIES", 5000),
+        "hits": counter.hits if counter else 0,
+        "misses": counter.misses if counter else 0,
+        "hit_rate": counter.hit_rate if counter else None,
+    }
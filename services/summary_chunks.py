@@ -0,0 +1,88 @@
+"""Persistent cache of per-chunk summaries used by the map-reduce summariser."""
+from __future__ import annotations
+
+import hashlib
+from typing import Dict, Iterable, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import CacheStat, SummaryChunk, utcnow
+
+
+STAT_NAME = "summary_chunk"
+
+
+def chunk_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def lookup_many(keys: Iterable[str], model: str, prompt_version: int) -> Dict[str, str]:
+    """Return ``{chunk_hash: summary}`` for the cached keys; the caller commits.
+
+    Outside an app context (scripts, benchmarks) the cache is simply skipped.
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys or not has_app_context():
+        return {}
+    rows = (
+        db.session.query(SummaryChunk)
+        .filter(
+            SummaryChunk.chunk_hash.in_(keys),
+            SummaryChunk.model == model,
+            SummaryChunk.prompt_version == prompt_version,
+        )
+        .all()
+    )
+    now = utcnow()
+    for row in rows:
+        row.last_used_at = now
+    found = {row.chunk_hash: row.summary for row in rows}
+    for key in keys:
+        CacheStat.record(STAT_NAME, hit=key in found)
+    return found
+
+
+def _entry(key: str, model: str, prompt_version: int) -> Optional[SummaryChunk]:
+    return (
+        db.session.query(SummaryChunk)
+        .filter_by(chunk_hash=key, model=model, prompt_version=prompt_version)
+        .first()
+    )
+
+
+def store(key: str, model: str, prompt_version: int, text: str) -> None:
+    if not text or not has_app_context():
+        return
+    existing = _entry(key, model, prompt_version)
+    if existing is None:
+        try:
+            with db.session.begin_nested():
+                db.session.add(SummaryChunk(chunk_hash=key, model=model, prompt_version=prompt_version, summary=text))
+        except IntegrityError:
+            # Another worker stored the same chunk first; overwrite its row instead.
+            existing = _entry(key, model, prompt_version)
+    if existing is not None:
+        existing.summary = text
+        existing.last_used_at = utcnow()
+    db.session.flush()
+
+
+def evict(max_entries: Optional[int] = None) -> int:
+    """Drop the least recently used chunks beyond ``SUMMARY_CHUNK_CACHE_MAX_ENTRIES``."""
+    if not has_app_context():
+        return 0
+    if max_entries is None:
+        max_entries = current_app.config.get("SUMMARY_CHUNK_CACHE_MAX_ENTRIES", 20000)
+    overflow = db.session.query(SummaryChunk).count() - max_entries
+    if overflow <= 0:
+        return 0
+    stale_ids = [
+        row[0]
+        for row in db.session.query(SummaryChunk.id)
+        .order_by(SummaryChunk.last_used_at.asc(), SummaryChunk.id.asc())
+        .limit(overflow)
+    ]
+    db.session.query(SummaryChunk).filter(SummaryChunk.id.in_(stale_ids)).delete(synchronize_session=False)
+    return len(stale_ids)
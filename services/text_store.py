@@ -0,0 +1,160 @@
+"""Extracted PDF text, stored once per content hash with an in-process LRU in front."""
+from __future__ import annotations
+
+import json
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Iterable, Optional
+
+from flask import current_app
+
+from extensions import db
+from models import ExtractedText
+from services import pdf_inspect
+from services.pdf_text import (
+    DEFAULT_PARALLEL_MIN_PAGES,
+    DEFAULT_WORKERS,
+    PdfSource,
+    PdfText,
+    extract_text,
+)
+
+__all__ = [
+    "PdfSource",
+    "PdfText",
+    "clear_memory",
+    "ensure_text",
+    "extract_text",
+    "get_text",
+    "invalidate",
+    "prune",
+]
+
+
+class _LRU:
+    # Keys are content hashes, so an entry can never go stale; eviction only
+    # bounds memory and invalidation just frees it early.
+    def __init__(self):
+        self._items: "OrderedDict[str, PdfText]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[PdfText]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: PdfText, capacity: int) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > max(capacity, 0):
+                self._items.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._items
+
+
+_memory = _LRU()
+
+
+def _remember(content_hash: str, value: PdfText) -> PdfText:
+    _memory.put(content_hash, value, current_app.config.get("TEXT_CACHE_SIZE", 64))
+    return value
+
+
+def _persist(content_hash: str, value: PdfText) -> None:
+    db.session.merge(
+        ExtractedText(
+            content_hash=content_hash,
+            text=value.text,
+            page_offsets=json.dumps(list(value.page_offsets)),
+            page_count=value.page_count,
+            extractor=value.extractor,
+        )
+    )
+
+
+def ensure_text(target, data: Optional[bytes] = None) -> Optional[PdfText]:
+    """Extract and store the text for ``target`` unless its hash already has some; the caller commits.
+
+    Pass the uploaded ``data`` to avoid reading the payload back from the blob store.
+    """
+    content_hash = target.content_hash
+    if not content_hash:
+        return None
+    if content_hash in _memory or db.session.get(ExtractedText, content_hash) is not None:
+        return get_text(target)
+    if pdf_inspect.lookup(content_hash) is None:
+        # Rows created outside the upload routes get their pre-flight report here.
+        with (BytesIO(data) if data is not None else target.open_content()) as handle:
+            pdf_inspect.store(content_hash, pdf_inspect.inspect(handle))
+    config = current_app.config
+    options = {
+        "workers": config.get("TEXT_EXTRACT_WORKERS", DEFAULT_WORKERS),
+        "parallel_min_pages": config.get("TEXT_EXTRACT_PARALLEL_MIN_PAGES", DEFAULT_PARALLEL_MIN_PAGES),
+    }
+    if data is not None:
+        value = extract_text(data, **options)
+    else:
+        with target.open_content() as handle:
+            value = extract_text(handle, **options)
+    _persist(content_hash, value)
+    return _remember(content_hash, value)
+
+
+def get_text(target) -> Optional[PdfText]:
+    """Return the stored text for ``target``, extracting it on first use."""
+    content_hash = target.content_hash
+    if not content_hash:
+        return None
+    cached = _memory.get(content_hash)
+    if cached is not None:
+        return cached
+    row = db.session.get(ExtractedText, content_hash)
+    if row is not None:
+        value = PdfText(
+            text=row.text,
+            page_offsets=tuple(json.loads(row.page_offsets)),
+            extractor=row.extractor,
+        )
+        return _remember(content_hash, value)
+    if not target.has_content:
+        return None
+    return ensure_text(target)
+
+
+def invalidate(content_hash: Optional[str]) -> None:
+    """Forget the text for ``content_hash``; the caller commits.
+
+    Text is keyed by content hash and never goes stale, so only :func:`prune`
+    calls this, once no row references the hash.
+    """
+    if not content_hash:
+        return
+    _memory.discard(content_hash)
+    db.session.query(ExtractedText).filter_by(content_hash=content_hash).delete(synchronize_session=False)
+
+
+def prune(referenced: Iterable[str]) -> int:
+    """Delete stored text whose hash no document or submission references any more."""
+    keep = set(referenced)
+    stale = [row[0] for row in db.session.query(ExtractedText.content_hash) if row[0] not in keep]
+    for content_hash in stale:
+        invalidate(content_hash)
+    return len(stale)
+
+
+def clear_memory() -> None:
+    _memory.clear()
@@ -0,0 +1,331 @@
+"""Stream uploaded PDFs to a spool file instead of reading them into memory.
+
+:func:`spool` copies a ``FileStorage`` in fixed-size chunks, hashing and
+counting as it goes, and stops at the first chunk that shows the upload is not
+a PDF or is larger than ``UPLOAD_MAX_BYTES``. Models take the resulting
+:class:`SpooledUpload` through ``StoredContentMixin.store_upload``, which links
+the spool file into the blob store without loading it.
+
+Large files can instead arrive through a resumable :class:`UploadSession`
+(open, append checksummed chunks at an offset, finalise); forms then carry the
+session id and :func:`resolve` turns either source into a ``SpooledUpload``.
+Abandoned sessions expire after ``UPLOAD_SESSION_TTL`` seconds.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import secrets
+import tempfile
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import BinaryIO, Optional
+
+from flask import current_app
+from wtforms.validators import StopValidation
+
+from extensions import db
+from models import UploadSession, utcnow
+
+PDF_MAGIC = b"%PDF-"
+HEADER_WINDOW = 1024  # readers accept the header anywhere in the first KiB
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadRejected(ValueError):
+    """Raised when an upload is refused; the message is meant for the user."""
+
+
+class ChunkCorrupted(UploadRejected):
+    """A chunk arrived short or with the wrong checksum; sending it again may succeed."""
+
+
+class ChunkOutOfOrder(UploadRejected):
+    """A chunk did not start where the session left off; ``offset`` is where it did."""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Expected a chunk at offset {offset}.")
+        self.offset = offset
+
+
+@dataclass
+class SpooledUpload:
+    path: str
+    content_hash: str
+    size: int
+    filename: Optional[str]
+    mimetype: str
+    keep: bool = False  # session files outlive the request and are removed on expiry
+
+    def open(self) -> BinaryIO:
+        return open(self.path, "rb")
+
+    def discard(self) -> None:
+        if self.keep:
+            return
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _spool_dir() -> str:
+    # Beside the blob store by default, so storing an upload is a hard link, not a copy.
+    return current_app.config.get("UPLOAD_SPOOL_PATH") or os.path.join(current_app.instance_path, "uploads")
+
+
+def _limit_label(max_bytes: int) -> str:
+    return f"{max_bytes / (1024 * 1024):.0f} MB"
+
+
+def _max_bytes() -> int:
+    return current_app.config.get("UPLOAD_MAX_BYTES", 16 * 1024 * 1024)
+
+
+def _missing_pdf_header(chunk: bytes) -> bool:
+    return PDF_MAGIC not in chunk[:HEADER_WINDOW]
+
+
+def spool(file_storage, max_bytes: Optional[int] = None) -> SpooledUpload:
+    """Copy ``file_storage`` to a spool file, validating it on the way.
+
+    Raises :class:`UploadRejected` as soon as the first chunk lacks a PDF
+    header or the running size passes ``max_bytes``; the partial file is removed.
+    """
+    if max_bytes is None:
+        max_bytes = _max_bytes()
+    name = file_storage.filename or "upload"
+    if file_storage.content_length and file_storage.content_length > max_bytes:
+        raise UploadRejected(f"{name} is larger than {_limit_label(max_bytes)}.")
+
+    directory = _spool_dir()
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=directory, prefix=".spool-", suffix=".pdf")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            while True:
+                chunk = file_storage.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if size == 0 and _missing_pdf_header(chunk):
+                    raise UploadRejected(f"{name} is not a PDF document.")
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadRejected(f"{name} is larger than {_limit_label(max_bytes)}.")
+                digest.update(chunk)
+                handle.write(chunk)
+            if size == 0:
+                raise UploadRejected(f"{name} is empty.")
+            handle.flush()
+            os.fsync(handle.fileno())
+    except BaseException:
+        os.unlink(path)
+        raise
+    return SpooledUpload(
+        path=path,
+        content_hash=digest.hexdigest(),
+        size=size,
+        filename=file_storage.filename,
+        mimetype=file_storage.mimetype or "application/pdf",
+    )
+
+
+class FileOrUploadRequired:
+    """Like ``FileRequired``, but a finalised resumable upload in ``upload_field`` also counts."""
+
+    def __init__(self, upload_field: str, message: str = "Upload a PDF document"):
+        self.upload_field = upload_field
+        self.message = message
+        self.field_flags = {"required": True}
+
+    def __call__(self, form, field):
+        if field.data or form[self.upload_field].data:
+            return
+        field.errors[:] = []
+        raise StopValidation(self.message)
+
+
+def _session_path(upload_id: str) -> str:
+    return os.path.join(_spool_dir(), "sessions", f"{upload_id}.part")
+
+
+def _expiry():
+    return utcnow() + timedelta(seconds=current_app.config.get("UPLOAD_SESSION_TTL", 24 * 3600))
+
+
+def describe(upload_session: UploadSession) -> dict:
+    return {
+        "id": upload_session.id,
+        "filename": upload_session.filename,
+        "size": upload_session.total_size,
+        "offset": upload_session.received,
+        "complete": upload_session.is_complete,
+        "chunk_size": current_app.config.get("UPLOAD_CHUNK_BYTES", 4 * 1024 * 1024),
+        "expires_at": upload_session.expires_at.isoformat() if upload_session.expires_at else None,
+    }
+
+
+def open_session(user_id: int, filename: Optional[str], size, mimetype: Optional[str] = None) -> UploadSession:
+    """Start a resumable upload of ``size`` bytes; the caller commits."""
+    name = (filename or "").strip()
+    if not name.lower().endswith(".pdf"):
+        raise UploadRejected("Upload a PDF document")
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadRejected("The upload size is missing.") from None
+    if size <= 0:
+        raise UploadRejected(f"{name} is empty.")
+    if size > _max_bytes():
+        raise UploadRejected(f"{name} is larger than {_limit_label(_max_bytes())}.")
+
+    expire_sessions()
+    upload_session = UploadSession(
+        id=secrets.token_hex(16),
+        user_id=user_id,
+        filename=name[:255],
+        mimetype=mimetype or "application/pdf",
+        total_size=size,
+        received=0,
+        status="open",
+        expires_at=_expiry(),
+    )
+    path = _session_path(upload_session.id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+    db.session.add(upload_session)
+    return upload_session
+
+
+def get_session(upload_id: Optional[str], user_id: int) -> Optional[UploadSession]:
+    """Return ``user_id``'s unexpired session ``upload_id``, if there is one."""
+    if not upload_id:
+        return None
+    return (
+        db.session.query(UploadSession)
+        .filter(
+            UploadSession.id == upload_id,
+            UploadSession.user_id == user_id,
+            UploadSession.expires_at > utcnow(),
+        )
+        .first()
+    )
+
+
+def append_chunk(upload_session: UploadSession, offset: int, stream: BinaryIO, length: int, checksum: str) -> int:
+    """Write ``length`` bytes from ``stream`` at ``offset`` and return the new offset.
+
+    The chunk only counts once its sha256 matches ``checksum``; a retried or
+    interrupted chunk simply overwrites the same range. The caller commits.
+    """
+    if upload_session.is_complete:
+        raise UploadRejected("This upload has already been finalised.")
+    if offset != upload_session.received:
+        raise ChunkOutOfOrder(upload_session.received)
+    chunk_limit = current_app.config.get("UPLOAD_CHUNK_BYTES", 4 * 1024 * 1024)
+    if length <= 0 or length > chunk_limit:
+        raise UploadRejected(f"Chunks must be between 1 byte and {_limit_label(chunk_limit)}.")
+    if offset + length > upload_session.total_size:
+        raise UploadRejected("The chunk runs past the announced upload size.")
+    if not checksum:
+        raise UploadRejected("The chunk checksum is missing.")
+
+    digest = hashlib.sha256()
+    written = 0
+    with open(_session_path(upload_session.id), "r+b") as handle:
+        handle.seek(offset)
+        while written < length:
+            piece = stream.read(min(CHUNK_SIZE, length - written))
+            if not piece:
+                break
+            if offset == 0 and written == 0 and _missing_pdf_header(piece):
+                raise UploadRejected(f"{upload_session.filename} is not a PDF document.")
+            digest.update(piece)
+            handle.write(piece)
+            written += len(piece)
+    if written != length:
+        raise ChunkCorrupted("The chunk was cut short; send it again.")
+    if digest.hexdigest() != checksum.strip().lower():
+        raise ChunkCorrupted("The chunk checksum does not match; send it again.")
+
+    # Guarded on the old offset so two workers cannot both advance the same session.
+    advanced = (
+        db.session.query(UploadSession)
+        .filter(UploadSession.id == upload_session.id, UploadSession.received == offset)
+        .update(
+            {UploadSession.received: offset + length, UploadSession.expires_at: _expiry()},
+            synchronize_session=False,
+        )
+    )
+    db.session.refresh(upload_session)
+    if not advanced:
+        raise ChunkOutOfOrder(upload_session.received)
+    return upload_session.received
+
+
+def finalise(upload_session: UploadSession) -> UploadSession:
+    """Hash the assembled file and mark the session attachable; the caller commits."""
+    if upload_session.is_complete:
+        return upload_session
+    if upload_session.received != upload_session.total_size:
+        raise ChunkOutOfOrder(upload_session.received)
+    digest = hashlib.sha256()
+    path = _session_path(upload_session.id)
+    with open(path, "rb") as handle:
+        for piece in iter(lambda: handle.read(CHUNK_SIZE), b""):
+            digest.update(piece)
+    upload_session.content_hash = digest.hexdigest()
+    upload_session.status = "complete"
+    upload_session.expires_at = _expiry()
+    return upload_session
+
+
+def cancel(upload_session: UploadSession) -> None:
+    _remove_file(_session_path(upload_session.id))
+    db.session.delete(upload_session)
+
+
+def claim(upload_id: str, user_id: int) -> SpooledUpload:
+    """The finalised session ``upload_id`` as a ``SpooledUpload`` ready for ``store_upload``."""
+    upload_session = get_session(upload_id, user_id)
+    path = _session_path(upload_id) if upload_session else None
+    if upload_session is None or not upload_session.is_complete or not os.path.exists(path):
+        raise UploadRejected("That upload is unfinished or has expired; please upload the file again.")
+    return SpooledUpload(
+        path=path,
+        content_hash=upload_session.content_hash,
+        size=upload_session.total_size,
+        filename=upload_session.filename,
+        mimetype=upload_session.mimetype,
+        keep=True,
+    )
+
+
+def resolve(file_storage, upload_id: Optional[str], user_id: int) -> Optional[SpooledUpload]:
+    """A posted file or a finalised resumable upload, whichever the form carried."""
+    if upload_id:
+        return claim(upload_id, user_id)
+    if file_storage:
+        return spool(file_storage)
+    return None
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def expire_sessions() -> int:
+    """Drop sessions past their expiry together with their spool files; the caller commits."""
+    expired = db.session.query(UploadSession.id).filter(UploadSession.expires_at <= utcnow()).all()
+    for (upload_id,) in expired:
+        _remove_file(_session_path(upload_id))
+    if expired:
+        db.session.query(UploadSession).filter(
+            UploadSession.id.in_([upload_id for (upload_id,) in expired])
+        ).delete(synchronize_session=False)
+    return len(expired)
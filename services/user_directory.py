@@ -0,0 +1,124 @@
+"""Admin user listing: keyset pages, prefix search and cached project choices.
+
+A page costs three queries however many accounts exist: the page itself
+(``id`` keyset, ``LIMIT per_page + 1``) and one ``selectinload`` each for roles
+and project links. Project choices for the user form come from a small
+per-process cache that connection-profile changes invalidate.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import or_
+from sqlalchemy.orm import selectinload
+
+from extensions import db
+from models import ConnectionProfile, User
+
+DEFAULT_PROJECT = "Algemeen"
+
+
+@dataclass
+class UserPage:
+    users: List[User]
+    search: str
+    next_after: Optional[int] = None  # pass as ``after`` for the following page
+    prev_before: Optional[int] = None  # pass as ``before`` for the preceding page
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def load_page(
+    search: str = "",
+    after: Optional[int] = None,
+    before: Optional[int] = None,
+    per_page: Optional[int] = None,
+) -> UserPage:
+    """One page of users ordered by id, optionally filtered by a search prefix."""
+    if per_page is None:
+        per_page = current_app.config.get("ADMIN_USERS_PER_PAGE", 50)
+    search = (search or "").strip()
+    query = db.session.query(User).options(selectinload(User.roles), selectinload(User.project_links))
+    if search:
+        # A case-insensitive OR across four columns cannot use the b-tree indexes, so
+        # this scans; the keyset on the primary key keeps each page's cost flat.
+        pattern = f"{_escape_like(search)}%"
+        query = query.filter(
+            or_(
+                User.username.ilike(pattern, escape="\\"),
+                User.email.ilike(pattern, escape="\\"),
+                User.first_name.ilike(pattern, escape="\\"),
+                User.last_name.ilike(pattern, escape="\\"),
+            )
+        )
+
+    if before is not None:
+        rows = query.filter(User.id < before).order_by(User.id.desc()).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        users = list(reversed(rows[:per_page]))
+        return UserPage(
+            users=users,
+            search=search,
+            next_after=users[-1].id if users else None,
+            prev_before=users[0].id if users and has_more else None,
+        )
+
+    if after is not None:
+        query = query.filter(User.id > after)
+    rows = query.order_by(User.id.asc()).limit(per_page + 1).all()
+    users = rows[:per_page]
+    return UserPage(
+        users=users,
+        search=search,
+        next_after=users[-1].id if len(rows) > per_page else None,
+        prev_before=users[0].id if users and after is not None else None,
+    )
+
+
+class _ProjectChoices:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value: Optional[Tuple[float, List[Tuple[str, str]]]] = None
+
+    def get(self, ttl: float) -> Optional[List[Tuple[str, str]]]:
+        with self._lock:
+            if self._value is None or time.monotonic() - self._value[0] > ttl:
+                return None
+            return list(self._value[1])
+
+    def put(self, choices: List[Tuple[str, str]]) -> None:
+        with self._lock:
+            self._value = (time.monotonic(), list(choices))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._value = None
+
+
+_project_choices = _ProjectChoices()
+
+
+def project_choices() -> List[Tuple[str, str]]:
+    """``(value, label)`` pairs of every connection-profile project, cached per process."""
+    cached = _project_choices.get(current_app.config.get("PROJECT_CHOICES_TTL", 300))
+    if cached is not None:
+        return cached
+    names = (
+        db.session.query(ConnectionProfile.project)
+        .distinct()
+        .order_by(ConnectionProfile.project)
+        .all()
+    )
+    choices = [(name[0], name[0]) for name in names if name[0]] or [(DEFAULT_PROJECT, DEFAULT_PROJECT)]
+    _project_choices.put(choices)
+    return choices
+
+
+def invalidate_project_choices() -> None:
+    _project_choices.clear()
@@ -1,5 +1,7 @@
 import os
+import re
 import sys
+from contextlib import contextmanager
 from pathlib import Path
 
 import pytest
@@ -18,19 +20,31 @@ def _set_env():
 
 
 @pytest.fixture()
-def app():
+def app(tmp_path):
     from app import create_app
     from extensions import db
 
     app = create_app()
-    app.config.update(WTF_CSRF_ENABLED=False)
+    app.config.update(
+        WTF_CSRF_ENABLED=False,
+        BLOB_STORE_PATH=str(tmp_path / "blobs"),
+        IDENTITY_CACHE_STAMP_PATH=str(tmp_path / "identity-cache.version"),
+        EXPORT_CACHE_PATH=str(tmp_path / "exports"),
+        UPLOAD_SPOOL_PATH=str(tmp_path / "uploads"),
+    )
     with app.app_context():
         db.create_all()
     yield app
     with app.app_context():
         db.session.remove()
         db.drop_all()
-    
+    from services import engine_registry, identity_cache, text_store, user_directory
+
+    engine_registry.dispose_all()
+    text_store.clear_memory()
+    identity_cache.clear()
+    user_directory.invalidate_project_choices()
+
 
 @pytest.fixture()
 def client(app):
@@ -77,3 +91,105 @@ def auth_client(client, admin_user):
     )
     assert response.status_code == 200
     return client
+
+
+@pytest.fixture()
+def make_user(app):
+    """Factory for extra accounts: ``make_user("pia", role=None, first_name="Pia")`` returns the new id."""
+    from extensions import db
+    from models import Role, User
+
+    def _make_user(username="student1", role="Gebruiker", password="Password123!", **fields):
+        fields.setdefault("first_name", "Stu")
+        fields.setdefault("last_name", "Dent")
+        fields.setdefault("is_active", True)
+        with app.app_context():
+            user = User(username=username, **fields)
+            user.set_password(password)
+            if role:
+                user.roles.append(db.session.query(Role).filter_by(name=role).first() or Role(name=role))
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+
+    return _make_user
+
+
+class BlobReadGuard:
+    """Records SQL and blob-store reads so tests can prove a path never touches PDF bytes."""
+
+    BLOB_COLUMN = re.compile(r"\b(assignment_documents|student_submissions)\.content\b")
+
+    def __init__(self):
+        self.statements = []
+        self.opened = []
+
+    def reset(self):
+        self.statements.clear()
+        self.opened.clear()
+
+    def assert_no_blob_reads(self):
+        offending = [stmt for stmt in self.statements if self.BLOB_COLUMN.search(stmt)]
+        assert not offending, f"PDF payload columns were selected: {offending}"
+        assert not self.opened, f"Blob store reads happened: {self.opened}"
+
+
+@pytest.fixture()
+def blob_read_guard(app, monkeypatch):
+    from sqlalchemy import event
+    from extensions import db
+    from services.blob_store import LocalBlobStore
+
+    guard = BlobReadGuard()
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        guard.statements.append(statement)
+
+    original_open = LocalBlobStore.open
+
+    def _tracking_open(self, content_hash):
+        guard.opened.append(content_hash)
+        return original_open(self, content_hash)
+
+    monkeypatch.setattr(LocalBlobStore, "open", _tracking_open)
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", _record)
+    yield guard
+    event.remove(engine, "before_cursor_execute", _record)
+
+
+class QueryBudget:
+    """Counts SQL statements so route tests can fail when a page grows extra queries."""
+
+    def __init__(self):
+        self.statements = []
+        self._active = False
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        if self._active:
+            self.statements.append(statement)
+
+    @contextmanager
+    def __call__(self, limit):
+        self.statements.clear()
+        self._active = True
+        try:
+            yield self
+        finally:
+            self._active = False
+        count = len(self.statements)
+        assert count <= limit, f"{count} queries exceeded budget of {limit}:\n" + "\n".join(self.statements)
+
+
+@pytest.fixture()
+def query_budget(app):
+    from sqlalchemy import event
+    from extensions import db
+
+    budget = QueryBudget()
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", budget.record)
+    yield budget
+    event.remove(engine, "before_cursor_execute", budget.record)
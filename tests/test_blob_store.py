@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+from extensions import db
+from models import AssignmentDocument
+from services.blob_store import BlobStore, BlobStoreError, LocalBlobStore, get_blob_store, hash_bytes
+
+
+def test_local_store_deduplicates_identical_payloads(tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+
+    first = store.put(b"%PDF-rubric")
+    second = store.put(b"%PDF-rubric")
+
+    assert first == second == hash_bytes(b"%PDF-rubric")
+    assert list(store.iter_hashes()) == [first]
+    assert store.read(first) == b"%PDF-rubric"
+    assert store.path_for(first).endswith(os.path.join(first[:2], first[2:4], first))
+
+
+def test_local_store_rejects_unknown_hashes(tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+
+    with pytest.raises(BlobStoreError):
+        store.open("not-a-hash")
+    with pytest.raises(BlobStoreError):
+        store.open(hash_bytes(b"never stored"))
+
+
+def test_incomplete_backend_cannot_be_instantiated():
+    class PutOnlyStore(BlobStore):
+        def put(self, data):
+            return hash_bytes(data)
+
+    with pytest.raises(TypeError, match="abstract"):
+        PutOnlyStore()
+
+
+def test_collect_garbage_keeps_referenced_and_recent_blobs(tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+    kept = store.put(b"referenced")
+    orphan = store.put(b"orphan")
+    fresh = store.put(b"fresh orphan")
+    old = os.path.getmtime(store.path_for(orphan)) - 7200
+    os.utime(store.path_for(orphan), (old, old))
+    os.utime(store.path_for(kept), (old, old))
+
+    removed = store.collect_garbage({kept}, grace_seconds=3600)
+
+    assert removed == [orphan]
+    assert store.exists(kept)
+    assert store.exists(fresh)
+    assert not store.exists(orphan)
+
+
+def test_documents_reference_blobs_by_hash(app):
+    with app.app_context():
+        document = AssignmentDocument(slot=1, label="Rubric", filename="rubric.pdf")
+        document.store_content(b"%PDF-shared")
+
+        assert document.content is None
+        assert document.file_size == len(b"%PDF-shared")
+        assert document.content_hash == hash_bytes(b"%PDF-shared")
+        assert document.read_content() == b"%PDF-shared"
+        assert get_blob_store().exists(document.content_hash)
+
+
+def test_blob_gc_command_removes_unreferenced_blobs(app):
+    with app.app_context():
+        store = get_blob_store()
+        orphan = store.put(b"%PDF-orphan")
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["blob-gc", "--grace", "0"])
+
+    assert "Removed 1 unreferenced blob(s)." in result.output
+    with app.app_context():
+        assert not get_blob_store().exists(orphan)
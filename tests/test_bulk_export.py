@@ -0,0 +1,74 @@
+import zipfile
+from io import BytesIO
+
+from extensions import db
+from models import Assignment, StudentSubmission, StudentSubmissionMessage
+
+
+def _seed_conversations(app, make_user, students=3, title="Bulk Export"):
+    student_ids = [
+        make_user(f"student {index}", first_name="S", last_name=str(index)) for index in range(students)
+    ]
+    with app.app_context():
+        assignment = Assignment(title=title)
+        db.session.add(assignment)
+        for student_id in student_ids:
+            submission = StudentSubmission(
+                assignment=assignment, student_id=student_id, filename="case.pdf", file_size=0
+            )
+            db.session.add(submission)
+            for turn in range(3):
+                db.session.add(
+                    StudentSubmissionMessage(submission=submission, role="student", content=f"Turn {turn}")
+                )
+        db.session.commit()
+        return assignment.id
+
+
+def test_lecturer_downloads_all_conversations_as_zip(app, auth_client, make_user):
+    assignment_id = _seed_conversations(app, make_user)
+    app.config["EXPORT_ZIP_WORKERS"] = 0
+
+    response = auth_client.get(f"/lecturer/assignments/{assignment_id}/conversations.zip")
+    assert response.status_code == 200
+    assert response.mimetype == "application/zip"
+    assert response.is_streamed
+
+    archive = zipfile.ZipFile(BytesIO(response.data))
+    names = archive.namelist()
+    assert len(names) == 3
+    assert names[0].startswith("student_0_")
+    assert all(archive.read(name).startswith(b"%PDF") for name in names)
+
+    # Second export reuses the per-conversation cache and yields the same files.
+    again = zipfile.ZipFile(BytesIO(auth_client.get(f"/lecturer/assignments/{assignment_id}/conversations.zip").data))
+    assert {name: again.read(name) for name in again.namelist()} == {name: archive.read(name) for name in names}
+
+
+def test_zip_download_name_is_quoted_for_any_title(app, auth_client, make_user):
+    from werkzeug.http import parse_options_header
+
+    assignment_id = _seed_conversations(app, make_user, students=1, title='Café "quoted" 東京')
+    app.config["EXPORT_ZIP_WORKERS"] = 0
+
+    response = auth_client.get(f"/lecturer/assignments/{assignment_id}/conversations.zip")
+    assert response.status_code == 200
+    disposition, options = parse_options_header(response.headers["Content-Disposition"])
+    assert disposition == "attachment"
+    assert options["filename"] == 'conversations_Café_"quoted"_東京.zip'
+    header = response.headers["Content-Disposition"]
+    assert 'filename="conversations_Cafe_\\"quoted\\"_.zip"' in header
+    header.encode("latin-1")
+
+
+def test_export_conversations_cli_renders_on_process_pool(app, tmp_path, make_user):
+    assignment_id = _seed_conversations(app, make_user, students=4)
+    output = tmp_path / "export.zip"
+
+    result = app.test_cli_runner().invoke(
+        args=["export-conversations", str(assignment_id), "--output", str(output), "--workers", "2"]
+    )
+    assert result.exit_code == 0, result.output
+    with zipfile.ZipFile(output) as archive:
+        assert len(archive.namelist()) == 4
+        assert archive.testzip() is None
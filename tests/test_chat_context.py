@@ -0,0 +1,117 @@
+from datetime import timedelta
+
+import pytest
+
+from extensions import db
+from models import Assignment, StudentSubmission, StudentSubmissionMessage, utcnow
+from services import chat_llm
+
+
+def _submission(app, make_user, turns):
+    student_id = make_user("sam", first_name="Sam", last_name="Student")
+    with app.app_context():
+        assignment = Assignment(title="Context budget")
+        submission = StudentSubmission(
+            assignment=assignment,
+            student_id=student_id,
+            filename="analysis.pdf",
+            file_size=0,
+            summary="The student argues that automated checks reduce errors.",
+        )
+        db.session.add_all([assignment, submission])
+        started = utcnow() - timedelta(hours=1)
+        for index in range(turns):
+            db.session.add(
+                StudentSubmissionMessage(
+                    submission=submission,
+                    role="student" if index % 2 == 0 else "assistant",
+                    content=f"Turn {index}: " + "discussion of benefit decisions " * 12,
+                    created_at=started + timedelta(seconds=index),
+                )
+            )
+        db.session.commit()
+        return submission.id
+
+
+def _plan(submission, message="What next?", budget=None, current=None):
+    return chat_llm.build_context(
+        submission=submission,
+        user_message=message,
+        model="gpt-4o-mini",
+        include_lecturer_summary=True,
+        include_student_summary=True,
+        current_message=current,
+        budget=budget,
+    )
+
+
+def test_short_history_fits_without_folding(app, monkeypatch, make_user):
+    submission_id = _submission(app, make_user, turns=4)
+    monkeypatch.setattr(chat_llm, "_fold_history", lambda *args: pytest.fail("unexpected fold"))
+
+    with app.app_context():
+        submission = db.session.get(StudentSubmission, submission_id)
+        current = StudentSubmissionMessage(submission=submission, role="student", content="What next?")
+        db.session.add(current)
+        db.session.flush()
+
+        plan = _plan(submission, current=current)
+
+    contents = [m["content"] for m in plan.messages]
+    assert contents.count("What next?") == 1
+    assert plan.messages[-1] == {"role": "user", "content": "What next?"}
+    assert plan.history_included == 4
+    assert plan.history_folded == 0
+    assert plan.estimated_tokens <= plan.budget
+
+
+def test_long_history_is_folded_into_rolling_summary(app, monkeypatch, make_user):
+    submission_id = _submission(app, make_user, turns=30)
+    folds = []
+
+    def fake_fold(previous, turns, model):
+        folds.append((previous, len(turns)))
+        return f"Rolling summary of {len(turns)} turns"
+
+    monkeypatch.setattr(chat_llm, "_fold_history", fake_fold)
+
+    with app.app_context():
+        submission = db.session.get(StudentSubmission, submission_id)
+        plan = _plan(submission, budget=1500)
+        db.session.commit()
+
+        assert len(folds) == 1
+        assert plan.history_folded == folds[0][1]
+        assert plan.history_included + plan.history_folded == 30
+        assert plan.used_history_summary
+        assert plan.estimated_tokens <= 1500
+        assert any("Rolling summary of" in m["content"] for m in plan.messages if m["role"] == "system")
+
+        submission = db.session.get(StudentSubmission, submission_id)
+        assert submission.history_summary.startswith("Rolling summary of")
+        assert submission.history_summary_through_id is not None
+
+        # The next turn reuses the stored summary instead of folding again.
+        again = _plan(submission, budget=1500)
+        assert len(folds) == 1
+        assert again.history_folded == 0
+        assert again.history_included == plan.history_included
+
+
+def test_fold_failure_drops_oldest_turns(app, monkeypatch, make_user):
+    submission_id = _submission(app, make_user, turns=30)
+
+    def failing_fold(previous, turns, model):
+        raise chat_llm.ConversationError("rate limited")
+
+    monkeypatch.setattr(chat_llm, "_fold_history", failing_fold)
+
+    with app.app_context():
+        submission = db.session.get(StudentSubmission, submission_id)
+        plan = _plan(submission, budget=1500)
+
+        assert plan.fold_failed
+        assert plan.history_dropped > 0
+        assert plan.estimated_tokens <= 1500
+        assert submission.history_summary is None
+        assert plan.as_context()["history_dropped"] == plan.history_dropped
@@ -0,0 +1,73 @@
+import time
+
+from extensions import db
+from models import ConnectionHealth, ConnectionProfile
+from services import connection_health
+
+
+def _profiles(app, monkeypatch, tmp_path, names):
+    uris = {
+        "ok": f"sqlite:///{tmp_path / 'ok.db'}",
+        "slow": f"sqlite:///{tmp_path / 'slow.db'}",
+        "broken": f"sqlite:///{tmp_path / 'missing' / 'broken.db'}",
+    }
+    monkeypatch.setattr(ConnectionProfile, "build_uri", lambda self: uris[self.name])
+    with app.app_context():
+        for name in names:
+            db.session.add(ConnectionProfile(name=name, project="Alpha"))
+        db.session.commit()
+
+
+def _slow_probe(monkeypatch, delay):
+    original = connection_health._probe
+
+    def probe(engine):
+        if "slow" in str(engine.url):
+            time.sleep(delay)
+        return original(engine)
+
+    monkeypatch.setattr(connection_health, "_probe", probe)
+
+
+def test_sweep_probes_concurrently_with_per_profile_timeout(app, monkeypatch, tmp_path):
+    _profiles(app, monkeypatch, tmp_path, ["ok", "slow", "broken"])
+    _slow_probe(monkeypatch, 2)
+    with app.app_context():
+        started = time.monotonic()
+        results = {r.profile_id: r for r in connection_health.sweep(workers=3, timeout=0.3)}
+        elapsed = time.monotonic() - started
+        by_name = {p.name: results[p.id] for p in db.session.query(ConnectionProfile)}
+
+    assert elapsed < 1.5
+    assert by_name["ok"].ok
+    assert by_name["ok"].server_version.startswith("SQLite ")
+    assert by_name["ok"].latency_ms is not None
+    assert by_name["slow"].status == connection_health.STATUS_TIMEOUT
+    assert by_name["broken"].status == connection_health.STATUS_ERROR
+    assert "unable to open database file" in by_name["broken"].error
+
+
+def test_admin_page_shows_stored_status_without_probing(app, auth_client, monkeypatch, tmp_path):
+    _profiles(app, monkeypatch, tmp_path, ["ok", "broken"])
+    response = auth_client.post("/beheer/connection/health", follow_redirects=True)
+    assert "1 van 2 profielen bereikbaar".encode() in response.data
+    with app.app_context():
+        assert db.session.query(ConnectionHealth).count() == 2
+
+    calls = []
+    monkeypatch.setattr(connection_health, "_probe", lambda engine: calls.append(engine))
+    page = auth_client.get("/beheer/connection")
+    assert calls == []
+    assert b"SQLite " in page.data
+    assert b"unable to open database file" in page.data
+    assert b"Onbekend" not in page.data
+
+
+def test_deleting_a_profile_removes_its_status(app, auth_client, monkeypatch, tmp_path):
+    _profiles(app, monkeypatch, tmp_path, ["ok"])
+    with app.app_context():
+        profile_id = db.session.query(ConnectionProfile.id).scalar()
+    auth_client.post("/beheer/connection/test", data={"id": profile_id})
+    auth_client.post(f"/beheer/connection?project=Alpha&id={profile_id}", data={"action": "delete", "id": profile_id})
+    with app.app_context():
+        assert db.session.get(ConnectionHealth, profile_id) is None
@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+import sqlalchemy as sa
+
+from extensions import db
+from models import ConnectionProfile
+from services import engine_registry
+
+
+def _sqlite_profile(app, monkeypatch, tmp_path):
+    uri = f"sqlite:///{tmp_path / 'project.db'}"
+    monkeypatch.setattr(ConnectionProfile, "build_uri", lambda self: uri)
+    with app.app_context():
+        profile = ConnectionProfile(name="Lokaal", project="Alpha")
+        db.session.add(profile)
+        db.session.commit()
+        return profile.id
+
+
+def test_engine_is_reused_until_profile_changes(app, monkeypatch, tmp_path):
+    profile_id = _sqlite_profile(app, monkeypatch, tmp_path)
+    with app.app_context():
+        profile = db.session.get(ConnectionProfile, profile_id)
+        engine = engine_registry.engine_for(profile)
+        assert engine_registry.engine_for(profile) is engine
+        assert engine.pool.size() == app.config["PROJECT_DB_POOL_SIZE"]
+        with engine.connect() as con:
+            assert engine_registry.server_version(con).startswith("SQLite ")
+        assert engine.pool.checkedin() == 1
+
+        profile.updated_at = profile.updated_at + timedelta(seconds=1)
+        rebuilt = engine_registry.engine_for(profile)
+        assert rebuilt is not engine
+        assert engine.pool.checkedin() == 0
+
+
+def test_connection_test_reuses_pooled_engine(app, auth_client, monkeypatch, tmp_path):
+    profile_id = _sqlite_profile(app, monkeypatch, tmp_path)
+    created = []
+    original = sa.create_engine
+    monkeypatch.setattr(sa, "create_engine", lambda *a, **kw: created.append(a) or original(*a, **kw))
+
+    for _ in range(3):
+        response = auth_client.post("/beheer/connection/test", data={"id": profile_id}, follow_redirects=True)
+        assert "OK – SQLite".encode() in response.data
+    assert len(created) == 1
+
+    auth_client.post(
+        f"/beheer/connection?project=Alpha&id={profile_id}",
+        data={
+            "action": "save",
+            "name": "Lokaal",
+            "project": "Alpha",
+            "host": "localhost",
+            "port": "1433",
+            "database": "other",
+            "username": "sa",
+            "odbc_driver": "ODBC Driver 17 for SQL Server",
+        },
+    )
+    assert engine_registry.cached_engine(profile_id) is None
+    auth_client.post("/beheer/connection/test", data={"id": profile_id})
+    assert len(created) == 2
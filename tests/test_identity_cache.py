@@ -0,0 +1,37 @@
+from extensions import db
+from models import Role, User
+from services import identity_cache
+
+
+def test_authorised_requests_skip_user_and_role_queries(auth_client, query_budget):
+    auth_client.get("/beheer/")
+    with query_budget(2):  # only the summary-cache stats the dashboard shows
+        assert auth_client.get("/beheer/").status_code == 200
+    assert not [stmt for stmt in query_budget.statements if "FROM users" in stmt or "FROM roles" in stmt]
+
+
+def test_admin_changes_invalidate_cached_identity(app, auth_client, make_user):
+    user_id = make_user()
+    with app.test_request_context():
+        assert identity_cache.load(user_id).is_active is True
+
+    assert auth_client.post(f"/beheer/users/{user_id}/toggle").status_code == 302
+    with app.test_request_context():
+        assert identity_cache.load(user_id).is_active is False
+
+    assert auth_client.post(f"/beheer/users/{user_id}/delete").status_code == 302
+    with app.test_request_context():
+        assert identity_cache.load(user_id) is None
+
+
+def test_version_stamp_drops_entries_cached_by_other_workers(app, make_user):
+    user_id = make_user()
+    with app.test_request_context():
+        assert identity_cache.load(user_id).role_names == frozenset({"Gebruiker"})
+        user = db.session.get(User, user_id)
+        user.roles = [Role(name="Beheerder")]
+        db.session.commit()
+        # Still served from this worker's cache until someone bumps the stamp.
+        assert identity_cache.load(user_id).role_names == frozenset({"Gebruiker"})
+        identity_cache._bump_stamp()
+        assert identity_cache.load(user_id).role_names == frozenset({"Beheerder"})
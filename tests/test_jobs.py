@@ -0,0 +1,157 @@
+from datetime import timedelta
+
+from fpdf import FPDF
+
+from extensions import db
+from models import Assignment, AssignmentDocument, BackgroundJob, utcnow
+from services import jobs
+from services.openai_summarizer import SummaryResult
+
+
+def _document(app):
+    with app.app_context():
+        assignment = Assignment(title="Queued summaries")
+        document = AssignmentDocument(assignment=assignment, slot=1, label="Brief", filename="brief.pdf")
+        pdf = FPDF()
+        pdf.set_font("Helvetica", size=12)
+        pdf.add_page()
+        pdf.cell(0, 10, "Course brief")
+        document.store_content(bytes(pdf.output()))
+        db.session.add_all([assignment, document])
+        db.session.commit()
+        return document.id
+
+
+def test_failed_job_is_retried_with_backoff(app, monkeypatch):
+    document_id = _document(app)
+    calls = []
+
+    def flaky(content, model):
+        calls.append(model)
+        if len(calls) == 1:
+            raise RuntimeError("upstream timeout")
+        return SummaryResult(text="Recovered summary", model=model)
+
+    monkeypatch.setattr("services.jobs.summarise_text", flaky)
+
+    with app.app_context():
+        app.config["JOB_RETRY_BASE_SECONDS"] = 30
+        job = jobs.enqueue_summary(db.session.get(AssignmentDocument, document_id), "gpt-4o-mini")
+        db.session.commit()
+
+        assert jobs.run_pending() == 1
+        job = db.session.get(BackgroundJob, job.id)
+        assert job.status == "queued"
+        assert job.attempts == 1
+        assert job.last_error == "upstream timeout"
+        # Backoff keeps the job out of reach until run_after passes.
+        assert jobs.run_pending() == 0
+
+        job.run_after = utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        assert jobs.run_pending() == 1
+
+        job = db.session.get(BackgroundJob, job.id)
+        assert job.status == "succeeded"
+        assert db.session.get(AssignmentDocument, document_id).summary == "Recovered summary"
+
+
+def test_job_fails_after_max_attempts(app, monkeypatch):
+    document_id = _document(app)
+
+    def broken(content, model):
+        raise RuntimeError("still broken")
+
+    monkeypatch.setattr("services.jobs.summarise_text", broken)
+
+    with app.app_context():
+        app.config.update(JOB_MAX_ATTEMPTS=2, JOB_RETRY_BASE_SECONDS=0)
+        job = jobs.enqueue_summary(db.session.get(AssignmentDocument, document_id), "gpt-4o-mini")
+        db.session.commit()
+
+        assert jobs.run_pending() == 2
+        job = db.session.get(BackgroundJob, job.id)
+        assert job.status == "failed"
+        assert job.attempts == 2
+        assert job.finished_at is not None
+
+
+def test_repeated_enqueue_reuses_queued_job(app):
+    document_id = _document(app)
+    with app.app_context():
+        document = db.session.get(AssignmentDocument, document_id)
+        first = jobs.enqueue_summary(document, "gpt-3.5-turbo")
+        db.session.commit()
+        second = jobs.enqueue_summary(document, "gpt-4o-mini")
+        db.session.commit()
+
+        assert first.id == second.id
+        assert second.model == "gpt-4o-mini"
+        assert db.session.query(BackgroundJob).count() == 1
+
+
+def test_job_status_endpoint_and_worker_command(auth_client, app, monkeypatch):
+    document_id = _document(app)
+    monkeypatch.setattr(
+        "services.jobs.summarise_text",
+        lambda content, model: SummaryResult(text="Worker summary", model=model),
+    )
+    with app.app_context():
+        job = jobs.enqueue_summary(db.session.get(AssignmentDocument, document_id), "gpt-4o-mini")
+        db.session.commit()
+        job_id = job.id
+
+    queued = auth_client.get(f"/jobs/{job_id}")
+    assert queued.status_code == 200
+    assert queued.get_json()["status"] == "queued"
+
+    result = app.test_cli_runner().invoke(args=["jobs-worker", "--once"])
+    assert result.exit_code == 0
+
+    done = auth_client.get(f"/jobs/{job_id}").get_json()
+    assert done["status"] == "succeeded"
+    assert done["summary"] == "Worker summary"
+    assert done["summary_model"] == "gpt-4o-mini"
+
+
+def test_failed_chunk_keeps_finished_chunk_summaries_for_retry(app, monkeypatch):
+    from types import SimpleNamespace
+
+    from models import SummaryChunk
+    from services import openai_summarizer
+
+    document_id = _document(app)
+    text = "\n".join(f"Line {index}: the municipality reviews benefit decisions." for index in range(120))
+    monkeypatch.setattr("services.text_store.get_text", lambda target: SimpleNamespace(text=text))
+    requested = []
+    failures = []
+
+    def chunk(section, model, limit):
+        requested.append(section)
+        if "Line 60:" in section and not failures:
+            failures.append(section)
+            raise openai_summarizer.SummarizationError("rate limited")
+        return f"summary of {section.splitlines()[0]}"
+
+    monkeypatch.setattr(openai_summarizer, "_summarise_chunk", chunk)
+    monkeypatch.setattr(openai_summarizer, "_complete", lambda *args, **kwargs: "Combined summary")
+
+    with app.app_context():
+        app.config.update(SUMMARY_CHUNK_TOKENS=200, JOB_RETRY_BASE_SECONDS=0)
+        chunk_count = len(openai_summarizer._split_chunks(text))
+        job = jobs.enqueue_summary(db.session.get(AssignmentDocument, document_id), "gpt-4o-mini")
+        db.session.commit()
+
+        assert jobs.run_pending(limit=1) == 1
+        job = db.session.get(BackgroundJob, job.id)
+        assert job.status == "queued"
+        assert "rate limited" in job.last_error
+        assert chunk_count > 3
+        assert len(requested) == chunk_count
+        assert db.session.query(SummaryChunk).count() == chunk_count - 1
+
+        requested.clear()
+        assert jobs.run_pending() == 1
+        assert db.session.get(BackgroundJob, job.id).status == "succeeded"
+        assert len(requested) == 1 and "Line 60:" in requested[0]
+        assert db.session.query(SummaryChunk).count() == chunk_count
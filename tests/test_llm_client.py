@@ -0,0 +1,133 @@
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from services import chat_llm, llm_client
+from services.openai_summarizer import SummarizationError, _call_openai as summarise_call
+
+
+class FakeResponses:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def create(self, **kwargs):
+        self.owner.calls.append(kwargs)
+        if self.owner.error is not None:
+            raise self.owner.error
+        if kwargs.get("stream"):
+            self.owner.stream = FakeStream(["Hel", "lo"])
+            return self.owner.stream
+        usage = SimpleNamespace(input_tokens=11, output_tokens=7, total_tokens=18)
+        return SimpleNamespace(output_text=" Pooled reply ", usage=usage)
+
+
+class FakeStream:
+    def __init__(self, deltas):
+        self.events = [SimpleNamespace(type="response.output_text.delta", delta=delta) for delta in deltas]
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    instances = []
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.calls = []
+        self.error = None
+        self.closed = False
+        self.responses = FakeResponses(self)
+        FakeClient.instances.append(self)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    FakeClient.instances = []
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(llm_client, "OpenAI", FakeClient)
+    llm_client.reset_client()
+    yield FakeClient
+    llm_client.reset_client()
+
+
+def test_client_is_built_once_and_reused(fake_client):
+    first = llm_client.get_client()
+    second = llm_client.get_client()
+
+    assert first is second
+    assert len(fake_client.instances) == 1
+    assert first.kwargs["api_key"] == "sk-test"
+    assert first.kwargs["http_client"] is not None
+
+
+def test_client_is_rebuilt_after_fork_or_settings_change(fake_client, monkeypatch):
+    parent = llm_client.get_client()
+
+    monkeypatch.setattr(llm_client.os, "getpid", lambda: -1)
+    child = llm_client.get_client()
+    assert child is not parent
+    # The parent's sockets belong to the parent; the child must not close them.
+    assert parent.closed is False
+
+    monkeypatch.setenv("OPENAI_READ_TIMEOUT", "5")
+    rotated = llm_client.get_client()
+    assert rotated is not child
+    assert child.closed is True
+
+
+def test_settings_are_read_from_environment(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-env")
+    monkeypatch.setenv("OPENAI_CONNECT_TIMEOUT", "2.5")
+    monkeypatch.setenv("OPENAI_MAX_RETRIES", "4")
+    monkeypatch.setenv("OPENAI_MAX_CONNECTIONS", "8")
+
+    settings = llm_client.ClientSettings.from_env()
+
+    assert settings.connect_timeout == 2.5
+    assert settings.max_retries == 4
+    assert settings.max_connections == 8
+
+    monkeypatch.delenv("OPENAI_API_KEY")
+    with pytest.raises(llm_client.LLMClientError):
+        llm_client.ClientSettings.from_env()
+
+
+def test_chat_and_summary_share_the_pooled_client(fake_client):
+    reply = chat_llm._call_openai([{"role": "user", "content": "Hi"}], "gpt-4o-mini")
+    summary = summarise_call("Some course text", "gpt-4o-mini")
+
+    assert len(fake_client.instances) == 1
+    client = fake_client.instances[0]
+    assert len(client.calls) == 2
+    assert reply.text == "Pooled reply"
+    assert reply.total_tokens == 18
+    assert summary == "Pooled reply"
+
+
+def test_sdk_errors_are_wrapped(fake_client):
+    llm_client.get_client().error = openai.OpenAIError("connection reset")
+
+    with pytest.raises(chat_llm.ConversationError, match="connection reset"):
+        chat_llm._call_openai([{"role": "user", "content": "Hi"}], "gpt-4o-mini")
+    with pytest.raises(SummarizationError, match="connection reset"):
+        summarise_call("Some course text", "gpt-4o-mini")
+
+
+def test_closing_the_chat_stream_closes_the_sdk_response(fake_client):
+    stream = chat_llm._stream_openai([{"role": "user", "content": "Hi"}], "gpt-4o-mini")
+    assert next(stream) == "Hel"
+    stream.close()  # what the SSE route does when the student disconnects
+    assert llm_client.get_client().stream.closed
+
+    finished = list(chat_llm._stream_openai([{"role": "user", "content": "Hi"}], "gpt-4o-mini"))
+    assert finished[-1].text == "Hello"
+    assert llm_client.get_client().stream.closed
@@ -0,0 +1,124 @@
+import json
+import logging.config
+from pathlib import Path
+
+import sqlalchemy as sa
+from flask_migrate import downgrade, upgrade
+
+from models import StudentSubmissionMessage
+
+MIGRATIONS = str(Path(__file__).resolve().parents[1] / "migrations")
+BEFORE = "2c91b6f4e7a3"
+PROMOTED = "8b6f2d4c9e01"
+
+
+def test_set_context_splits_columns_from_json_extras():
+    message = StudentSubmissionMessage(role="assistant", content="Reply")
+    message.set_context(prompt_id=7, include_lecturer_summary=True, total_tokens=42, prompt_title="Intro")
+
+    assert message.prompt_id == 7
+    assert message.include_lecturer_summary is True
+    assert message.include_student_summary is None
+    assert message.total_tokens == 42
+    assert json.loads(message.context) == {"prompt_title": "Intro"}
+
+
+def test_set_context_replaces_previous_values():
+    message = StudentSubmissionMessage(role="assistant", content="Reply")
+    message.set_context(prompt_id=7, prompt_tokens=10, prompt_title="Intro")
+    message.set_context(completion_tokens=5)
+
+    assert message.prompt_id is None
+    assert message.prompt_tokens is None
+    assert message.completion_tokens == 5
+    assert message.context is None
+    assert message.get_context() == {"completion_tokens": 5}
+
+
+def test_get_context_merges_columns_and_extras():
+    message = StudentSubmissionMessage(role="assistant", content="Reply")
+    assert message.get_context() is None
+
+    message.set_context(prompt_id=3, include_student_summary=False, budget={"dropped": 2})
+    assert message.get_context() == {"prompt_id": 3, "include_student_summary": False, "budget": {"dropped": 2}}
+
+    # Keys left in legacy JSON win over columns, matching the pre-column shape.
+    message.context = json.dumps({"prompt_id": 4, "note": "legacy"})
+    assert message.get_context() == {"prompt_id": 4, "include_student_summary": False, "note": "legacy"}
+
+    message.context = "{not json"
+    assert message.get_context() == {"prompt_id": 3, "include_student_summary": False}
+
+
+def _migration_app(monkeypatch, tmp_path):
+    from app import create_app
+    from config import Config
+
+    monkeypatch.setattr(Config, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'migrate.db'}")
+    # env.py's fileConfig would disable every logger created before it, breaking caplog in later tests.
+    monkeypatch.setattr(logging.config, "fileConfig", lambda *args, **kwargs: None)
+    return create_app()
+
+
+def _messages(connection):
+    rows = connection.execute(sa.text("SELECT * FROM student_submission_messages ORDER BY id")).mappings()
+    return {row["id"]: dict(row) for row in rows}
+
+
+def test_migration_backfills_context_columns_and_downgrade_restores_json(monkeypatch, tmp_path):
+    from extensions import db
+
+    app = _migration_app(monkeypatch, tmp_path)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS, revision=BEFORE)
+        with db.engine.begin() as connection:
+            connection.execute(
+                sa.text(
+                    "INSERT INTO assignment_prompts (id, assignment_id, title, prompt_text) "
+                    "VALUES (5, 1, 'Intro', 'Explain')"
+                )
+            )
+            contexts = {
+                1: json.dumps({"prompt_id": 5, "include_lecturer_summary": True, "total_tokens": 90, "title": "Intro"}),
+                2: json.dumps({"prompt_id": 999, "prompt_tokens": 12}),
+                3: "not json",
+                4: None,
+            }
+            for message_id, context in contexts.items():
+                connection.execute(
+                    sa.text(
+                        "INSERT INTO student_submission_messages (id, submission_id, role, content, context) "
+                        "VALUES (:id, 1, 'assistant', 'Reply', :context)"
+                    ),
+                    {"id": message_id, "context": context},
+                )
+
+        upgrade(directory=MIGRATIONS, revision=PROMOTED)
+        with db.engine.connect() as connection:
+            rows = _messages(connection)
+        assert rows[1]["prompt_id"] == 5
+        assert rows[1]["include_lecturer_summary"] == 1
+        assert rows[1]["total_tokens"] == 90
+        assert json.loads(rows[1]["context"]) == {"title": "Intro"}
+        # Unknown prompt ids would violate the new foreign key, so they are dropped.
+        assert rows[2]["prompt_id"] is None
+        assert rows[2]["prompt_tokens"] == 12
+        assert rows[2]["context"] is None
+        assert rows[3]["context"] == "not json"
+        assert rows[3]["prompt_id"] is None
+        assert rows[4]["context"] is None
+
+        downgrade(directory=MIGRATIONS, revision=BEFORE)
+        with db.engine.connect() as connection:
+            rows = _messages(connection)
+        assert json.loads(rows[1]["context"]) == {
+            "prompt_id": 5,
+            "include_lecturer_summary": True,
+            "total_tokens": 90,
+            "title": "Intro",
+        }
+        assert json.loads(rows[2]["context"]) == {"prompt_tokens": 12}
+        assert rows[3]["context"] == "not json"
+        assert rows[4]["context"] is None
+        assert "prompt_id" not in rows[1]
+        db.engine.dispose()
@@ -0,0 +1,110 @@
+import threading
+import time
+
+from extensions import db
+from models import SummaryChunk
+from services import openai_summarizer
+from services.openai_summarizer import _split_chunks, chunk_chars, summarise_text
+
+
+def _long_text(lines=400):
+    return "\n".join(
+        f"Line {index}: the municipality reviews benefit decisions under pressure." for index in range(lines)
+    )
+
+
+def _fake_llm(monkeypatch):
+    calls = {"chunks": [], "threads": set(), "reduce": []}
+    lock = threading.Lock()
+
+    def fake_chunk(text, model, limit):
+        with lock:
+            calls["chunks"].append(text)
+            calls["threads"].add(threading.current_thread().name)
+        time.sleep(0.02)  # keep workers busy so the pool has to fan out
+        return f"summary of {text.splitlines()[0]}"
+
+    def fake_complete(system_prompt, text, model, max_tokens=400, limit=None):
+        calls["reduce"].append(text)
+        return "Combined summary"
+
+    monkeypatch.setattr(openai_summarizer, "_summarise_chunk", fake_chunk)
+    monkeypatch.setattr(openai_summarizer, "_complete", fake_complete)
+    return calls
+
+
+def test_split_chunks_respects_budget_and_keeps_all_text():
+    text = _long_text()
+    chunks = _split_chunks(text)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= chunk_chars() for chunk in chunks)
+    assert "\n".join(chunks) == text
+
+
+def test_short_text_is_summarised_in_one_call(monkeypatch):
+    calls = _fake_llm(monkeypatch)
+
+    result = summarise_text("A short course brief.", "gpt-4o-mini")
+
+    assert result.text == "Combined summary"
+    assert calls["chunks"] == []
+    assert len(calls["reduce"]) == 1
+
+
+def test_long_text_is_mapped_in_parallel_and_reduced(app, monkeypatch):
+    calls = _fake_llm(monkeypatch)
+    text = _long_text()
+
+    with app.app_context():
+        result = summarise_text(text, "gpt-4o-mini")
+        db.session.commit()
+
+        chunk_count = len(_split_chunks(text))
+        assert result.text == "Combined summary"
+        assert len(calls["chunks"]) == chunk_count
+        assert len(calls["threads"]) > 1
+        assert "summary of Line 0:" in calls["reduce"][-1]
+        assert db.session.query(SummaryChunk).count() == chunk_count
+
+
+def test_partial_edit_only_recomputes_changed_chunks(app, monkeypatch):
+    calls = _fake_llm(monkeypatch)
+    lines = _long_text().splitlines()
+
+    with app.app_context():
+        summarise_text("\n".join(lines), "gpt-4o-mini")
+        db.session.commit()
+        first_run = len(calls["chunks"])
+
+        lines[50] = "Line edited: the appeal deadline moved to six weeks after the original decision date."
+        calls["chunks"].clear()
+        summarise_text("\n".join(lines), "gpt-4o-mini")
+
+    assert first_run > 2
+    assert 1 <= len(calls["chunks"]) <= 2 < first_run
+    assert any("Line edited" in chunk for chunk in calls["chunks"])
+
+
+def test_configured_chunk_size_reaches_the_model_in_full(app, monkeypatch):
+    from services import llm_client
+
+    prompts = []
+    lock = threading.Lock()
+
+    def fake_response(messages, model, temperature, max_tokens):
+        with lock:
+            prompts.append((messages[0]["content"], messages[1]["content"]))
+        return llm_client.LLMResponse(text="summary")
+
+    monkeypatch.setattr(llm_client, "create_response", fake_response)
+    text = _long_text(800)
+
+    with app.app_context():
+        app.config["SUMMARY_CHUNK_TOKENS"] = 3000
+        chunks = _split_chunks(text)
+        assert max(len(chunk) for chunk in chunks) > openai_summarizer.DEFAULT_CHUNK_TOKENS * 4
+        summarise_text(text, "gpt-4o-mini")
+
+    sent = sorted(content for system, content in prompts if system == openai_summarizer.CHUNK_SYSTEM_PROMPT)
+    assert sent == sorted(chunks)
@@ -0,0 +1,104 @@
+from io import BytesIO
+
+from fpdf import FPDF
+from pypdf import PdfReader, PdfWriter
+
+from extensions import db
+from models import Assignment, AssignmentDocument, BackgroundJob, PdfInspection, StudentSubmission
+from services import jobs, pdf_inspect
+
+
+def _pdf(*pages):
+    pdf = FPDF()
+    pdf.set_font("Helvetica", size=12)
+    for text in pages:
+        pdf.add_page()
+        if text:
+            pdf.cell(0, 10, text)
+        else:
+            pdf.rect(20, 20, 100, 60, style="F")  # a "scanned" page: graphics, no fonts
+    return bytes(pdf.output())
+
+
+def _encrypted(payload, password="secret"):
+    writer = PdfWriter(clone_from=PdfReader(BytesIO(payload)))
+    writer.encrypt(user_password=password, owner_password="owner", algorithm="RC4-128")
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def test_inspect_reports_pages_and_estimated_text():
+    report = pdf_inspect.inspect(BytesIO(_pdf("First page of the brief", "Second page", "Third page")))
+    assert report.usable
+    assert report.page_count == 3
+    assert report.has_text_layer
+    assert not report.encrypted
+    assert report.pdf_version == "1.3"
+    assert report.estimated_chars > len("Second page")
+
+
+def test_inspect_flags_unusable_documents():
+    assert pdf_inspect.inspect(BytesIO(_pdf("", ""))).problem == "no_text"
+    assert pdf_inspect.inspect(BytesIO(b"%PDF-1.4 but not really")).problem == "unreadable"
+    assert pdf_inspect.inspect(BytesIO(b"\x89PNG\r\n")).problem == "unreadable"
+
+    locked = pdf_inspect.inspect(BytesIO(_encrypted(_pdf("Secret brief"))))
+    assert locked.encrypted and locked.problem == "encrypted"
+    # An owner password alone does not stop reading.
+    assert pdf_inspect.inspect(BytesIO(_encrypted(_pdf("Open brief"), password=""))).usable
+
+
+def test_student_upload_without_text_is_rejected_before_extraction(monkeypatch, auth_client, app):
+    with app.app_context():
+        assignment = Assignment(title="Scanned upload")
+        db.session.add(assignment)
+        db.session.commit()
+        assignment_id = assignment.id
+
+    def no_extraction(*args, **kwargs):
+        raise AssertionError("text extraction ran")
+
+    monkeypatch.setattr("services.text_store.extract_text", no_extraction)
+    response = auth_client.post(
+        "/student?step=2",
+        data={
+            "upload-assignment_id": str(assignment_id),
+            "upload-model": "gpt-4o-mini",
+            "upload-document": (BytesIO(_pdf("")), "scan.pdf"),
+        },
+        content_type="multipart/form-data",
+        follow_redirects=True,
+    )
+    assert b"scan.pdf has no text layer" in response.data
+    with app.app_context():
+        assert db.session.query(StudentSubmission).count() == 0
+        assert db.session.query(BackgroundJob).count() == 0
+
+
+def test_summary_job_uses_stored_report_and_fails_without_retry(monkeypatch, app):
+    payload = _pdf("")
+
+    def no_llm(text, model):
+        raise AssertionError("LLM was called")
+
+    monkeypatch.setattr("services.jobs.summarise_text", no_llm)
+    with app.app_context():
+        assignment = Assignment(title="Scanned brief")
+        document = AssignmentDocument(assignment=assignment, slot=1, label="Brief", filename="brief.pdf")
+        document.store_content(payload)
+        db.session.add_all([assignment, document])
+        db.session.flush()
+        pdf_inspect.store(document.content_hash, pdf_inspect.inspect(BytesIO(payload)))
+        job = jobs.enqueue_summary(document, "gpt-4o-mini")
+        db.session.commit()
+
+        opened = []
+        monkeypatch.setattr(AssignmentDocument, "open_content", lambda self: opened.append(self.id))
+        assert jobs.run_pending() == 1
+        job = db.session.get(BackgroundJob, job.id)
+        assert job.status == "failed"
+        assert job.attempts == 1
+        assert "no text layer" in job.last_error
+        assert opened == []
+        assert db.session.get(PdfInspection, document.content_hash).problem == "no_text"
@@ -0,0 +1,109 @@
+from extensions import db
+from models import Assignment, AssignmentPrompt, StudentSubmission, StudentSubmissionMessage
+from services import prompt_progress
+
+
+def _setup(app, make_user, prompt_titles=("Reflection", "Mitigation")):
+    student_id = make_user("pia", first_name="Pia", last_name="Prompt")
+    with app.app_context():
+        assignment = Assignment(title="Prompt progress")
+        prompts = [
+            AssignmentPrompt(
+                assignment=assignment, title=title, prompt_text=f"{title} prompt", display_order=index
+            )
+            for index, title in enumerate(prompt_titles, start=1)
+        ]
+        submission = StudentSubmission(assignment=assignment, student_id=student_id, filename="a.pdf", file_size=0)
+        db.session.add_all([assignment, submission, *prompts])
+        db.session.flush()
+        prompt_progress.reset(submission)
+        db.session.commit()
+        return submission.id, [prompt.id for prompt in prompts]
+
+
+def _add(submission, role, content="..."):
+    message = StudentSubmissionMessage(submission=submission, role=role, content=content)
+    db.session.add(message)
+    prompt_progress.record_message(submission, message)
+    db.session.commit()
+    return message
+
+
+def test_columns_follow_the_conversation(app, make_user):
+    submission_id, prompt_ids = _setup(app, make_user)
+    with app.app_context():
+        submission = db.session.get(StudentSubmission, submission_id)
+        assert prompt_progress.should_deliver(submission)
+        assert submission.next_prompt_id == prompt_ids[0]
+
+        _add(submission, "lecturer")
+        assert (submission.prompts_delivered, submission.next_prompt_id) == (1, prompt_ids[1])
+        assert not prompt_progress.should_deliver(submission)
+
+        _add(submission, "student")
+        _add(submission, "assistant")
+        assert prompt_progress.should_deliver(submission)
+
+        _add(submission, "lecturer")
+        assert submission.prompts_delivered == 2
+        assert submission.next_prompt_id is None
+
+        expected = (submission.prompts_delivered, submission.next_prompt_id, submission.last_message_role)
+        prompt_progress.recompute(submission)
+        assert (submission.prompts_delivered, submission.next_prompt_id, submission.last_message_role) == expected
+
+
+def test_prompt_decision_does_not_load_history(app, blob_read_guard, make_user):
+    from blueprints.main.routes import _ensure_prompt_progress
+
+    submission_id, prompt_ids = _setup(app, make_user)
+    with app.app_context():
+        submission = db.session.get(StudentSubmission, submission_id)
+        for role in ("lecturer", "student", "assistant"):
+            _add(submission, role)
+
+        blob_read_guard.reset()
+        _ensure_prompt_progress(submission)
+
+        history_reads = [
+            stmt for stmt in blob_read_guard.statements
+            if stmt.lstrip().upper().startswith("SELECT") and "student_submission_messages" in stmt
+        ]
+        assert history_reads == []
+        assert submission.prompts_delivered == 2
+        assert submission.last_message_role == "lecturer"
+
+
+def test_editing_prompts_repoints_existing_submissions(auth_client, app, make_user):
+    submission_id, prompt_ids = _setup(app, make_user)
+    with app.app_context():
+        submission = db.session.get(StudentSubmission, submission_id)
+        _add(submission, "lecturer")
+        assignment_id = submission.assignment_id
+
+    # Move "Mitigation" to the front: the student already saw one prompt, so
+    # the next one is now "Reflection".
+    auth_client.post(
+        f"/lecturer/prompts/{prompt_ids[1]}/order",
+        data={"prompt_id": str(prompt_ids[1]), "display_order": "1"},
+        follow_redirects=True,
+    )
+    with app.app_context():
+        assert db.session.get(StudentSubmission, submission_id).next_prompt_id == prompt_ids[0]
+
+    auth_client.post(
+        f"/lecturer/prompts/{prompt_ids[0]}/delete",
+        data={"prompt_id": str(prompt_ids[0])},
+        follow_redirects=True,
+    )
+    with app.app_context():
+        assert db.session.get(StudentSubmission, submission_id).next_prompt_id is None
+
+    auth_client.post(
+        f"/lecturer/assignments/{assignment_id}/prompts",
+        data={"title": "Wrap-up", "prompt_text": "Summarise your argument.", "display_order": "2"},
+        follow_redirects=True,
+    )
+    with app.app_context():
+        added = db.session.query(AssignmentPrompt).filter_by(title="Wrap-up").one()
+        assert db.session.get(StudentSubmission, submission_id).next_prompt_id == added.id
@@ -1,5 +1,8 @@
+import json
 from io import BytesIO
 
+from fpdf import FPDF
+
 from extensions import db
 from models import (
     Assignment,
@@ -10,6 +13,23 @@ from models import (
 )
 
 
+def _pdf(*pages):
+    pdf = FPDF()
+    pdf.set_font("Helvetica", size=12)
+    for text in pages:
+        pdf.add_page()
+        pdf.cell(0, 10, text)
+    return bytes(pdf.output())
+
+
+BRIEF_PDF = _pdf("Instructor brief")
+INSTRUCTIONS_PDF = _pdf("Student instructions")
+DATA_PDF = _pdf("Supporting data")
+RUBRIC_PDF = _pdf("Assessment rubric")
+BRIEF_V2_PDF = _pdf("Instructor brief, second edition")
+STUDENT_PDF = _pdf("Student case analysis")
+
+
 def _create_assignment(auth_client, app, title="Mobility Forecast Challenge"):
     payload = {
         "title": title,
@@ -20,10 +40,10 @@ def _create_assignment(auth_client, app, title="Mobility Forecast Challenge"):
         "doc4_label": "Assessment rubric",
     }
     files = {
-        "doc1_file": (BytesIO(b"PDF-one"), "brief.pdf"),
-        "doc2_file": (BytesIO(b"PDF-two"), "instructions.pdf"),
-        "doc3_file": (BytesIO(b"PDF-three"), "data.pdf"),
-        "doc4_file": (BytesIO(b"PDF-four"), "rubric.pdf"),
+        "doc1_file": (BytesIO(BRIEF_PDF), "brief.pdf"),
+        "doc2_file": (BytesIO(INSTRUCTIONS_PDF), "instructions.pdf"),
+        "doc3_file": (BytesIO(DATA_PDF), "data.pdf"),
+        "doc4_file": (BytesIO(RUBRIC_PDF), "rubric.pdf"),
     }
     response = auth_client.post(
         "/lecturer/assignments",
@@ -78,8 +98,10 @@ def test_create_assignment_persists_documents(auth_client, app):
         stored_labels = [doc.label for doc in assignment.documents]
         assert "Instructor brief" in stored_labels
         doc_payload = assignment.documents[0]
-        assert doc_payload.file_size == len(b"PDF-one")
-        assert doc_payload.base64_content.startswith("UERGL")  # Base64 for "PDF"
+        assert doc_payload.file_size == len(BRIEF_PDF)
+        assert doc_payload.content is None
+        assert doc_payload.content_hash
+        assert doc_payload.base64_content.startswith("JVBERi")  # Base64 for "%PDF"
 
 
 def test_edit_assignment_replaces_document(auth_client, app):
@@ -94,7 +116,7 @@ def test_edit_assignment_replaces_document(auth_client, app):
         "doc4_label": "Assessment rubric",
     }
     files = {
-        "doc1_file": (BytesIO(b"NEW-PDF"), "brief-v2.pdf"),
+        "doc1_file": (BytesIO(BRIEF_V2_PDF), "brief-v2.pdf"),
     }
     response = auth_client.post(
         f"/lecturer/assignments/{assignment_id}/edit",
@@ -113,8 +135,8 @@ def test_edit_assignment_replaces_document(auth_client, app):
         doc1 = next(doc for doc in refreshed.documents if doc.slot == 1)
         assert doc1.label == "Instructor brief v2"
         assert doc1.filename == "brief-v2.pdf"
-        assert doc1.file_size == len(b"NEW-PDF")
-        assert doc1.base64_content.startswith("TkVXL")  # Base64 for "NEW"
+        assert doc1.file_size == len(BRIEF_V2_PDF)
+        assert doc1.base64_content.startswith("JVBERi")  # Base64 for "%PDF"
 
 
 def test_delete_assignment_removes_records(auth_client, app):
@@ -138,13 +160,14 @@ def test_delete_assignment_removes_records(auth_client, app):
 def test_generate_summary_updates_document(monkeypatch, auth_client, app):
     assignment_id = _create_assignment(auth_client, app, title="Summary Scenario")
 
-    def fake_summarise(document, model):
-        document.set_summary(f"Summary via {model}", model)
-        return None
+    class DummyResult:
+        def __init__(self, text, model):
+            self.text = text
+            self.model = model
 
     monkeypatch.setattr(
-        "blueprints.lecturer.routes.summarise_assignment_document",
-        fake_summarise,
+        "services.jobs.summarise_text",
+        lambda content, model: DummyResult(f"Summary via {model}", model),
     )
 
     response = auth_client.post(
@@ -153,11 +176,14 @@ def test_generate_summary_updates_document(monkeypatch, auth_client, app):
         follow_redirects=True,
     )
     assert response.status_code == 200
+    assert b"is being generated" in response.data
 
     from extensions import db
     from models import AssignmentDocument
+    from services import jobs
 
     with app.app_context():
+        assert jobs.run_pending() == 1
         doc1 = (
             db.session.query(AssignmentDocument)
             .filter_by(assignment_id=assignment_id, slot=1)
@@ -211,7 +237,7 @@ def test_student_upload_case_analysis(monkeypatch, auth_client, app):
         return DummyResult(f"Student summary via {model}", model)
 
     monkeypatch.setattr(
-        "blueprints.main.routes.summarise_document_content",
+        "services.jobs.summarise_text",
         fake_summary,
     )
 
@@ -220,12 +246,15 @@ def test_student_upload_case_analysis(monkeypatch, auth_client, app):
         data={
             "upload-assignment_id": str(assignment_id),
             "upload-model": "gpt-3.5-turbo",
-            "upload-document": (BytesIO(b"student pdf"), "analysis.pdf"),
+            "upload-document": (BytesIO(STUDENT_PDF), "analysis.pdf"),
         },
         content_type="multipart/form-data",
         follow_redirects=True,
     )
     assert response.status_code == 200
+    assert b"Your summary is being generated" in response.data
+
+    from services import jobs
 
     with app.app_context():
         submission = (
@@ -233,6 +262,9 @@ def test_student_upload_case_analysis(monkeypatch, auth_client, app):
             .filter_by(assignment_id=assignment_id)
             .one()
         )
+        assert submission.summary is None
+        assert jobs.run_pending() == 1
+        db.session.refresh(submission)
         assert submission.summary == "Student summary via gpt-3.5-turbo"
         assert submission.summary_model == "gpt-3.5-turbo"
 
@@ -344,7 +376,7 @@ def test_student_chat_conversation(monkeypatch, auth_client, app):
             self.model = model
 
     monkeypatch.setattr(
-        "blueprints.main.routes.summarise_document_content",
+        "services.jobs.summarise_text",
         lambda content, model: DummySummary(f"Summary via {model}", model),
     )
 
@@ -353,7 +385,7 @@ def test_student_chat_conversation(monkeypatch, auth_client, app):
         data={
             "upload-assignment_id": str(assignment_id),
             "upload-model": "gpt-3.5-turbo",
-            "upload-document": (BytesIO(b"student pdf"), "analysis.pdf"),
+            "upload-document": (BytesIO(STUDENT_PDF), "analysis.pdf"),
         },
         content_type="multipart/form-data",
         follow_redirects=True,
@@ -421,6 +453,9 @@ def test_student_chat_conversation(monkeypatch, auth_client, app):
         assert messages[2].content == "AI assistant reply."
         ctx_assistant = messages[2].get_context()
         assert ctx_assistant["total_tokens"] == 63
+        assert messages[2].total_tokens == 63
+        assert messages[0].prompt_id == prompt_ids["first"]
+        assert "total_tokens" not in json.loads(messages[2].context)
         assert messages[3].role == "lecturer"
         second_prompt_ctx = messages[3].get_context()
         assert second_prompt_ctx["prompt_id"] == prompt_ids["second"]
@@ -442,7 +477,7 @@ def test_student_download_conversation(monkeypatch, auth_client, app):
             self.model = model
 
     monkeypatch.setattr(
-        "blueprints.main.routes.summarise_document_content",
+        "services.jobs.summarise_text",
         lambda content, model: DummySummary(f"Summary via {model}", model),
     )
 
@@ -451,7 +486,7 @@ def test_student_download_conversation(monkeypatch, auth_client, app):
         data={
             "upload-assignment_id": str(assignment_id),
             "upload-model": "gpt-3.5-turbo",
-            "upload-document": (BytesIO(b"student pdf"), "analysis.pdf"),
+            "upload-document": (BytesIO(STUDENT_PDF), "analysis.pdf"),
         },
         content_type="multipart/form-data",
         follow_redirects=True,
@@ -499,3 +534,400 @@ def test_student_download_conversation(monkeypatch, auth_client, app):
     assert resp.status_code == 200
     assert resp.headers["Content-Type"].startswith("application/pdf")
     assert resp.data.startswith(b"%PDF")
+
+
+def test_chat_turn_and_list_pages_never_read_blobs(monkeypatch, auth_client, app, blob_read_guard):
+    assignment_id = _create_assignment(auth_client, app, title="Blob Guard")
+
+    auth_client.post(
+        "/student?step=1",
+        data={"select-assignment_id": str(assignment_id)},
+        follow_redirects=True,
+    )
+
+    class DummySummary:
+        def __init__(self, text, model):
+            self.text = text
+            self.model = model
+
+    monkeypatch.setattr(
+        "services.jobs.summarise_text",
+        lambda content, model: DummySummary(f"Summary via {model}", model),
+    )
+    auth_client.post(
+        "/student?step=2",
+        data={
+            "upload-assignment_id": str(assignment_id),
+            "upload-model": "gpt-3.5-turbo",
+            "upload-document": (BytesIO(STUDENT_PDF), "analysis.pdf"),
+        },
+        content_type="multipart/form-data",
+        follow_redirects=True,
+    )
+    with app.app_context():
+        submission_id = (
+            db.session.query(StudentSubmission.id)
+            .filter_by(assignment_id=assignment_id)
+            .scalar()
+        )
+
+    from services import chat_llm
+
+    captured = {}
+
+    def fake_call(messages, model):
+        captured["messages"] = messages
+        return chat_llm.ChatResult(text="AI assistant reply.", model=model)
+
+    monkeypatch.setattr(chat_llm, "_call_openai", fake_call)
+
+    blob_read_guard.reset()
+    assert auth_client.get("/lecturer/assignments").status_code == 200
+    assert auth_client.get("/student?step=3").status_code == 200
+    assert auth_client.get("/student?step=4").status_code == 200
+    response = auth_client.post(
+        "/student?step=4",
+        data={
+            "chat-submission_id": str(submission_id),
+            "chat-message": "Where do I start?",
+            "chat-include_lecturer_summary": "y",
+            "chat-include_student_summary": "y",
+        },
+        follow_redirects=True,
+    )
+    assert response.status_code == 200
+    assert b"AI assistant reply" in response.data
+    assert auth_client.get(
+        f"/student/conversation/download?submission_id={submission_id}"
+    ).status_code == 200
+
+    assert captured["messages"][-1]["content"] == "Where do I start?"
+    # The just-recorded student turn is sent once, not also as history.
+    assert [m["content"] for m in captured["messages"]].count("Where do I start?") == 1
+    blob_read_guard.assert_no_blob_reads()
+
+    with app.app_context():
+        reply = (
+            db.session.query(StudentSubmissionMessage)
+            .filter_by(submission_id=submission_id, role="assistant")
+            .one()
+        )
+        budget = reply.get_context()["context_budget"]
+        assert budget["budget"] > 0
+        assert budget["history_folded"] == 0
+
+
+def _upload_submission(monkeypatch, auth_client, app, title):
+    assignment_id = _create_assignment(auth_client, app, title=title)
+    auth_client.post(
+        "/student?step=1",
+        data={"select-assignment_id": str(assignment_id)},
+        follow_redirects=True,
+    )
+
+    class DummySummary:
+        def __init__(self, text, model):
+            self.text = text
+            self.model = model
+
+    monkeypatch.setattr(
+        "services.jobs.summarise_text",
+        lambda content, model: DummySummary(f"Summary via {model}", model),
+    )
+    auth_client.post(
+        "/student?step=2",
+        data={
+            "upload-assignment_id": str(assignment_id),
+            "upload-model": "gpt-3.5-turbo",
+            "upload-document": (BytesIO(STUDENT_PDF), "analysis.pdf"),
+        },
+        content_type="multipart/form-data",
+        follow_redirects=True,
+    )
+    with app.app_context():
+        return (
+            db.session.query(StudentSubmission.id)
+            .filter_by(assignment_id=assignment_id)
+            .scalar()
+        )
+
+
+def test_stream_conversation_emits_deltas_and_persists_reply(monkeypatch, auth_client, app):
+    submission_id = _upload_submission(monkeypatch, auth_client, app, "Streaming Flow")
+
+    from services import chat_llm
+
+    def fake_stream(**kwargs):
+        yield "Hello "
+        yield "student."
+        yield chat_llm.ChatResult(
+            text="Hello student.",
+            model=kwargs["model"],
+            prompt_tokens=10,
+            completion_tokens=4,
+            total_tokens=14,
+        )
+
+    monkeypatch.setattr(chat_llm, "stream_chat_response", fake_stream)
+
+    response = auth_client.post(
+        "/student/conversation/stream",
+        data={
+            "chat-submission_id": str(submission_id),
+            "chat-message": "Stream please",
+            "chat-include_lecturer_summary": "y",
+        },
+    )
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    body = response.get_data(as_text=True)
+    assert body.index('event: delta\ndata: {"text": "Hello "}') < body.index("event: done")
+
+    with app.app_context():
+        messages = (
+            db.session.query(StudentSubmissionMessage)
+            .filter_by(submission_id=submission_id)
+            .order_by(StudentSubmissionMessage.id.asc())
+            .all()
+        )
+        assert [m.role for m in messages] == ["student", "assistant"]
+        assert messages[1].content == "Hello student."
+        ctx = messages[1].get_context()
+        assert ctx["total_tokens"] == 14
+        assert ctx["include_lecturer_summary"] is True
+        assert ctx["include_student_summary"] is False
+        assert "partial" not in ctx
+
+
+def test_stream_conversation_records_partial_reply_on_disconnect(monkeypatch, auth_client, app):
+    submission_id = _upload_submission(monkeypatch, auth_client, app, "Disconnect Flow")
+
+    from services import chat_llm
+
+    closed = []
+    streams = []  # held here so garbage collection cannot close the stream for the route
+
+    def upstream():
+        try:
+            yield "Partial thought"
+            yield " that never finishes"
+            raise AssertionError("stream should have been closed")
+        finally:
+            closed.append(True)
+
+    def fake_stream(**kwargs):
+        streams.append(upstream())
+        return streams[-1]
+
+    monkeypatch.setattr(chat_llm, "stream_chat_response", fake_stream)
+
+    response = auth_client.post(
+        "/student/conversation/stream",
+        data={"chat-submission_id": str(submission_id), "chat-message": "Go"},
+        buffered=False,
+    )
+    first_chunk = next(iter(response.response))
+    assert b"Partial thought" in first_chunk
+    response.close()
+    assert closed, "the upstream stream must be closed when the client disconnects"
+
+    with app.app_context():
+        assistant = (
+            db.session.query(StudentSubmissionMessage)
+            .filter_by(submission_id=submission_id, role="assistant")
+            .one()
+        )
+        assert assistant.content == "Partial thought"
+        assert assistant.get_context()["partial"] is True
+
+
+def test_student_dashboard_stays_within_query_budget(monkeypatch, auth_client, app, query_budget):
+    submission_id = _upload_submission(monkeypatch, auth_client, app, "Query Budget")
+
+    from services import chat_llm
+
+    monkeypatch.setattr(
+        chat_llm,
+        "_call_openai",
+        lambda messages, model: chat_llm.ChatResult(text="Reply.", model=model),
+    )
+    for turn in range(5):
+        auth_client.post(
+            "/student?step=4",
+            data={
+                "chat-submission_id": str(submission_id),
+                "chat-message": f"Turn {turn}",
+                "chat-include_lecturer_summary": "y",
+                "chat-include_student_summary": "y",
+            },
+        )
+
+    from services.dashboard import DASHBOARD_QUERIES
+
+    # The logged-in user comes from the identity cache; stages 1-3 skip the conversation query.
+    budgets = {1: DASHBOARD_QUERIES - 1, 2: DASHBOARD_QUERIES - 1, 3: DASHBOARD_QUERIES - 1, 4: DASHBOARD_QUERIES}
+    for step, limit in budgets.items():
+        with query_budget(limit):
+            assert auth_client.get(f"/student?step={step}").status_code == 200
+
+    # A chat turn adds two writes per recorded message and nothing lazy-loaded.
+    with query_budget(DASHBOARD_QUERIES + 4):
+        response = auth_client.post(
+            "/student?step=4",
+            data={"chat-submission_id": str(submission_id), "chat-message": "Within budget"},
+        )
+    assert response.status_code == 302
+    assert not [stmt for stmt in query_budget.statements if stmt.startswith("SELECT student_submissions.history_summary")]
+
+
+def test_conversation_export_is_cached_and_revalidated(monkeypatch, auth_client, app):
+    submission_id = _upload_submission(monkeypatch, auth_client, app, "Export Cache")
+
+    from services import chat_llm, export_pdf
+
+    monkeypatch.setattr(
+        chat_llm,
+        "_call_openai",
+        lambda messages, model: chat_llm.ChatResult(text="Reply.", model=model),
+    )
+    auth_client.post(
+        "/student?step=4",
+        data={"chat-submission_id": str(submission_id), "chat-message": "First"},
+    )
+
+    builds = []
+    original_build = export_pdf.build_conversation_pdf
+
+    def counting_build(**kwargs):
+        builds.append(kwargs)
+        return original_build(**kwargs)
+
+    monkeypatch.setattr(export_pdf, "build_conversation_pdf", counting_build)
+    url = f"/student/conversation/download?submission_id={submission_id}"
+
+    first = auth_client.get(url)
+    assert first.status_code == 200
+    assert first.data.startswith(b"%PDF")
+    etag = first.headers["ETag"]
+    assert first.headers["Last-Modified"]
+
+    assert auth_client.get(url).data == first.data
+    assert auth_client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert len(builds) == 1
+
+    auth_client.post(
+        "/student?step=4",
+        data={"chat-submission_id": str(submission_id), "chat-message": "Second"},
+    )
+    changed = auth_client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(builds) == 2
+
+
+def test_long_conversation_export_renders_in_job_worker(monkeypatch, auth_client, app):
+    submission_id = _upload_submission(monkeypatch, auth_client, app, "Export Job")
+    app.config["EXPORT_BACKGROUND_MIN_MESSAGES"] = 1
+    with app.app_context():
+        submission = db.session.get(StudentSubmission, submission_id)
+        db.session.add(StudentSubmissionMessage(submission=submission, role="student", content="Hello"))
+        db.session.commit()
+
+    url = f"/student/conversation/download?submission_id={submission_id}"
+    response = auth_client.get(url)
+    assert response.status_code == 302
+
+    from services import jobs
+
+    with app.app_context():
+        assert jobs.run_pending() >= 1
+    response = auth_client.get(url)
+    assert response.status_code == 200
+    assert response.data.startswith(b"%PDF")
+
+
+def test_deleting_submissions_removes_cached_exports(monkeypatch, auth_client, app):
+    import os
+
+    from services import conversation_export
+
+    submission_id = _upload_submission(monkeypatch, auth_client, app, "Export Cleanup")
+    url = f"/student/conversation/download?submission_id={submission_id}"
+    assert auth_client.get(url).status_code == 200
+    export_dir = os.path.join(app.config["EXPORT_CACHE_PATH"], str(submission_id))
+    assert os.listdir(export_dir)
+
+    with app.app_context():
+        assignment_id = db.session.get(StudentSubmission, submission_id).assignment_id
+        orphan = os.path.join(app.config["EXPORT_CACHE_PATH"], "9999")
+        os.makedirs(orphan)
+        open(os.path.join(orphan, "stale.pdf"), "wb").close()
+        assert conversation_export.prune() == 1
+        assert not os.path.exists(orphan)
+        assert os.path.isdir(export_dir)
+
+    auth_client.post(
+        f"/lecturer/assignments/{assignment_id}/delete",
+        data={"assignment_id": str(assignment_id)},
+    )
+    assert not os.path.exists(export_dir)
+
+
+def test_document_download_supports_etag_and_ranges(auth_client, app, blob_read_guard):
+    assignment_id = _create_assignment(auth_client, app, title="Ranged Download")
+    with app.app_context():
+        document = (
+            db.session.query(AssignmentDocument)
+            .filter_by(assignment_id=assignment_id, slot=1)
+            .one()
+        )
+        document_id, content_hash = document.id, document.content_hash
+    url = f"/lecturer/documents/{document_id}/download"
+
+    full = auth_client.get(url)
+    assert full.status_code == 200
+    assert full.data == BRIEF_PDF
+    assert full.headers["ETag"] == f'"{content_hash}"'
+    assert full.headers["Accept-Ranges"] == "bytes"
+    assert full.headers["Content-Disposition"].startswith("attachment")
+
+    partial = auth_client.get(url, headers={"Range": "bytes=0-3"})
+    assert partial.status_code == 206
+    assert partial.data == b"%PDF"
+    assert partial.headers["Content-Range"] == f"bytes 0-3/{len(BRIEF_PDF)}"
+
+    inline = auth_client.get(f"{url}?inline=1")
+    assert inline.headers["Content-Disposition"].startswith("inline")
+
+    blob_read_guard.reset()
+    revalidated = auth_client.get(url, headers={"If-None-Match": full.headers["ETag"]})
+    assert revalidated.status_code == 304
+    assert not revalidated.data
+    blob_read_guard.assert_no_blob_reads()
+
+
+def test_student_submission_download_is_owner_only(monkeypatch, auth_client, app):
+    submission_id = _upload_submission(monkeypatch, auth_client, app, "Own Upload")
+    url = f"/student/submissions/{submission_id}/file"
+
+    response = auth_client.get(url, headers={"Range": "bytes=13-"})
+    assert response.status_code == 206
+    assert response.data == STUDENT_PDF[13:]
+
+    from models import User
+
+    with app.app_context():
+        other = User(
+            username="other_student",
+            email="other@example.com",
+            first_name="Other",
+            last_name="Student",
+            is_active=True,
+        )
+        other.set_password("Password123!")
+        db.session.add(other)
+        db.session.commit()
+
+    other_client = app.test_client()
+    other_client.post("/auth/login", data={"username": "other_student", "password": "Password123!"})
+    assert other_client.get(url).status_code == 404
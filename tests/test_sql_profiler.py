@@ -0,0 +1,66 @@
+import logging
+
+from services import sql_profiler
+
+
+def test_fingerprint_collapses_literals_and_in_lists():
+    first = sql_profiler.fingerprint(
+        "SELECT * FROM users\n WHERE users.id = 42 AND name = 'O''Brien' AND role_id IN (?, ?, ?)"
+    )
+    second = sql_profiler.fingerprint("SELECT * FROM users WHERE users.id = 7 AND name = 'x' AND role_id IN (?)")
+    assert first == second
+    assert first == "SELECT * FROM users WHERE users.id = ? AND name = ? AND role_id IN (...)"
+    assert sql_profiler.fingerprint("SELECT users_1.id FROM users AS users_1") == "SELECT users_1.id FROM users AS users_1"
+
+
+def test_profiler_aggregates_requests_per_endpoint(app, client, admin_user, caplog):
+    app.config.update(SQL_PROFILER_ENABLED=True, SQL_SLOW_QUERY_MS=0)
+    sql_profiler.reset()
+    sql_profiler.init_app(app)
+    client.post("/auth/login", data={"username": admin_user["username"], "password": admin_user["password"]})
+
+    with caplog.at_level(logging.WARNING, logger="services.sql_profiler"):
+        assert client.get("/student").status_code == 200
+        assert client.get("/student").status_code == 200
+
+    stats = {entry.endpoint: entry for entry in sql_profiler.top_endpoints()}
+    student = stats["GET main.student"]
+    assert student.requests == 2
+    assert student.statements >= 2
+    assert student.top_statements()
+    assert any("Slow query" in record.message for record in caplog.records)
+
+    response = client.get("/beheer/sql")
+    assert response.status_code == 200
+    assert b"GET main.student" in response.data
+
+    client.post("/beheer/sql/reset")
+    assert [entry.endpoint for entry in sql_profiler.top_endpoints()] == ["POST admin.sql_profile_reset"]
+
+
+def test_slow_queries_outside_requests_are_logged_with_a_job_or_cli_label(app, caplog, monkeypatch):
+    from extensions import db
+    from models import BackgroundJob
+    from services import jobs
+
+    app.config.update(SQL_PROFILER_ENABLED=True, SQL_SLOW_QUERY_MS=0)
+    sql_profiler.init_app(app)
+
+    def _profiled(job):
+        db.session.query(BackgroundJob).count()
+
+    monkeypatch.setitem(jobs.HANDLERS, "profiled", _profiled)
+
+    with app.app_context():
+        job = BackgroundJob(kind="profiled", target_type="none", target_id=0)
+        db.session.add(job)
+        db.session.commit()
+        job_id = job.id
+        with caplog.at_level(logging.WARNING, logger="services.sql_profiler"):
+            jobs.run_job(job)
+            result = app.test_cli_runner().invoke(args=["upload-gc"])
+
+    assert result.exit_code == 0
+    messages = [record.getMessage() for record in caplog.records]
+    assert any(f"in job profiled #{job_id}: SELECT count(*)" in message for message in messages)
+    assert any("in cli " in message and "upload-gc" in message for message in messages)
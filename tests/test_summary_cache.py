@@ -0,0 +1,143 @@
+from io import BytesIO
+
+from fpdf import FPDF
+
+from extensions import db
+from models import Assignment, BackgroundJob, CacheStat, StudentSubmission, SummaryCacheEntry
+from services import jobs, summary_cache
+from services.openai_summarizer import SummaryResult
+
+def _pdf(text):
+    pdf = FPDF()
+    pdf.set_font("Helvetica", size=12)
+    pdf.add_page()
+    pdf.cell(0, 10, text)
+    return bytes(pdf.output())
+
+
+CASE_PDF = _pdf("Identical case analysis")
+
+
+def _assignment(app):
+    with app.app_context():
+        assignment = Assignment(title="Cached summaries")
+        db.session.add(assignment)
+        db.session.commit()
+        return assignment.id
+
+
+def _upload(auth_client, assignment_id, payload=CASE_PDF, model="gpt-4o-mini"):
+    return auth_client.post(
+        "/student?step=2",
+        data={
+            "upload-assignment_id": str(assignment_id),
+            "upload-model": model,
+            "upload-document": (BytesIO(payload), "analysis.pdf"),
+        },
+        content_type="multipart/form-data",
+        follow_redirects=True,
+    )
+
+
+def test_duplicate_upload_reuses_cached_summary(monkeypatch, auth_client, app):
+    assignment_id = _assignment(app)
+    calls = []
+
+    def fake_summary(content, model):
+        calls.append(model)
+        return SummaryResult(text="Cached case summary", model=model)
+
+    monkeypatch.setattr("services.jobs.summarise_text", fake_summary)
+
+    first = _upload(auth_client, assignment_id)
+    assert b"Your summary is being generated" in first.data
+    with app.app_context():
+        assert jobs.run_pending() == 1
+
+    second = _upload(auth_client, assignment_id)
+    assert b"Your summary is ready" in second.data
+
+    with app.app_context():
+        submissions = db.session.query(StudentSubmission).order_by(StudentSubmission.id).all()
+        assert [s.summary for s in submissions] == ["Cached case summary", "Cached case summary"]
+        assert db.session.query(BackgroundJob).count() == 1
+        stats = summary_cache.stats()
+        assert stats["entries"] == 1
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert calls == ["gpt-4o-mini"]
+
+    dashboard = auth_client.get("/beheer/")
+    assert b"Samenvattingscache" in dashboard.data
+    assert b"50%" in dashboard.data
+
+
+def test_cache_key_includes_model_and_prompt_version(app, monkeypatch):
+    with app.app_context():
+        summary_cache.store("a" * 64, "gpt-4o-mini", "Mini summary")
+        db.session.commit()
+
+        assert summary_cache.lookup("a" * 64, "gpt-4o-mini") == "Mini summary"
+        assert summary_cache.lookup("a" * 64, "gpt-5") is None
+
+        monkeypatch.setattr("services.summary_cache.SUMMARY_PROMPT_VERSION", 99)
+        assert summary_cache.lookup("a" * 64, "gpt-4o-mini") is None
+
+
+def test_eviction_drops_least_recently_used_entries(app):
+    with app.app_context():
+        app.config["SUMMARY_CACHE_MAX_ENTRIES"] = 2
+        summary_cache.store("a" * 64, "gpt-4o-mini", "First")
+        summary_cache.store("b" * 64, "gpt-4o-mini", "Second")
+        assert summary_cache.lookup("a" * 64, "gpt-4o-mini") == "First"
+        summary_cache.store("c" * 64, "gpt-4o-mini", "Third")
+        db.session.commit()
+
+        remaining = {entry.content_hash[0] for entry in db.session.query(SummaryCacheEntry)}
+        assert remaining == {"a", "c"}
+
+
+def test_store_overwrites_a_row_another_worker_inserted_first(app, monkeypatch):
+    with app.app_context():
+        summary_cache.store("a" * 64, "gpt-4o-mini", "First worker")
+        db.session.commit()
+
+        # The second worker looked the key up before the first one committed.
+        real_entry = summary_cache._entry
+        calls = []
+
+        def stale_then_real(*args):
+            calls.append(args)
+            return None if len(calls) == 1 else real_entry(*args)
+
+        monkeypatch.setattr(summary_cache, "_entry", stale_then_real)
+        CacheStat.record("pending", hit=True)
+        summary_cache.store("a" * 64, "gpt-4o-mini", "Second worker")
+        db.session.commit()
+
+        assert [entry.summary for entry in db.session.query(SummaryCacheEntry)] == ["Second worker"]
+        # Only the savepoint was rolled back, not the rest of the transaction.
+        assert db.session.get(CacheStat, "pending").hits == 1
+
+
+def test_cache_stat_record_retries_when_the_row_appears_concurrently(app):
+    from sqlalchemy import event
+
+    with app.app_context():
+        engine = db.engine
+        raced = []
+
+        def concurrent_insert(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("UPDATE cache_stats") and not raced:
+                raced.append(statement)
+                cursor.connection.execute("INSERT INTO cache_stats (name, hits, misses) VALUES ('racing', 0, 5)")
+
+        event.listen(engine, "after_cursor_execute", concurrent_insert)
+        try:
+            CacheStat.record("racing", hit=True)
+            db.session.commit()
+        finally:
+            event.remove(engine, "after_cursor_execute", concurrent_insert)
+
+        assert raced
+        counter = db.session.get(CacheStat, "racing")
+        assert (counter.hits, counter.misses) == (1, 5)
@@ -0,0 +1,176 @@
+from io import BytesIO
+
+from fpdf import FPDF
+
+from extensions import db
+from models import Assignment, AssignmentDocument, ExtractedText
+from services import jobs, pdf_text, text_store
+from services.openai_summarizer import SummaryResult
+
+
+def _pdf(*pages):
+    pdf = FPDF()
+    pdf.set_font("Helvetica", size=12)
+    for text in pages:
+        pdf.add_page()
+        pdf.cell(0, 10, text)
+    return bytes(pdf.output())
+
+
+def _document(app, payload):
+    with app.app_context():
+        assignment = Assignment(title="Text store")
+        document = AssignmentDocument(assignment=assignment, slot=1, label="Brief", filename="brief.pdf")
+        document.store_content(payload)
+        db.session.add_all([assignment, document])
+        db.session.commit()
+        return assignment.id, document.id
+
+
+def test_pages_are_stored_with_offsets(app):
+    payload = _pdf("First page text", "Second page text")
+    _, document_id = _document(app, payload)
+
+    with app.app_context():
+        document = db.session.get(AssignmentDocument, document_id)
+        extracted = text_store.ensure_text(document, payload)
+        db.session.commit()
+
+        assert extracted.page_count == 2
+        assert extracted.page(0).strip() == "First page text"
+        assert extracted.page(1).strip() == "Second page text"
+        assert extracted.text[extracted.page_offsets[1]:].strip() == "Second page text"
+
+        row = db.session.get(ExtractedText, document.content_hash)
+        assert row.page_count == 2
+        assert row.extractor == "pypdf"
+
+        # A cold process reads the stored row instead of re-parsing the PDF.
+        text_store.clear_memory()
+        assert text_store.get_text(document).pages() == extracted.pages()
+
+
+def test_summary_job_uses_stored_text(app, monkeypatch, blob_read_guard):
+    payload = _pdf("Course brief about traffic demand")
+    _, document_id = _document(app, payload)
+    received = []
+
+    def fake_summary(text, model):
+        received.append(text)
+        return SummaryResult(text="Summary", model=model)
+
+    monkeypatch.setattr("services.jobs.summarise_text", fake_summary)
+
+    with app.app_context():
+        document = db.session.get(AssignmentDocument, document_id)
+        text_store.ensure_text(document, payload)
+        jobs.enqueue_summary(document, "gpt-4o-mini")
+        db.session.commit()
+
+        blob_read_guard.reset()
+        assert jobs.run_pending() == 1
+
+    assert received and "traffic demand" in received[0]
+    assert not blob_read_guard.opened
+
+
+def test_replacing_a_document_keeps_shared_text_until_pruned(auth_client, app):
+    shared = _pdf("original brief")
+    assignment_id, document_id = _document(app, shared)
+    with app.app_context():
+        for slot in range(2, 5):
+            extra = AssignmentDocument(
+                assignment_id=assignment_id, slot=slot, label=f"Doc {slot}", filename=f"{slot}.pdf"
+            )
+            extra.store_content(shared if slot == 2 else f"doc {slot}".encode())
+            db.session.add(extra)
+        document = db.session.get(AssignmentDocument, document_id)
+        text_store.ensure_text(document)
+        db.session.commit()
+        old_hash = document.content_hash
+
+    response = auth_client.post(
+        f"/lecturer/assignments/{assignment_id}/edit",
+        data={
+            "title": "Text store",
+            "doc1_label": "Brief",
+            "doc2_label": "Doc 2",
+            "doc3_label": "Doc 3",
+            "doc4_label": "Doc 4",
+            "doc1_file": (BytesIO(_pdf("replacement brief")), "brief.pdf"),
+        },
+        content_type="multipart/form-data",
+        follow_redirects=True,
+    )
+    assert response.status_code == 200
+
+    with app.app_context():
+        document = db.session.get(AssignmentDocument, document_id)
+        assert document.content_hash != old_hash
+        # Document 2 still has the old content, so its text survives the replacement.
+        assert db.session.get(ExtractedText, old_hash) is not None
+        # The upload request does not extract; the first reader (the summary job) does.
+        assert db.session.get(ExtractedText, document.content_hash) is None
+        assert text_store.get_text(document).text == "replacement brief"
+
+        assert text_store.prune({document.content_hash}) == 1
+        db.session.commit()
+        assert db.session.get(ExtractedText, old_hash) is None
+
+
+def test_student_upload_defers_extraction_to_the_summary_job(auth_client, app, monkeypatch):
+    received = []
+    monkeypatch.setattr(
+        "services.jobs.summarise_text",
+        lambda text, model: received.append(text) or SummaryResult(text="Summary", model=model),
+    )
+    monkeypatch.setattr(
+        text_store, "extract_text", lambda *args, **kwargs: received.append("extract") or extract(*args, **kwargs)
+    )
+    extract = pdf_text.extract_text
+    with app.app_context():
+        assignment = Assignment(title="Deferred extraction")
+        db.session.add(assignment)
+        db.session.commit()
+        assignment_id = assignment.id
+
+    response = auth_client.post(
+        "/student?step=2",
+        data={
+            "upload-assignment_id": str(assignment_id),
+            "upload-model": "gpt-4o-mini",
+            "upload-document": (BytesIO(_pdf("Deferred case analysis")), "analysis.pdf"),
+        },
+        content_type="multipart/form-data",
+        follow_redirects=True,
+    )
+    assert b"Your summary is being generated" in response.data
+    assert received == []
+    with app.app_context():
+        assert db.session.query(ExtractedText).count() == 0
+        assert jobs.run_pending() == 1
+        assert db.session.query(ExtractedText).count() == 1
+    assert received == ["extract", "Deferred case analysis"]
+
+
+def test_budgeted_extraction_stops_early():
+    payload = _pdf(*(f"Page {index} " + "lorem ipsum " * 20 for index in range(6)))
+
+    budgeted = pdf_text.extract_text(payload, max_chars=300)
+    full = pdf_text.extract_text(payload, workers=1)
+
+    assert budgeted.truncated
+    assert budgeted.page_count < full.page_count == 6
+    assert len(budgeted.text) >= 300
+    assert full.text.startswith(budgeted.text)
+
+
+def test_parallel_extraction_matches_sequential():
+    payload = _pdf(*(f"Parallel page {index}" for index in range(5)))
+    try:
+        parallel = pdf_text.extract_text(payload, workers=2, parallel_min_pages=2)
+    finally:
+        pdf_text.shutdown_pool()
+
+    assert parallel == pdf_text.extract_text(payload, workers=1)
+    assert parallel.page(4).strip() == "Parallel page 4"
@@ -0,0 +1,209 @@
+import hashlib
+import os
+from io import BytesIO
+
+import pytest
+from fpdf import FPDF
+from werkzeug.datastructures import FileStorage
+
+from extensions import db
+from models import Assignment, StudentSubmission
+from services import uploads
+from services.blob_store import get_blob_store
+
+
+class RecordingStream(BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, size=-1):
+        self.reads.append(size)
+        return super().read(size)
+
+
+def _storage(data, filename="analysis.pdf"):
+    return FileStorage(stream=RecordingStream(data), filename=filename, content_type="application/pdf")
+
+
+def test_spool_hashes_in_chunks_and_links_into_blob_store(app):
+    payload = b"%PDF-1.7\n" + os.urandom(3 * uploads.CHUNK_SIZE + 17)
+    storage = _storage(payload)
+    with app.app_context():
+        upload = uploads.spool(storage)
+        assert upload.size == len(payload)
+        assert upload.content_hash == hashlib.sha256(payload).hexdigest()
+        assert all(0 < size <= uploads.CHUNK_SIZE for size in storage.stream.reads)
+
+        submission = StudentSubmission(filename="analysis.pdf")
+        submission.store_upload(upload)
+        upload.discard()
+        assert submission.content_hash == upload.content_hash
+        assert submission.file_size == len(payload)
+        assert submission.content is None
+        assert get_blob_store().read(upload.content_hash) == payload
+        assert os.listdir(os.path.dirname(upload.path)) == []
+
+
+def test_spool_rejects_non_pdf_after_first_chunk(app):
+    storage = _storage(b"MZ" + b"\0" * (4 * uploads.CHUNK_SIZE))
+    with app.app_context():
+        with pytest.raises(uploads.UploadRejected, match="not a PDF"):
+            uploads.spool(storage)
+        assert storage.stream.reads == [uploads.CHUNK_SIZE]
+        assert os.listdir(app.config["UPLOAD_SPOOL_PATH"]) == []
+
+
+def test_spool_rejects_oversize_while_streaming(app):
+    storage = _storage(b"%PDF-1.4\n" + b"x" * (5 * uploads.CHUNK_SIZE))
+    with app.app_context():
+        with pytest.raises(uploads.UploadRejected, match="larger than"):
+            uploads.spool(storage, max_bytes=2 * uploads.CHUNK_SIZE)
+        assert len(storage.stream.reads) == 3
+        assert os.listdir(app.config["UPLOAD_SPOOL_PATH"]) == []
+
+
+def test_student_upload_of_non_pdf_is_refused(auth_client, app):
+    with app.app_context():
+        assignment = Assignment(title="Upload checks")
+        db.session.add(assignment)
+        db.session.commit()
+        assignment_id = assignment.id
+
+    response = auth_client.post(
+        "/student?step=2",
+        data={
+            "upload-assignment_id": str(assignment_id),
+            "upload-model": "gpt-4o-mini",
+            "upload-document": (BytesIO(b"plain text pretending"), "analysis.pdf"),
+        },
+        content_type="multipart/form-data",
+        follow_redirects=True,
+    )
+    assert b"analysis.pdf is not a PDF document." in response.data
+    with app.app_context():
+        assert db.session.query(StudentSubmission).count() == 0
+
+
+def _sha(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _resumable_upload(client, payload, filename="analysis.pdf", chunk=16):
+    created = client.post("/uploads", json={"filename": filename, "size": len(payload)})
+    assert created.status_code == 201
+    upload_id = created.get_json()["id"]
+    for offset in range(0, len(payload), chunk):
+        part = payload[offset:offset + chunk]
+        response = client.put(
+            f"/uploads/{upload_id}?offset={offset}", data=part, headers={"X-Chunk-SHA256": _sha(part)}
+        )
+        assert response.status_code == 200
+    finished = client.post(f"/uploads/{upload_id}/finalise")
+    assert finished.status_code == 200
+    assert finished.get_json()["complete"] is True
+    return upload_id
+
+
+def test_resumable_upload_checks_offsets_and_checksums(auth_client, app, make_user):
+    payload = b"%PDF-1.4\n" + b"resumable body " * 4
+    created = auth_client.post("/uploads", json={"filename": "big.pdf", "size": len(payload)})
+    upload_id = created.get_json()["id"]
+    url = f"/uploads/{upload_id}"
+    first, rest = payload[:20], payload[20:]
+
+    corrupted = auth_client.put(f"{url}?offset=0", data=first, headers={"X-Chunk-SHA256": _sha(b"other")})
+    assert corrupted.status_code == 400
+    assert auth_client.get(url).get_json()["offset"] == 0
+
+    assert auth_client.put(f"{url}?offset=0", data=first, headers={"X-Chunk-SHA256": _sha(first)}).status_code == 200
+    skipped = auth_client.put(f"{url}?offset=40", data=rest, headers={"X-Chunk-SHA256": _sha(rest)})
+    assert skipped.status_code == 409
+    assert skipped.get_json()["offset"] == 20
+    assert auth_client.post(f"{url}/finalise").status_code == 409
+
+    assert auth_client.put(f"{url}?offset=20", data=rest, headers={"X-Chunk-SHA256": _sha(rest)}).status_code == 200
+    finished = auth_client.post(f"{url}/finalise").get_json()
+    assert finished["complete"] is True
+    with app.app_context():
+        from models import UploadSession
+
+        assert db.session.get(UploadSession, upload_id).content_hash == _sha(payload)
+
+    other = app.test_client()
+    make_user("someone", email="someone@example.com")
+    other.post("/auth/login", data={"username": "someone", "password": "Password123!"})
+    assert other.get(url).status_code == 404
+
+
+def test_resumable_upload_rejects_non_pdf_first_chunk(auth_client):
+    created = auth_client.post("/uploads", json={"filename": "notes.pdf", "size": 10})
+    url = f"/uploads/{created.get_json()['id']}"
+    response = auth_client.put(f"{url}?offset=0", data=b"plain text", headers={"X-Chunk-SHA256": _sha(b"plain text")})
+    assert response.status_code == 422
+    assert "not a PDF" in response.get_json()["error"]
+
+
+def test_student_upload_attaches_finalised_upload(monkeypatch, auth_client, app):
+    monkeypatch.setattr("services.jobs.summarise_text", lambda content, model: None)
+    with app.app_context():
+        assignment = Assignment(title="Resumable student upload")
+        db.session.add(assignment)
+        db.session.commit()
+        assignment_id = assignment.id
+    pdf = FPDF()
+    pdf.set_font("Helvetica", size=12)
+    pdf.add_page()
+    pdf.cell(0, 10, "Student analysis sent in chunks")
+    payload = bytes(pdf.output())
+    upload_id = _resumable_upload(auth_client, payload, chunk=1024)
+
+    response = auth_client.post(
+        "/student?step=2",
+        data={
+            "upload-assignment_id": str(assignment_id),
+            "upload-model": "gpt-4o-mini",
+            "upload-upload_id": upload_id,
+        },
+        follow_redirects=True,
+    )
+    assert response.status_code == 200
+    with app.app_context():
+        submission = db.session.query(StudentSubmission).one()
+        assert submission.filename == "analysis.pdf"
+        assert submission.content_hash == _sha(payload)
+        assert submission.read_content() == payload
+
+
+def test_assignment_create_accepts_upload_ids(auth_client, app):
+    data = {"title": "Resumable assignment", "description": ""}
+    for slot in range(1, 5):
+        data[f"doc{slot}_label"] = f"Doc {slot}"
+        data[f"doc{slot}_upload_id"] = _resumable_upload(
+            auth_client, f"%PDF-1.4 document {slot}".encode(), filename=f"doc{slot}.pdf"
+        )
+    response = auth_client.post("/lecturer/assignments", data=data, follow_redirects=True)
+    assert b"Assignment created successfully." in response.data
+    with app.app_context():
+        from models import AssignmentDocument
+
+        filenames = sorted(doc.filename for doc in db.session.query(AssignmentDocument))
+        assert filenames == ["doc1.pdf", "doc2.pdf", "doc3.pdf", "doc4.pdf"]
+
+
+def test_expired_sessions_are_removed(auth_client, app):
+    from datetime import timedelta
+
+    from models import UploadSession, utcnow
+
+    upload_id = _resumable_upload(auth_client, b"%PDF-1.4 short lived")
+    with app.app_context():
+        row = db.session.get(UploadSession, upload_id)
+        row.expires_at = utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        with pytest.raises(uploads.UploadRejected):
+            uploads.claim(upload_id, row.user_id)
+        assert uploads.expire_sessions() == 1
+        db.session.commit()
+        assert db.session.get(UploadSession, upload_id) is None
+        assert os.listdir(os.path.join(app.config["UPLOAD_SPOOL_PATH"], "sessions")) == []
@@ -0,0 +1,78 @@
+from extensions import db
+from models import ConnectionProfile, Role, User, UserProject
+
+
+def _seed_users(app, count):
+    with app.app_context():
+        role = Role(name="Gebruiker")
+        db.session.add(role)
+        for index in range(count):
+            user = User(
+                username=f"student{index:03d}",
+                email=f"student{index:03d}@example.com",
+                first_name="Student",
+                last_name=f"Nummer{index:03d}",
+                password_hash="unused",
+                is_active=True,
+            )
+            user.roles.append(role)
+            user.project_links.append(UserProject(project="Algemeen"))
+            db.session.add(user)
+        db.session.commit()
+
+
+def test_user_page_query_count_does_not_grow_with_accounts(app, auth_client, query_budget):
+    app.config["ADMIN_USERS_PER_PAGE"] = 10
+    _seed_users(app, 40)
+    auth_client.get("/beheer/users")  # warm the project choices
+
+    with query_budget(5):
+        response = auth_client.get("/beheer/users")
+    assert response.status_code == 200
+    assert response.data.count(b"/edit") == 10
+    assert b"after=10" in response.data
+
+
+def test_user_pages_walk_forward_and_back(app, auth_client):
+    app.config["ADMIN_USERS_PER_PAGE"] = 10
+    _seed_users(app, 14)
+
+    second = auth_client.get("/beheer/users?after=10")
+    assert b"student013" in second.data
+    assert b"student008" not in second.data
+    assert b"Volgende" not in second.data
+    assert b"before=11" in second.data
+
+    first = auth_client.get("/beheer/users?before=11")
+    assert b"test_admin" in first.data
+    assert b"student008" in first.data
+    assert b"Vorige" not in first.data
+
+
+def test_user_search_matches_prefixes(app, auth_client):
+    _seed_users(app, 3)
+    response = auth_client.get("/beheer/users?q=student001")
+    assert b"student001@example.com" not in response.data  # e-mail is not listed
+    assert b"student001" in response.data
+    assert b"student002" not in response.data
+
+    by_last_name = auth_client.get("/beheer/users?q=nummer00")
+    assert b"student000" in by_last_name.data and b"student002" in by_last_name.data
+    assert b"test_admin" not in by_last_name.data
+
+    assert b"Geen gebruikers gevonden" in auth_client.get("/beheer/users?q=%25").data
+
+
+def test_project_choices_are_cached_until_profiles_change(app, auth_client):
+    with app.app_context():
+        db.session.add(ConnectionProfile(name="Prod", project="Alpha"))
+        db.session.commit()
+    assert b'value="Alpha"' in auth_client.get("/beheer/users").data
+
+    with app.app_context():
+        db.session.add(ConnectionProfile(name="Other", project="Beta"))
+        db.session.commit()
+    assert b'value="Beta"' not in auth_client.get("/beheer/users").data
+
+    auth_client.post("/beheer/connection", data={"action": "new"})
+    assert b'value="Beta"' in auth_client.get("/beheer/users").data